@@ -1,16 +1,107 @@
 from flask import Flask, jsonify
 from models import db
+from services.storage import configure_storage, init_storage
 import os
 
-def create_app():
+def create_app(config=None):
     app = Flask(__name__)
     
     # Database configuration
-    db_path = os.path.join(os.path.dirname(__file__), 'words.db')
-    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{db_path}'
+    app.config['DATABASE_PATH'] = os.path.join(os.path.dirname(__file__), 'words.db')
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
     
+    # Storage profile: 'default' keeps SQLite defaults, 'production' enables WAL
+    # and tuned pragmas with a read-only engine for GETs and a serialized writer
+    app.config['STORAGE_PROFILE'] = 'default'
+    app.config['SQLITE_PRAGMAS'] = {}
+    app.config['SQLITE_READER_POOL_SIZE'] = 8
+    app.config['SQLITE_WRITER_POOL_SIZE'] = 1
+    app.config['SQLITE_POOL_TIMEOUT'] = 30
+    
+    # Write-behind review buffer (off by default; reviews commit synchronously)
+    app.config['REVIEW_WRITE_BEHIND'] = False
+    app.config['REVIEW_BUFFER_SIZE'] = 10000
+    app.config['REVIEW_FLUSH_ITEMS'] = 500
+    app.config['REVIEW_DURABILITY_WINDOW_MS'] = 200
+    app.config['REVIEW_BUFFER_PUT_TIMEOUT_MS'] = 1000
+    # Reviews that fail this many flushes are written to the NDJSON dead-letter file
+    app.config['REVIEW_FLUSH_MAX_ATTEMPTS'] = 3
+    app.config['REVIEW_DEAD_LETTER_PATH'] = os.path.join(os.path.dirname(__file__), 'review_dead_letter.ndjson')
+    
+    # Catalog response cache (ETag/304, invalidated by data versions)
+    app.config['RESPONSE_CACHE_ENABLED'] = True
+    app.config['RESPONSE_CACHE_MAX_BYTES'] = 32 * 1024 * 1024
+    
+    # List pages of at least STREAM_MIN_ITEMS items are streamed as they are
+    # serialized; word, group and session responses are gzip/deflate-encoded
+    # for clients that accept it once the body reaches the minimum size
+    app.config['STREAM_MIN_ITEMS'] = 200
+    app.config['RESPONSE_COMPRESSION_ENABLED'] = True
+    app.config['RESPONSE_COMPRESSION_MIN_BYTES'] = 1024
+    app.config['RESPONSE_COMPRESSION_LEVEL'] = 6
+    
+    # Reviews older than the horizon are folded into per-word daily aggregates
+    # by POST /api/compact_reviews or `invoke compact-reviews`
+    app.config['REVIEW_COMPACTION_HORIZON_DAYS'] = 90
+    app.config['REVIEW_COMPACTION_BATCH_SIZE'] = 5000
+    
+    # In-memory vocabulary snapshot behind the catalog reads, reloaded when
+    # the catalog data version moves on; preload it at startup. Disabled, the
+    # word and group routes page through SQL (membership index, stored counts)
+    app.config['CATALOG_ENABLED'] = True
+    app.config['CATALOG_PRELOAD'] = True
+    
+    # Request/SQL metrics at /api/metrics; lower the sample rate in production to
+    # instrument SQL on a fraction of requests (request latency is always recorded)
+    app.config['METRICS_ENABLED'] = True
+    app.config['METRICS_SAMPLE_RATE'] = 1.0
+    app.config['METRICS_N_PLUS_ONE_THRESHOLD'] = 5
+    
+    # Hardest-words rankings smooth each error rate as if the word had
+    # HARDEST_PRIOR_REVIEWS more reviews at HARDEST_PRIOR_ERROR_RATE, so a word
+    # missed once does not top them; `invoke rerank-hardest` after changing these
+    app.config['HARDEST_PRIOR_REVIEWS'] = 5
+    app.config['HARDEST_PRIOR_ERROR_RATE'] = 0.25
+    
+    # Pristine migrated and seeded database that POST /api/full_reset restores;
+    # rebuilt on demand when a migration or seed file is newer than it
+    app.config['RESET_TEMPLATE_PATH'] = os.path.join(os.path.dirname(__file__), 'db', 'template.db')
+    
+    # Startup compares db/migrations with schema_migrations (one query) and
+    # warns about pending files, or applies them with MIGRATE_ON_STARTUP
+    app.config['MIGRATE_ON_STARTUP'] = False
+    
+    # Multi-learner mode: study history lives in one database per learner under
+    # SHARD_ROOT/<shard>/, picked per request from the LEARNER_HEADER header or
+    # ?learner_id=; the vocabulary stays in DATABASE_PATH, attached read-only
+    app.config['MULTI_LEARNER'] = False
+    app.config['LEARNER_HEADER'] = 'X-Learner-Id'
+    app.config['SHARD_ROOT'] = os.path.join(os.path.dirname(__file__), 'shards')
+    app.config['SHARD_COUNT'] = 4
+    app.config['SHARD_POOL_SIZE'] = 2
+    app.config['SHARD_ENGINE_CACHE_SIZE'] = 256
+    
+    # FLASK_* environment variables, then explicit overrides
+    app.config.from_prefixed_env()
+    app.config.update(config or {})
+    app.config.setdefault('SQLALCHEMY_DATABASE_URI', f"sqlite:///{app.config['DATABASE_PATH']}")
+    
+    configure_storage(app)
     db.init_app(app)
+    init_storage(app, db)
+    
+    from services.catalog import init_catalog
+    from services.metrics import init_metrics
+    from services.migrations import init_migrations
+    from services.review_buffer import init_review_buffer
+    from services.response_cache import init_response_cache
+    from services.sharding import init_sharding
+    init_migrations(app, db)
+    init_metrics(app, db)
+    init_sharding(app, db)
+    init_review_buffer(app)
+    init_response_cache(app)
+    init_catalog(app)
     
     # Health check route
     @app.route('/health', methods=['GET'])
@@ -35,6 +126,10 @@ def create_app():
     app.register_blueprint(admin_bp, url_prefix='/api')
     
     # Error handlers
+    @app.errorhandler(400)
+    def bad_request(error):
+        return jsonify({'error': error.description or 'Bad request'}), 400
+    
     @app.errorhandler(404)
     def not_found(error):
         return jsonify({'error': 'Resource not found'}), 404
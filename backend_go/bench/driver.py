@@ -0,0 +1,234 @@
+"""Concurrent load driver over every blueprint, run in-process through create_app().
+
+    python -m bench.driver --path /tmp/bench.db --threads 8 --duration 30 --out bench/results
+
+Writes a JSON report with per-endpoint p50/p95/p99 latency, throughput and
+SQL query counts so runs can be diffed over time.
+"""
+import argparse
+import json
+import logging
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event  # noqa: E402
+
+# name -> (weight, method, path template, body factory)
+ENDPOINTS = {
+    'dashboard.last_study_session': (3, 'GET', '/api/dashboard/last_study_session', None),
+    'dashboard.study_progress': (3, 'GET', '/api/dashboard/study_progress', None),
+    'dashboard.quick_stats': (5, 'GET', '/api/dashboard/quick_stats', None),
+    'words.list': (8, 'GET', '/api/words?page={page}', None),
+    'words.list_cursor': (4, 'GET', '/api/words?cursor=&per_page=100', None),
+    'words.detail': (8, 'GET', '/api/words/{word_id}', None),
+    'words.search': (6, 'GET', '/api/words/search?q={prefix}', None),
+    'groups.list': (4, 'GET', '/api/groups', None),
+    'groups.detail': (3, 'GET', '/api/groups/{group_id}', None),
+    'groups.words': (6, 'GET', '/api/groups/{group_id}/words?page={page}', None),
+    'groups.study_sessions': (2, 'GET', '/api/groups/{group_id}/study_sessions', None),
+    'groups.due': (4, 'GET', '/api/groups/{group_id}/due?limit=20', None),
+    'study_sessions.list': (3, 'GET', '/api/study_sessions?page={page}', None),
+    'study_sessions.detail': (2, 'GET', '/api/study_sessions/{session_id}', None),
+    'study_sessions.words': (4, 'GET', '/api/study_sessions/{session_id}/words', None),
+    'study_activities.detail': (1, 'GET', '/api/study_activities/1', None),
+    'study_activities.sessions': (2, 'GET', '/api/study_activities/1/study_sessions?page={page}', None),
+    'study_activities.create': (1, 'POST', '/api/study_activities',
+                                lambda ctx: {'group_id': ctx['group_id'], 'study_activity_type': 'quiz'}),
+    'reviews.single': (12, 'POST', '/api/study_sessions/{session_id}/words/{word_id}/review',
+                       lambda ctx: {'correct': ctx['rng'].random() < 0.7}),
+    'reviews.batch': (3, 'POST', '/api/study_sessions/{session_id}/reviews',
+                      lambda ctx: {'reviews': [{'word_id': ctx['rng'].randint(1, ctx['words']),
+                                                'correct': ctx['rng'].random() < 0.7} for _ in range(20)]}),
+}
+
+
+class QueryCounter:
+    """Counts SQL statements executed by the current thread"""
+
+    def __init__(self, engines):
+        self.local = threading.local()
+        for engine in engines:
+            event.listen(engine, 'before_cursor_execute', self._on_execute)
+
+    def _on_execute(self, *args):
+        self.local.count = getattr(self.local, 'count', 0) + 1
+
+    def reset(self):
+        self.local.count = 0
+
+    def value(self):
+        return getattr(self.local, 'count', 0)
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = max(0, math.ceil(pct / 100.0 * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+
+def dataset_sizes(path):
+    import sqlite3
+    conn = sqlite3.connect(path)
+    try:
+        return {table: conn.execute(f'SELECT MAX(id) FROM {table}').fetchone()[0] or 0
+                for table in ('words', 'groups', 'study_sessions', 'words_review_items')}
+    finally:
+        conn.close()
+
+
+def run(path, threads=8, duration=30.0, warmup=3.0, endpoints=None, config=None, seed=1):
+    from app import create_app
+    from models import db
+
+    app = create_app(dict({'DATABASE_PATH': path}, **(config or {})))
+    # failures are counted in the report; keep tracebacks off the console
+    app.logger.setLevel(logging.CRITICAL)
+    with app.app_context():
+        counter = QueryCounter(db.engines.values())
+
+    sizes = dataset_sizes(path)
+    selected = {name: spec for name, spec in ENDPOINTS.items() if not endpoints or name in endpoints}
+    names = list(selected)
+    weights = [selected[n][0] for n in names]
+    samples = {name: [] for name in names}
+    stop_at = time.monotonic() + warmup + duration
+    measure_from = time.monotonic() + warmup
+    lock = threading.Lock()
+
+    def worker(index):
+        rng = random.Random(seed + index)
+        client = app.test_client()
+        local = {name: [] for name in names}
+        while True:
+            now = time.monotonic()
+            if now >= stop_at:
+                break
+            name = rng.choices(names, weights)[0]
+            _, method, template, body = selected[name]
+            ctx = {
+                'rng': rng,
+                'words': max(1, sizes['words']),
+                'word_id': rng.randint(1, max(1, sizes['words'])),
+                'group_id': rng.randint(1, max(1, sizes['groups'])),
+                'session_id': rng.randint(1, max(1, sizes['study_sessions'])),
+                'page': rng.choice((1, 1, 1, 2, 5, 50)),
+                'prefix': ''.join(rng.choice('kstnhmaiueo') for _ in range(2)),
+            }
+            url = template.format(**ctx)
+            counter.reset()
+            started = time.perf_counter()
+            response = client.open(url, method=method, json=body(ctx) if body else None)
+            elapsed = time.perf_counter() - started
+            if now >= measure_from:
+                local[name].append((elapsed, response.status_code, counter.value()))
+        with lock:
+            for name, values in local.items():
+                samples[name].extend(values)
+
+    pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+
+    report = {name: summarize(values, duration) for name, values in samples.items()}
+    total = sum(len(v) for v in samples.values())
+    return {
+        'started_at': datetime.utcnow().isoformat() + 'Z',
+        'git_commit': _git_commit(),
+        'python': platform.python_version(),
+        'config': {'threads': threads, 'duration': duration, 'warmup': warmup, **(config or {})},
+        'dataset': sizes,
+        'throughput_rps': round(total / duration, 2),
+        'endpoints': report,
+    }
+
+
+def summarize(values, duration):
+    latencies = sorted(v[0] * 1000 for v in values)
+    queries = [v[2] for v in values]
+    errors = sum(1 for v in values if v[1] >= 500)
+    return {
+        'requests': len(values),
+        'errors': errors,
+        'status_codes': {str(code): sum(1 for v in values if v[1] == code) for code in sorted({v[1] for v in values})},
+        'throughput_rps': round(len(values) / duration, 2),
+        'latency_ms': {
+            'mean': round(sum(latencies) / len(latencies), 3) if latencies else None,
+            'p50': _round(percentile(latencies, 50)),
+            'p95': _round(percentile(latencies, 95)),
+            'p99': _round(percentile(latencies, 99)),
+            'max': _round(latencies[-1] if latencies else None),
+        },
+        'sql_queries': {
+            'mean': round(sum(queries) / len(queries), 2) if queries else None,
+            'max': max(queries) if queries else None,
+        },
+    }
+
+
+def _round(value):
+    return round(value, 3) if value is not None else None
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL,
+                                       cwd=os.path.dirname(os.path.abspath(__file__))).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_report(report):
+    print(f"  {'endpoint':32} {'reqs':>7} {'err':>5} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'sql/req':>8}")
+    for name, row in report['endpoints'].items():
+        lat = row['latency_ms']
+        fmt = lambda v: f'{v:9.2f}' if v is not None else f"{'-':>9}"  # noqa: E731
+        sql = row['sql_queries']['mean']
+        print(f"  {name:32} {row['requests']:7d} {row['errors']:5d} {fmt(lat['p50'])} {fmt(lat['p95'])} "
+              f"{fmt(lat['p99'])} {sql if sql is not None else '-':>8}")
+    print(f"  total throughput: {report['throughput_rps']} req/s")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--path', default='bench.db')
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=30.0)
+    parser.add_argument('--warmup', type=float, default=3.0)
+    parser.add_argument('--endpoint', action='append', help='restrict to an endpoint name (repeatable)')
+    parser.add_argument('--config', action='append', default=[], metavar='KEY=JSON',
+                        help='app config override, e.g. STORAGE_PROFILE="production"')
+    parser.add_argument('--out', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results'))
+    args = parser.parse_args(argv)
+
+    config = {}
+    for item in args.config:
+        key, _, value = item.partition('=')
+        try:
+            config[key] = json.loads(value)
+        except ValueError:
+            config[key] = value
+
+    report = run(os.path.abspath(args.path), args.threads, args.duration, args.warmup, args.endpoint, config)
+    print_report(report)
+
+    os.makedirs(args.out, exist_ok=True)
+    out_path = os.path.join(args.out, datetime.utcnow().strftime('bench-%Y%m%dT%H%M%SZ.json'))
+    with open(out_path, 'w') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    print(f"✓ Report written to {out_path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,155 @@
+"""Synthetic production-scale dataset for the benchmark driver.
+
+    python -m bench.generate --path /tmp/bench.db --words 200000 --reviews 10000000
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.migrations import run_migrations  # noqa: E402
+
+SYLLABLES = ['a', 'i', 'u', 'e', 'o', 'ka', 'ki', 'ku', 'ke', 'ko', 'sa', 'shi', 'su', 'se', 'so',
+             'ta', 'chi', 'tsu', 'te', 'to', 'na', 'ni', 'nu', 'ne', 'no', 'ha', 'hi', 'fu', 'he', 'ho',
+             'ma', 'mi', 'mu', 'me', 'mo', 'ya', 'yu', 'yo', 'ra', 'ri', 'ru', 're', 'ro', 'wa', 'n']
+KANA = 'あいうえおかきくけこさしすせそたちつてとなにぬねのはひふへほまみむめもやゆよらりるれろわん'
+TIMESTAMP = '%Y-%m-%d %H:%M:%S.%f'
+CHUNK = 100000
+
+
+def _chunks(rows, size=CHUNK):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _insert(conn, sql, rows, label, total):
+    started = time.monotonic()
+    done = 0
+    for chunk in _chunks(rows):
+        conn.executemany(sql, chunk)
+        conn.commit()
+        done += len(chunk)
+        rate = done / max(time.monotonic() - started, 1e-9)
+        print(f"    {label}: {done:,}/{total:,} ({rate:,.0f} rows/s)", flush=True)
+
+
+def generate(path, words, groups, sessions, reviews, days, seed=42, rebuild=True):
+    """Create a migrated database at ``path`` filled with synthetic data"""
+    rng = random.Random(seed)
+    if os.path.exists(path):
+        os.remove(path)
+
+    conn = sqlite3.connect(path)
+    run_migrations(conn)
+    conn.execute('PRAGMA journal_mode = WAL')
+    conn.execute('PRAGMA synchronous = OFF')
+    conn.execute('PRAGMA cache_size = -262144')
+
+    def word_rows():
+        for i in range(1, words + 1):
+            length = rng.randint(1, 4)
+            picks = [rng.randrange(len(SYLLABLES)) for _ in range(length)]
+            romaji = ''.join(SYLLABLES[p] for p in picks) + str(i)
+            japanese = ''.join(KANA[p % len(KANA)] for p in picks)
+            yield (i, japanese, romaji, f'meaning {i}', '[]')
+
+    print(f"  Generating {words:,} words, {groups:,} groups, {sessions:,} sessions, {reviews:,} reviews")
+    _insert(conn, 'INSERT INTO words (id, japanese, romaji, english, parts) VALUES (?, ?, ?, ?, ?)',
+            word_rows(), 'words', words)
+    conn.executemany('INSERT INTO groups (id, name) VALUES (?, ?)',
+                     [(g, f'Group {g}') for g in range(1, groups + 1)])
+
+    members = {g: [] for g in range(1, groups + 1)}
+
+    def membership_rows():
+        for word_id in range(1, words + 1):
+            for group_id in rng.sample(range(1, groups + 1), min(groups, rng.choice((1, 1, 2)))):
+                members[group_id].append(word_id)
+                yield (word_id, group_id)
+
+    _insert(conn, 'INSERT INTO words_groups (word_id, group_id) VALUES (?, ?)',
+            membership_rows(), 'memberships', words)
+
+    conn.executemany(
+        'INSERT INTO study_activities (id, name, activity_type, launch_url, created_at) VALUES (?, ?, ?, ?, ?)',
+        [(1, 'Hiragana Quiz', 'quiz', 'https://external-app.com/hiragana', datetime.utcnow().strftime(TIMESTAMP)),
+         (2, 'Katakana Quiz', 'quiz', 'https://external-app.com/katakana', datetime.utcnow().strftime(TIMESTAMP))],
+    )
+
+    now = datetime.utcnow()
+    start = now - timedelta(days=days)
+    span = int((now - start).total_seconds())
+    session_starts = sorted(rng.randrange(span) for _ in range(sessions))
+    session_groups = [rng.randint(1, groups) for _ in range(sessions)]
+
+    def session_rows():
+        for i, offset in enumerate(session_starts):
+            created = start + timedelta(seconds=offset)
+            yield (i + 1, session_groups[i], rng.randint(1, 2), created.strftime(TIMESTAMP))
+
+    _insert(conn, 'INSERT INTO study_sessions (id, group_id, study_activity_id, created_at) VALUES (?, ?, ?, ?)',
+            session_rows(), 'sessions', sessions)
+
+    def review_rows():
+        for i in range(reviews):
+            s = rng.randrange(sessions)
+            pool = members[session_groups[s]] or [rng.randint(1, words)]
+            created = start + timedelta(seconds=session_starts[s] + rng.randrange(3600))
+            yield (pool[rng.randrange(len(pool))], s + 1, rng.random() < 0.7, created.strftime(TIMESTAMP))
+
+    if sessions:
+        _insert(conn, 'INSERT INTO words_review_items (word_id, study_session_id, correct, created_at) VALUES (?, ?, ?, ?)',
+                review_rows(), 'reviews', reviews)
+    conn.execute('ANALYZE')
+    conn.commit()
+    conn.close()
+
+    if rebuild:
+        rebuild_derived(path)
+
+
+def rebuild_derived(path):
+    """Rebuild every table derived from review history through the app's own code"""
+    from app import create_app
+    from models import db
+    from services.word_stats import rebuild_word_stats
+    from services.rollups import rebuild_daily_activity
+    from services.scheduler import rebuild_schedules
+
+    app = create_app({'DATABASE_PATH': path})
+    with app.app_context():
+        for rebuild in (rebuild_word_stats, rebuild_daily_activity, rebuild_schedules):
+            started = time.monotonic()
+            rebuild()
+            db.session.commit()
+            print(f"    {rebuild.__name__}: {time.monotonic() - started:.1f}s", flush=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--path', default='bench.db')
+    parser.add_argument('--words', type=int, default=20000)
+    parser.add_argument('--groups', type=int, default=50)
+    parser.add_argument('--sessions', type=int, default=20000)
+    parser.add_argument('--reviews', type=int, default=1000000)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--no-rebuild', action='store_true', help='skip rebuilding derived tables')
+    args = parser.parse_args(argv)
+    generate(os.path.abspath(args.path), args.words, args.groups, args.sessions, args.reviews, args.days,
+             seed=args.seed, rebuild=not args.no_rebuild)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+-- Schema of a learner database (multi-learner mode): the study history of
+-- one learner. The vocabulary tables live in the shared catalog database,
+-- attached to every learner connection as "catalog", so ids here refer to
+-- catalog rows and carry no FOREIGN KEY clauses. Changes to the history
+-- tables in db/migrations need a matching file here.
+CREATE TABLE IF NOT EXISTS study_sessions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    group_id INTEGER NOT NULL,
+    study_activity_id INTEGER,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS words_review_items (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    word_id INTEGER NOT NULL,
+    study_session_id INTEGER NOT NULL,
+    correct BOOLEAN NOT NULL,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (study_session_id) REFERENCES study_sessions(id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_study_sessions_group_id ON study_sessions(group_id);
+CREATE INDEX IF NOT EXISTS idx_study_sessions_activity_id ON study_sessions(study_activity_id);
+CREATE INDEX IF NOT EXISTS idx_words_review_word_id ON words_review_items(word_id);
+CREATE INDEX IF NOT EXISTS idx_words_review_session_id ON words_review_items(study_session_id);
+CREATE INDEX IF NOT EXISTS idx_words_review_word_created ON words_review_items(word_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_words_review_created_at ON words_review_items(created_at);
+
+CREATE TABLE IF NOT EXISTS word_review_stats (
+    word_id INTEGER PRIMARY KEY,
+    correct_count INTEGER NOT NULL DEFAULT 0,
+    wrong_count INTEGER NOT NULL DEFAULT 0,
+    last_reviewed_at DATETIME
+);
+
+CREATE TABLE IF NOT EXISTS daily_activity (
+    day DATE NOT NULL,
+    group_id INTEGER NOT NULL,
+    sessions_count INTEGER NOT NULL DEFAULT 0,
+    reviews_count INTEGER NOT NULL DEFAULT 0,
+    correct_count INTEGER NOT NULL DEFAULT 0,
+    last_session_id INTEGER,
+    last_session_at DATETIME,
+    PRIMARY KEY (day, group_id)
+);
+
+CREATE TABLE IF NOT EXISTS review_batches (
+    idempotency_key TEXT PRIMARY KEY,
+    study_session_id INTEGER NOT NULL,
+    response TEXT NOT NULL,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (study_session_id) REFERENCES study_sessions(id)
+);
+
+CREATE TABLE IF NOT EXISTS word_schedules (
+    word_id INTEGER PRIMARY KEY,
+    repetitions INTEGER NOT NULL DEFAULT 0,
+    interval_days REAL NOT NULL DEFAULT 0,
+    ease REAL NOT NULL DEFAULT 2.5,
+    due_at DATETIME NOT NULL,
+    last_reviewed_at DATETIME
+);
+
+CREATE INDEX IF NOT EXISTS idx_word_schedules_due_at ON word_schedules(due_at);
+
+CREATE TABLE IF NOT EXISTS review_aggregates (
+    study_session_id INTEGER NOT NULL,
+    word_id INTEGER NOT NULL,
+    day DATE NOT NULL,
+    correct_count INTEGER NOT NULL DEFAULT 0,
+    wrong_count INTEGER NOT NULL DEFAULT 0,
+    last_reviewed_at DATETIME,
+    PRIMARY KEY (study_session_id, word_id, day),
+    FOREIGN KEY (study_session_id) REFERENCES study_sessions(id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_review_aggregates_word_id ON review_aggregates(word_id);
+
+CREATE TABLE IF NOT EXISTS schedule_checkpoints (
+    word_id INTEGER PRIMARY KEY,
+    repetitions INTEGER NOT NULL DEFAULT 0,
+    interval_days REAL NOT NULL DEFAULT 0,
+    ease REAL NOT NULL DEFAULT 2.5,
+    due_at DATETIME NOT NULL,
+    last_reviewed_at DATETIME
+);
+
+CREATE VIEW IF NOT EXISTS review_history AS
+SELECT study_session_id, word_id, DATE(created_at) AS day,
+       CASE WHEN correct THEN 1 ELSE 0 END AS correct_count,
+       CASE WHEN correct THEN 0 ELSE 1 END AS wrong_count,
+       created_at AS last_reviewed_at
+FROM words_review_items
+UNION ALL
+SELECT study_session_id, word_id, day, correct_count, wrong_count, last_reviewed_at
+FROM review_aggregates;
+
+-- The learner's own history data version; the catalog version stays in the
+-- catalog database's data_versions
+CREATE TABLE IF NOT EXISTS learner_versions (
+    name TEXT PRIMARY KEY,
+    version INTEGER NOT NULL DEFAULT 0
+);
+
+INSERT OR IGNORE INTO learner_versions (name, version) VALUES ('history', 0);
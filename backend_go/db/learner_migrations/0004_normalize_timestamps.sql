@@ -0,0 +1,30 @@
+-- Session and review timestamps in the one text form SQLAlchemy writes,
+-- 'YYYY-MM-DD HH:MM:SS.ffffff', so that text order is time order and keyset
+-- cursors compare exactly. DEFAULT CURRENT_TIMESTAMP and raw history imports
+-- store 'YYYY-MM-DD HH:MM:SS' (or an ISO 'T' form), which sorts below the same
+-- instant written by the app; the triggers rewrite such values on insert
+UPDATE study_sessions
+SET created_at = replace(substr(created_at, 1, 19), 'T', ' ') || '.' || substr(substr(created_at, 21) || '000000', 1, 6)
+WHERE created_at IS NOT NULL AND (length(created_at) <> 26 OR substr(created_at, 11, 1) <> ' ');
+
+UPDATE words_review_items
+SET created_at = replace(substr(created_at, 1, 19), 'T', ' ') || '.' || substr(substr(created_at, 21) || '000000', 1, 6)
+WHERE created_at IS NOT NULL AND (length(created_at) <> 26 OR substr(created_at, 11, 1) <> ' ');
+
+CREATE TRIGGER IF NOT EXISTS study_sessions_created_at_ai AFTER INSERT ON study_sessions
+WHEN new.created_at IS NOT NULL AND (length(new.created_at) <> 26 OR substr(new.created_at, 11, 1) <> ' ')
+BEGIN
+    UPDATE study_sessions
+    SET created_at = replace(substr(new.created_at, 1, 19), 'T', ' ') || '.'
+                     || substr(substr(new.created_at, 21) || '000000', 1, 6)
+    WHERE id = new.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS words_review_items_created_at_ai AFTER INSERT ON words_review_items
+WHEN new.created_at IS NOT NULL AND (length(new.created_at) <> 26 OR substr(new.created_at, 11, 1) <> ' ')
+BEGIN
+    UPDATE words_review_items
+    SET created_at = replace(substr(new.created_at, 1, 19), 'T', ' ') || '.'
+                     || substr(substr(new.created_at, 21) || '000000', 1, 6)
+    WHERE id = new.id;
+END;
@@ -0,0 +1,16 @@
+CREATE TABLE IF NOT EXISTS word_review_stats (
+    word_id INTEGER PRIMARY KEY,
+    correct_count INTEGER NOT NULL DEFAULT 0,
+    wrong_count INTEGER NOT NULL DEFAULT 0,
+    last_reviewed_at DATETIME,
+    FOREIGN KEY (word_id) REFERENCES words(id)
+);
+
+-- Backfill counters for history recorded before the table existed
+INSERT OR IGNORE INTO word_review_stats (word_id, correct_count, wrong_count, last_reviewed_at)
+SELECT word_id,
+       SUM(CASE WHEN correct THEN 1 ELSE 0 END),
+       SUM(CASE WHEN correct THEN 0 ELSE 1 END),
+       MAX(created_at)
+FROM words_review_items
+GROUP BY word_id;
@@ -0,0 +1,28 @@
+CREATE TABLE IF NOT EXISTS daily_activity (
+    day DATE NOT NULL,
+    group_id INTEGER NOT NULL,
+    sessions_count INTEGER NOT NULL DEFAULT 0,
+    reviews_count INTEGER NOT NULL DEFAULT 0,
+    correct_count INTEGER NOT NULL DEFAULT 0,
+    last_session_id INTEGER,
+    last_session_at DATETIME,
+    PRIMARY KEY (day, group_id),
+    FOREIGN KEY (group_id) REFERENCES groups(id)
+);
+
+-- Backfill rollups for history recorded before the table existed
+INSERT INTO daily_activity (day, group_id, sessions_count, reviews_count, correct_count, last_session_id, last_session_at)
+SELECT day, group_id, SUM(sessions_count), SUM(reviews_count), SUM(correct_count), last_session_id, MAX(last_session_at)
+FROM (
+    SELECT DATE(created_at) AS day, group_id, COUNT(*) AS sessions_count, 0 AS reviews_count, 0 AS correct_count,
+           id AS last_session_id, MAX(created_at) AS last_session_at
+    FROM study_sessions
+    GROUP BY DATE(created_at), group_id
+    UNION ALL
+    SELECT DATE(r.created_at), s.group_id, 0, COUNT(*), SUM(CASE WHEN r.correct THEN 1 ELSE 0 END), NULL, NULL
+    FROM words_review_items r
+    JOIN study_sessions s ON s.id = r.study_session_id
+    GROUP BY DATE(r.created_at), s.group_id
+)
+WHERE NOT EXISTS (SELECT 1 FROM daily_activity)
+GROUP BY day, group_id;
@@ -0,0 +1,7 @@
+CREATE TABLE IF NOT EXISTS review_batches (
+    idempotency_key TEXT PRIMARY KEY,
+    study_session_id INTEGER NOT NULL,
+    response TEXT NOT NULL,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (study_session_id) REFERENCES study_sessions(id)
+);
@@ -0,0 +1,30 @@
+-- Full-text/prefix index over the vocabulary, kept in sync by triggers
+CREATE VIRTUAL TABLE IF NOT EXISTS words_fts USING fts5(
+    japanese,
+    romaji,
+    english,
+    content='words',
+    content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2',
+    prefix='1 2 3'
+);
+
+CREATE TRIGGER IF NOT EXISTS words_fts_ai AFTER INSERT ON words BEGIN
+    INSERT INTO words_fts (rowid, japanese, romaji, english)
+    VALUES (new.id, new.japanese, new.romaji, new.english);
+END;
+
+CREATE TRIGGER IF NOT EXISTS words_fts_ad AFTER DELETE ON words BEGIN
+    INSERT INTO words_fts (words_fts, rowid, japanese, romaji, english)
+    VALUES ('delete', old.id, old.japanese, old.romaji, old.english);
+END;
+
+CREATE TRIGGER IF NOT EXISTS words_fts_au AFTER UPDATE OF japanese, romaji, english ON words BEGIN
+    INSERT INTO words_fts (words_fts, rowid, japanese, romaji, english)
+    VALUES ('delete', old.id, old.japanese, old.romaji, old.english);
+    INSERT INTO words_fts (rowid, japanese, romaji, english)
+    VALUES (new.id, new.japanese, new.romaji, new.english);
+END;
+
+-- Index words that existed before the triggers
+INSERT INTO words_fts (words_fts) VALUES ('rebuild');
@@ -0,0 +1,13 @@
+CREATE TABLE IF NOT EXISTS word_schedules (
+    word_id INTEGER PRIMARY KEY,
+    repetitions INTEGER NOT NULL DEFAULT 0,
+    interval_days REAL NOT NULL DEFAULT 0,
+    ease REAL NOT NULL DEFAULT 2.5,
+    due_at DATETIME NOT NULL,
+    last_reviewed_at DATETIME,
+    FOREIGN KEY (word_id) REFERENCES words(id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_word_schedules_due_at ON word_schedules(due_at);
+-- Lets the schedule rebuild stream history per word in review order
+CREATE INDEX IF NOT EXISTS idx_words_review_word_created ON words_review_items(word_id, created_at);
@@ -0,0 +1,39 @@
+-- Reviews older than the compaction horizon, folded into per-word, per-session-day totals
+CREATE TABLE IF NOT EXISTS review_aggregates (
+    study_session_id INTEGER NOT NULL,
+    word_id INTEGER NOT NULL,
+    day DATE NOT NULL,
+    correct_count INTEGER NOT NULL DEFAULT 0,
+    wrong_count INTEGER NOT NULL DEFAULT 0,
+    last_reviewed_at DATETIME,
+    PRIMARY KEY (study_session_id, word_id, day),
+    FOREIGN KEY (study_session_id) REFERENCES study_sessions(id),
+    FOREIGN KEY (word_id) REFERENCES words(id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_review_aggregates_word_id ON review_aggregates(word_id);
+
+-- SM-2 state of each word after its compacted reviews; schedule rebuilds resume from here
+CREATE TABLE IF NOT EXISTS schedule_checkpoints (
+    word_id INTEGER PRIMARY KEY,
+    repetitions INTEGER NOT NULL DEFAULT 0,
+    interval_days REAL NOT NULL DEFAULT 0,
+    ease REAL NOT NULL DEFAULT 2.5,
+    due_at DATETIME NOT NULL,
+    last_reviewed_at DATETIME,
+    FOREIGN KEY (word_id) REFERENCES words(id)
+);
+
+-- Compaction walks raw reviews oldest first
+CREATE INDEX IF NOT EXISTS idx_words_review_created_at ON words_review_items(created_at);
+
+-- Raw and compacted reviews in one shape, for the rollup rebuilders
+CREATE VIEW IF NOT EXISTS review_history AS
+SELECT study_session_id, word_id, DATE(created_at) AS day,
+       CASE WHEN correct THEN 1 ELSE 0 END AS correct_count,
+       CASE WHEN correct THEN 0 ELSE 1 END AS wrong_count,
+       created_at AS last_reviewed_at
+FROM words_review_items
+UNION ALL
+SELECT study_session_id, word_id, day, correct_count, wrong_count, last_reviewed_at
+FROM review_aggregates;
@@ -0,0 +1,12 @@
+-- Most confusable words of each word within a group (kana look-alikes,
+-- romaji edit distance), maintained by services/distractors.py
+CREATE TABLE IF NOT EXISTS word_distractors (
+    group_id INTEGER NOT NULL,
+    word_id INTEGER NOT NULL,
+    distractor_id INTEGER NOT NULL,
+    score REAL NOT NULL,
+    PRIMARY KEY (group_id, word_id, distractor_id),
+    FOREIGN KEY (group_id) REFERENCES groups(id),
+    FOREIGN KEY (word_id) REFERENCES words(id),
+    FOREIGN KEY (distractor_id) REFERENCES words(id)
+) WITHOUT ROWID;
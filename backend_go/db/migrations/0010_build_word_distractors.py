@@ -0,0 +1,7 @@
+"""Build the distractor index of the groups that existed before 0009, one resumable step per group"""
+from services.distractors import build_group
+
+
+def upgrade(migration):
+    for (group_id,) in migration.conn.execute('SELECT id FROM groups ORDER BY id').fetchall():
+        migration.run(f'group {group_id}', lambda conn, group_id=group_id: build_group(conn, group_id))
@@ -0,0 +1,21 @@
+-- Denormalized member count of each group, kept current by triggers on words_groups
+ALTER TABLE groups ADD COLUMN word_count INTEGER NOT NULL DEFAULT 0;
+
+UPDATE groups SET word_count = (SELECT COUNT(*) FROM words_groups WHERE words_groups.group_id = groups.id);
+
+CREATE TRIGGER IF NOT EXISTS words_groups_count_ai AFTER INSERT ON words_groups BEGIN
+    UPDATE groups SET word_count = word_count + 1 WHERE id = new.group_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS words_groups_count_ad AFTER DELETE ON words_groups BEGIN
+    UPDATE groups SET word_count = word_count - 1 WHERE id = old.group_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS words_groups_count_au AFTER UPDATE OF group_id ON words_groups BEGIN
+    UPDATE groups SET word_count = word_count - 1 WHERE id = old.group_id;
+    UPDATE groups SET word_count = word_count + 1 WHERE id = new.group_id;
+END;
+
+-- Membership access path: a group's words in id order straight from the index
+CREATE INDEX IF NOT EXISTS idx_words_groups_group_id_word_id ON words_groups(group_id, word_id);
+DROP INDEX IF EXISTS idx_words_groups_group_id;
@@ -0,0 +1,10 @@
+-- Multi-learner mode: which shard directory holds each learner's database
+CREATE TABLE IF NOT EXISTS learner_shards (
+    learner_id TEXT PRIMARY KEY,
+    shard TEXT NOT NULL,
+    state TEXT NOT NULL DEFAULT 'active',
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    moved_at DATETIME
+);
+
+CREATE INDEX IF NOT EXISTS idx_learner_shards_shard ON learner_shards(shard);
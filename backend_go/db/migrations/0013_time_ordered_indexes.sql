@@ -0,0 +1,15 @@
+-- Newest-first session listings (all, per group, per activity) walk these in
+-- order instead of sorting every matching session; the rowid that ends each
+-- index entry breaks created_at ties the same way ORDER BY created_at, id does
+CREATE INDEX IF NOT EXISTS idx_study_sessions_created_at ON study_sessions(created_at);
+CREATE INDEX IF NOT EXISTS idx_study_sessions_group_id_created_at ON study_sessions(group_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_study_sessions_activity_id_created_at ON study_sessions(study_activity_id, created_at);
+DROP INDEX IF EXISTS idx_study_sessions_group_id;
+DROP INDEX IF EXISTS idx_study_sessions_activity_id;
+
+-- A session's reviews, newest first
+CREATE INDEX IF NOT EXISTS idx_words_review_session_id_created_at ON words_review_items(study_session_id, created_at);
+DROP INDEX IF EXISTS idx_words_review_session_id;
+
+ANALYZE study_sessions;
+ANALYZE words_review_items;
@@ -0,0 +1,29 @@
+-- Ranking key of the hardest-words leaderboards: the word's error rate smoothed
+-- towards a prior, (wrong + reviews * rate) / (correct + wrong + reviews). The
+-- backfill uses the default prior (HARDEST_PRIOR_REVIEWS = 5,
+-- HARDEST_PRIOR_ERROR_RATE = 0.25); review writes keep it current
+ALTER TABLE word_review_stats ADD COLUMN error_rate REAL NOT NULL DEFAULT 0;
+
+UPDATE word_review_stats SET error_rate = (wrong_count + 1.25) / (correct_count + wrong_count + 5.0);
+
+CREATE INDEX IF NOT EXISTS idx_word_review_stats_error_rate ON word_review_stats(error_rate);
+
+-- The same counters per group, over the reviews of that group's study sessions
+CREATE TABLE IF NOT EXISTS group_word_stats (
+    group_id INTEGER NOT NULL,
+    word_id INTEGER NOT NULL,
+    correct_count INTEGER NOT NULL DEFAULT 0,
+    wrong_count INTEGER NOT NULL DEFAULT 0,
+    error_rate REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (group_id, word_id)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_group_word_stats_group_id_error_rate ON group_word_stats(group_id, error_rate);
+
+INSERT OR IGNORE INTO group_word_stats (group_id, word_id, correct_count, wrong_count, error_rate)
+SELECT study_sessions.group_id, review_history.word_id,
+       SUM(review_history.correct_count), SUM(review_history.wrong_count),
+       (SUM(review_history.wrong_count) + 1.25) / (SUM(review_history.correct_count) + SUM(review_history.wrong_count) + 5.0)
+FROM review_history
+JOIN study_sessions ON study_sessions.id = review_history.study_session_id
+GROUP BY study_sessions.group_id, review_history.word_id;
@@ -0,0 +1,9 @@
+-- Group memberships whose quiz distractors still need indexing: written by
+-- vocabulary imports, drained in chunks by `invoke refresh-distractors`.
+-- rebuild marks the members of a group being rescored from scratch.
+CREATE TABLE IF NOT EXISTS distractor_refresh_queue (
+    group_id INTEGER NOT NULL,
+    word_id INTEGER NOT NULL,
+    rebuild INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (group_id, word_id)
+) WITHOUT ROWID;
@@ -1,9 +1,10 @@
 from flask_sqlalchemy import SQLAlchemy
+from services.storage import RoutingSession
 import json
 from datetime import datetime
 
 # Create db instance here, not import from app
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 class Word(db.Model):
     __tablename__ = 'words'
@@ -14,6 +15,8 @@ class Word(db.Model):
     english = db.Column(db.String(255), nullable=False)
     parts = db.Column(db.String(500))
     
+    stats = db.relationship('WordReviewStats', uselist=False, lazy='joined')
+    
     def to_dict(self, include_groups=False):
         data = {
             'id': self.id,
@@ -28,21 +31,61 @@ class Word(db.Model):
             except:
                 data['parts'] = []
         
-        correct_count = sum(1 for item in self.review_items if item.correct)
-        wrong_count = sum(1 for item in self.review_items if not item.correct)
-        data['correct_count'] = correct_count
-        data['wrong_count'] = wrong_count
+        stats = self.stats
+        data['correct_count'] = stats.correct_count if stats else 0
+        data['wrong_count'] = stats.wrong_count if stats else 0
+        data['last_reviewed_at'] = stats.last_reviewed_at.isoformat() + 'Z' if stats and stats.last_reviewed_at else None
         
         if include_groups:
             data['groups'] = [{'id': g.id, 'name': g.name} for g in self.groups]
         
         return data
 
+class WordReviewStats(db.Model):
+    __tablename__ = 'word_review_stats'
+    
+    word_id = db.Column(db.Integer, db.ForeignKey('words.id'), primary_key=True)
+    correct_count = db.Column(db.Integer, nullable=False, default=0)
+    wrong_count = db.Column(db.Integer, nullable=False, default=0)
+    last_reviewed_at = db.Column(db.DateTime)
+    # smoothed, see services.word_stats.smoothed_error_rate
+    error_rate = db.Column(db.Float, nullable=False, default=0)
+
+class GroupWordStats(db.Model):
+    __tablename__ = 'group_word_stats'
+    
+    group_id = db.Column(db.Integer, primary_key=True)
+    word_id = db.Column(db.Integer, primary_key=True)
+    correct_count = db.Column(db.Integer, nullable=False, default=0)
+    wrong_count = db.Column(db.Integer, nullable=False, default=0)
+    error_rate = db.Column(db.Float, nullable=False, default=0)
+
+class WordSchedule(db.Model):
+    __tablename__ = 'word_schedules'
+    
+    word_id = db.Column(db.Integer, db.ForeignKey('words.id'), primary_key=True)
+    repetitions = db.Column(db.Integer, nullable=False, default=0)
+    interval_days = db.Column(db.Float, nullable=False, default=0)
+    ease = db.Column(db.Float, nullable=False, default=2.5)
+    due_at = db.Column(db.DateTime, nullable=False)
+    last_reviewed_at = db.Column(db.DateTime)
+    
+    def to_dict(self):
+        return {
+            'repetitions': self.repetitions,
+            'interval_days': self.interval_days,
+            'ease': self.ease,
+            'due_at': self.due_at.isoformat() + 'Z' if self.due_at else None,
+            'last_reviewed_at': self.last_reviewed_at.isoformat() + 'Z' if self.last_reviewed_at else None,
+        }
+
 class Group(db.Model):
     __tablename__ = 'groups'
     
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(255), nullable=False, unique=True)
+    # maintained by triggers on words_groups
+    word_count = db.Column(db.Integer, nullable=False, default=0)
     
     words = db.relationship('Word', secondary='words_groups', backref='groups')
     
@@ -50,7 +93,7 @@ class Group(db.Model):
         return {
             'id': self.id,
             'name': self.name,
-            'word_count': len(self.words),
+            'word_count': self.word_count,
         }
 
 class WordsGroup(db.Model):
@@ -60,6 +103,65 @@ class WordsGroup(db.Model):
     word_id = db.Column(db.Integer, db.ForeignKey('words.id'), nullable=False)
     group_id = db.Column(db.Integer, db.ForeignKey('groups.id'), nullable=False)
 
+class LearnerVersion(db.Model):
+    __tablename__ = 'learner_versions'
+    
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+class WordDistractor(db.Model):
+    __tablename__ = 'word_distractors'
+    
+    group_id = db.Column(db.Integer, db.ForeignKey('groups.id'), primary_key=True)
+    word_id = db.Column(db.Integer, db.ForeignKey('words.id'), primary_key=True)
+    distractor_id = db.Column(db.Integer, db.ForeignKey('words.id'), primary_key=True)
+    score = db.Column(db.Float, nullable=False)
+
+class ReviewAggregate(db.Model):
+    __tablename__ = 'review_aggregates'
+    
+    study_session_id = db.Column(db.Integer, db.ForeignKey('study_sessions.id'), primary_key=True)
+    word_id = db.Column(db.Integer, db.ForeignKey('words.id'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    correct_count = db.Column(db.Integer, nullable=False, default=0)
+    wrong_count = db.Column(db.Integer, nullable=False, default=0)
+    last_reviewed_at = db.Column(db.DateTime)
+
+class ScheduleCheckpoint(db.Model):
+    __tablename__ = 'schedule_checkpoints'
+    
+    word_id = db.Column(db.Integer, db.ForeignKey('words.id'), primary_key=True)
+    repetitions = db.Column(db.Integer, nullable=False, default=0)
+    interval_days = db.Column(db.Float, nullable=False, default=0)
+    ease = db.Column(db.Float, nullable=False, default=2.5)
+    due_at = db.Column(db.DateTime, nullable=False)
+    last_reviewed_at = db.Column(db.DateTime)
+
+class ReviewBatch(db.Model):
+    __tablename__ = 'review_batches'
+    
+    idempotency_key = db.Column(db.String(255), primary_key=True)
+    study_session_id = db.Column(db.Integer, db.ForeignKey('study_sessions.id'), nullable=False)
+    response = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class DailyActivity(db.Model):
+    __tablename__ = 'daily_activity'
+    
+    day = db.Column(db.Date, primary_key=True)
+    group_id = db.Column(db.Integer, db.ForeignKey('groups.id'), primary_key=True)
+    sessions_count = db.Column(db.Integer, nullable=False, default=0)
+    reviews_count = db.Column(db.Integer, nullable=False, default=0)
+    correct_count = db.Column(db.Integer, nullable=False, default=0)
+    last_session_id = db.Column(db.Integer)
+    last_session_at = db.Column(db.DateTime)
+
+class DataVersion(db.Model):
+    __tablename__ = 'data_versions'
+    
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
 class StudyActivity(db.Model):
     __tablename__ = 'study_activities'
     
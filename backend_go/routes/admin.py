@@ -1,14 +1,36 @@
-from flask import Blueprint, jsonify
-from models import db, StudySession, WordsReviewItem
+from flask import Blueprint, jsonify, current_app, request
+from models import db, StudySession, WordsReviewItem, ReviewBatch, ReviewAggregate, ScheduleCheckpoint
+from services.word_stats import rebuild_word_stats
+from services.rollups import rebuild_daily_activity
+from services.scheduler import rebuild_schedules
+from services.data_version import bump_versions, current_versions, HISTORY
+from services.response_cache import get_response_cache
+from services.snapshots import reset_database
+from services.review_buffer import flush_pending_reviews, get_review_buffer
+from services.metrics import get_metrics
+from services.catalog import get_catalog
+from services.compaction import compact_reviews, compaction_cutoff
+from services.history_io import HistoryImporter, IMPORT_MODES, iter_chunks, iter_history_lines
+from services.storage import READER_BIND, learner_engine
 from datetime import datetime
+import gzip
+import io
 
 admin_bp = Blueprint('admin', __name__)
 
 @admin_bp.route('/reset_history', methods=['POST'])
 def reset_history():
     """Clear all study sessions and review items, keep vocabulary."""
+    flush_pending_reviews(strict=True)
     deleted_sessions = StudySession.query.delete()
     deleted_reviews  = WordsReviewItem.query.delete()
+    ReviewAggregate.query.delete()
+    ScheduleCheckpoint.query.delete()
+    ReviewBatch.query.delete()
+    rebuild_word_stats()
+    rebuild_daily_activity()
+    rebuild_schedules()
+    bump_versions(HISTORY)
     db.session.commit()
     return jsonify({
         'message': 'Study history reset successfully',
@@ -18,23 +40,126 @@ def reset_history():
 
 @admin_bp.route('/full_reset', methods=['POST'])
 def full_reset():
-    """Drop all data, re-run migrations, re-seed with default sets."""
-    db.drop_all()
-    db.create_all()
-
-    # re-insert default study activities
-    from models import StudyActivity
-    activities = [
-        StudyActivity(name='Hiragana Quiz',  activity_type='quiz',
-                      launch_url='https://external-app.com/hiragana'),
-        StudyActivity(name='Katakana Quiz', activity_type='quiz',
-                      launch_url='https://external-app.com/katakana')
-    ]
-    for a in activities:
-        db.session.add(a)
+    """Restore the database from the pristine migrated and seeded template."""
+    if learner_engine() is not None:
+        return jsonify({'error': 'full_reset resets the shared catalog; call it without a learner id'}), 400
+    flush_pending_reviews(strict=True)
+    # hand the writer connection back to the pool for the raw restore connection
     db.session.commit()
+    conn = db.engine.raw_connection()
+    try:
+        reset_database(conn.driver_connection, current_app.config['RESET_TEMPLATE_PATH'])
+    finally:
+        conn.close()
 
     return jsonify({
         'message': 'Database reset and reseeded successfully',
         'timestamp': datetime.utcnow().isoformat() + 'Z'
-    }), 200
\ No newline at end of file
+    }), 200
+
+@admin_bp.route('/history/export', methods=['GET'])
+def export_history():
+    """Stream every study session and review item as NDJSON (?gzip=1 to compress)."""
+    flush_pending_reviews()
+    compress = request.args.get('gzip', '0').lower() not in ('0', 'false', 'no', '')
+    conn = (learner_engine() or db.engines.get(READER_BIND, db.engine)).raw_connection()
+    
+    def generate():
+        try:
+            yield from iter_chunks(iter_history_lines(conn), compress=compress)
+        finally:
+            conn.close()
+    
+    filename = datetime.utcnow().strftime('history-%Y%m%dT%H%M%SZ.ndjson') + ('.gz' if compress else '')
+    return current_app.response_class(
+        generate(),
+        mimetype='application/gzip' if compress else 'application/x-ndjson',
+        headers={'Content-Disposition': f'attachment; filename={filename}'},
+    )
+
+@admin_bp.route('/history/import', methods=['POST'])
+def import_history():
+    """Merge (default) or restore (?mode=restore) an NDJSON history export from the body."""
+    mode = request.args.get('mode', 'merge')
+    if mode not in IMPORT_MODES:
+        return jsonify({'error': f"mode must be one of {', '.join(IMPORT_MODES)}"}), 400
+    
+    flush_pending_reviews(strict=True)
+    # hand the writer connection back to the pool for the raw import connection
+    db.session.commit()
+    
+    stream = request.stream
+    if request.content_encoding == 'gzip' or request.mimetype == 'application/gzip':
+        stream = gzip.GzipFile(fileobj=stream, mode='rb')
+    conn = (learner_engine() or db.engine).raw_connection()
+    try:
+        with HistoryImporter(conn, mode=mode) as importer:
+            importer.import_lines(io.TextIOWrapper(stream, encoding='utf-8'))
+    except (ValueError, OSError, EOFError) as e:
+        return jsonify({'error': str(e)}), 400
+    finally:
+        conn.close()
+    
+    rebuild_word_stats()
+    rebuild_daily_activity()
+    rebuild_schedules()
+    # the importer's own bump predates these counters; responses cached in
+    # between would otherwise outlive them
+    bump_versions(HISTORY)
+    db.session.commit()
+    return jsonify(dict(importer.stats, message='Study history imported successfully', mode=mode)), 200
+
+@admin_bp.route('/compact_reviews', methods=['POST'])
+def compact_review_history():
+    """Fold reviews older than the horizon (?horizon_days=) into per-word daily aggregates."""
+    horizon_days = request.args.get('horizon_days', current_app.config['REVIEW_COMPACTION_HORIZON_DAYS'], type=int)
+    batch_size = request.args.get('batch_size', current_app.config['REVIEW_COMPACTION_BATCH_SIZE'], type=int)
+    if horizon_days < 0 or batch_size < 1:
+        return jsonify({'error': 'horizon_days must be >= 0 and batch_size >= 1'}), 400
+    
+    flush_pending_reviews(strict=True)
+    before = compaction_cutoff(horizon_days)
+    stats = compact_reviews(before, batch_size=batch_size)
+    return jsonify(dict(stats, message='Review history compacted', before=before.isoformat() + 'Z')), 200
+
+@admin_bp.route('/cache_stats', methods=['GET'])
+def cache_stats():
+    """Hit/miss counters of the catalog response cache."""
+    cache = get_response_cache()
+    return jsonify({
+        'enabled': cache is not None,
+        'response_cache': cache.stats() if cache is not None else None,
+        'data_versions': current_versions(),
+    })
+
+@admin_bp.route('/catalog_stats', methods=['GET'])
+def catalog_stats():
+    """Size and memory footprint of the in-memory vocabulary catalog."""
+    catalog = get_catalog()
+    if catalog is None:
+        return jsonify({'error': 'Catalog is disabled'}), 404
+    store = current_app.extensions['catalog']
+    return jsonify(dict(catalog.stats(), load_seconds=store.load_seconds))
+
+@admin_bp.route('/metrics', methods=['GET'])
+def metrics():
+    """Request, SQL and N+1 metrics in the Prometheus text format."""
+    collected = get_metrics()
+    if collected is None:
+        return jsonify({'error': 'Metrics are disabled'}), 404
+
+    gauges = []
+    cache = get_response_cache()
+    if cache is not None:
+        stats = cache.stats()
+        gauges.append(('response_cache_bytes', 'gauge', 'Bytes held by the response cache',
+                       [('', {}, stats['bytes'])]))
+        gauges.append(('response_cache_lookups_total', 'counter', 'Response cache lookups by result',
+                       [('', {'result': 'hit'}, stats['hits']), ('', {'result': 'miss'}, stats['misses'])]))
+    buffer = get_review_buffer()
+    if buffer is not None:
+        gauges.append(('review_buffer_pending', 'gauge', 'Reviews acknowledged but not yet written',
+                       [('', {}, len(buffer))]))
+
+    return current_app.response_class(collected.render(gauges),
+                                      mimetype='text/plain; version=0.0.4')
@@ -1,65 +1,146 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, jsonify, request, abort
 from models import db, Group, Word, StudySession
+from services.scheduler import due_words
+from datetime import datetime
+from services.pagination import cached_count, paginate, paginate_ids
+from services.catalog import WORD_FIELDS, Catalog, get_catalog, word_row_to_dict, words_to_dicts
+from services.list_responses import compress_response, list_response, parse_fields, project
+from services.memberships import group_words_page
+from services.review_buffer import consistent_read
+from services.response_cache import cached_response
+from services.data_version import CATALOG, HISTORY
+from services.session_summaries import SESSION_FIELDS, SESSION_ORDER, summarize_sessions, summary_to_dict
+from services.quiz import MAX_CHOICES, MAX_QUESTIONS, build_quiz
+from services.leaderboard import hardest_words
+import random
 
 groups_bp = Blueprint('groups', __name__)
+groups_bp.after_request(compress_response)
 
-def paginate_query(query, page=1, per_page=100):
-    total_items = query.count()
-    total_pages = (total_items + per_page - 1) // per_page
-    items = query.offset((page - 1) * per_page).limit(per_page).all()
-    
-    return items, {
-        'current_page': page,
-        'per_page': per_page,
-        'total_pages': total_pages,
-        'total_items': total_items,
-    }
+GROUP_FIELDS = ('id', 'name', 'word_count')
 
 @groups_bp.route('/groups', methods=['GET'])
+@cached_response(CATALOG)
 def get_groups():
-    page = request.args.get('page', 1, type=int)
+    fields = parse_fields(GROUP_FIELDS) or GROUP_FIELDS
+    catalog = get_catalog()
+    if catalog is None:
+        columns = [Group.id] + [getattr(Group, name) for name in fields if name != 'id']
+        groups, pagination = paginate(db.session.query(*columns), [Group.id], count=lambda: cached_count(Group.query))
+        return list_response(groups, pagination, lambda row: {name: getattr(row, name) for name in fields})
     
-    query = Group.query
-    groups, pagination = paginate_query(query, page)
+    group_ids, pagination = paginate_ids(catalog.group_ids)
+    groups = [{'id': g.id, 'name': g.name, 'word_count': len(g.word_ids)} for g in map(catalog.group, group_ids)]
     
-    return jsonify({
-        'data': [g.to_dict() for g in groups],
-        'pagination': pagination,
-    })
+    return list_response(groups, pagination, lambda group: project(group, fields))
 
 @groups_bp.route('/groups/<int:group_id>', methods=['GET'])
+@cached_response(CATALOG)
 def get_group(group_id):
-    group = Group.query.get_or_404(group_id)
+    catalog = get_catalog()
+    if catalog is None:
+        group = Group.query.get_or_404(group_id)
+        word_count = group.word_count
+    else:
+        group = catalog.group(group_id)
+        if group is None:
+            abort(404)
+        word_count = len(group.word_ids)
     
     return jsonify({
         'id': group.id,
         'name': group.name,
-        'total_word_count': len(group.words),
+        'total_word_count': word_count,
         'created_at': '2025-01-01T00:00:00Z',
     })
 
 @groups_bp.route('/groups/<int:group_id>/words', methods=['GET'])
+@consistent_read
+@cached_response(CATALOG, HISTORY)
 def get_group_words(group_id):
-    group = Group.query.get_or_404(group_id)
-    page = request.args.get('page', 1, type=int)
+    fields = parse_fields(WORD_FIELDS)
+    catalog = get_catalog()
+    if catalog is None:
+        words, pagination = group_words_page(Group.query.get_or_404(group_id), fields=fields)
+        if fields is None:
+            return list_response(words, pagination, Word.to_dict)
+        return list_response(words, pagination, lambda row: word_row_to_dict(row, fields))
+    
+    group = catalog.group(group_id)
+    if group is None:
+        abort(404)
+    
+    word_ids, pagination = paginate_ids(group.word_ids)
+    
+    return list_response(words_to_dicts(catalog, word_ids, fields), pagination)
+
+@groups_bp.route('/groups/<int:group_id>/quiz', methods=['GET'])
+def get_group_quiz(group_id):
+    catalog = get_catalog() or Catalog.load_group(db.session.connection(), group_id)
+    group = catalog.group(group_id)
+    if group is None:
+        abort(404)
+    n = max(1, min(request.args.get('n', 20, type=int), MAX_QUESTIONS))
+    choices = max(2, min(request.args.get('choices', 4, type=int), MAX_CHOICES))
+    seed = request.args.get('seed', type=int)
     
-    query = Word.query.filter(Word.groups.contains(group))
-    words, pagination = paginate_query(query, page)
+    questions = build_quiz(catalog, group, n, choices, random.Random(seed))
     
     return jsonify({
-        'data': [w.to_dict() for w in words],
+        'group_id': group.id,
+        'group_name': group.name,
+        'data': questions,
+    })
+
+@groups_bp.route('/groups/<int:group_id>/hardest', methods=['GET'])
+@consistent_read
+@cached_response(CATALOG, HISTORY)
+def get_group_hardest_words(group_id):
+    catalog = get_catalog()
+    if (catalog.group(group_id) if catalog is not None else db.session.get(Group, group_id)) is None:
+        abort(404)
+    
+    data, pagination = hardest_words(group_id)
+    return jsonify({
+        'data': data,
         'pagination': pagination,
     })
 
 @groups_bp.route('/groups/<int:group_id>/study_sessions', methods=['GET'])
+@consistent_read
 def get_group_study_sessions(group_id):
     group = Group.query.get_or_404(group_id)
-    page = request.args.get('page', 1, type=int)
+    fields = parse_fields(SESSION_FIELDS)
+    
+    query = StudySession.query.filter_by(group_id=group_id)
+    sessions, pagination = paginate(query, SESSION_ORDER, descending=True,
+                                    fetch=lambda page: summarize_sessions(page, fields))
     
-    query = StudySession.query.filter_by(group_id=group_id).order_by(StudySession.created_at.desc())
-    sessions, pagination = paginate_query(query, page)
+    return list_response(sessions, pagination, lambda s: summary_to_dict(s, fields))
+
+@groups_bp.route('/groups/<int:group_id>/due', methods=['GET'])
+@consistent_read
+def get_group_due_words(group_id):
+    Group.query.get_or_404(group_id)
+    limit = max(1, min(request.args.get('limit', 20, type=int), 500))
+    include_new = request.args.get('include_new', '1').lower() not in ('0', 'false', 'no')
+    
+    due, new_ids = due_words(group_id, datetime.utcnow(), limit, include_new)
+    words = {w.id: w for w in Word.query.filter(Word.id.in_([s.word_id for s in due] + new_ids))}
+    
+    # schedules and memberships are not tied to words by a foreign key;
+    # skip ids whose word row is gone
+    due = [s for s in due if s.word_id in words]
+    new_ids = [word_id for word_id in new_ids if word_id in words]
+    
+    data = []
+    for schedule in due:
+        data.append(dict(words[schedule.word_id].to_dict(), status='due', schedule=schedule.to_dict()))
+    for word_id in new_ids:
+        data.append(dict(words[word_id].to_dict(), status='new', schedule=None))
     
     return jsonify({
-        'data': [s.to_dict() for s in sessions],
-        'pagination': pagination,
+        'data': data,
+        'due_count': len(due),
+        'new_count': len(new_ids),
     })
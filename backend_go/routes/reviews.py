@@ -1,8 +1,15 @@
-from flask import Blueprint, jsonify, request
-from models import db, WordsReviewItem, StudySession, Word
+from flask import Blueprint, g, jsonify, request
+from models import db, StudySession, Word, ReviewBatch
+from services.reviews import record_reviews
+from services.review_buffer import get_review_buffer, BufferFull, PendingReview
+from sqlalchemy.exc import IntegrityError
+from datetime import datetime, timezone
+import json
 
 reviews_bp = Blueprint('reviews', __name__)
 
+MAX_BATCH_SIZE = 1000
+
 @reviews_bp.route('/study_sessions/<int:session_id>/words/<int:word_id>/review', methods=['POST'])
 def record_review(session_id, word_id):
     data = request.get_json(silent=True) or {}
@@ -12,21 +19,128 @@ def record_review(session_id, word_id):
         return jsonify({'error': 'correct (boolean) is required'}), 400
 
     # ensure session and word exist
-    StudySession.query.get_or_404(session_id)
+    session = StudySession.query.get_or_404(session_id)
     Word.query.get_or_404(word_id)
 
-    item = WordsReviewItem(
-        study_session_id=session_id,
-        word_id=word_id,
-        correct=correct
-    )
-    db.session.add(item)
+    created_at = datetime.utcnow()
+    
+    buffer = get_review_buffer()
+    if buffer is not None:
+        try:
+            buffer.submit(PendingReview(session.id, session.group_id, word_id, correct, created_at,
+                                        g.get('learner_id')))
+        except BufferFull:
+            response = jsonify({'error': 'Review buffer is full, retry shortly'})
+            response.headers['Retry-After'] = '1'
+            return response, 503
+        return jsonify({
+            'id': None,
+            'status': 'queued',
+            'word_id': word_id,
+            'study_session_id': session_id,
+            'correct': correct,
+            'created_at': created_at.isoformat() + 'Z'
+        }), 202
+    
+    [item_id] = record_reviews(session, [{'word_id': word_id, 'correct': correct, 'created_at': created_at}])
     db.session.commit()
 
     return jsonify({
-        'id': item.id,
-        'word_id': item.word_id,
-        'study_session_id': item.study_session_id,
-        'correct': item.correct,
-        'created_at': item.created_at.isoformat() + 'Z'
-    }), 201
\ No newline at end of file
+        'id': item_id,
+        'word_id': word_id,
+        'study_session_id': session_id,
+        'correct': correct,
+        'created_at': created_at.isoformat() + 'Z'
+    }), 201
+
+def parse_reviewed_at(value):
+    """Parse an ISO-8601 timestamp into a naive UTC datetime"""
+    if not isinstance(value, str):
+        raise TypeError('reviewed_at must be a string')
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+def is_word_id(value):
+    # JSON true/false arrive as bool, which is an int subclass
+    return isinstance(value, int) and not isinstance(value, bool)
+
+@reviews_bp.route('/study_sessions/<int:session_id>/reviews', methods=['POST'])
+def record_review_batch(session_id):
+    data = request.get_json(silent=True)
+    items = data.get('reviews') if isinstance(data, dict) else data
+    key = request.headers.get('Idempotency-Key') or (data.get('idempotency_key') if isinstance(data, dict) else None)
+
+    if not isinstance(items, list) or not items:
+        return jsonify({'error': 'reviews (non-empty array) is required'}), 400
+    if len(items) > MAX_BATCH_SIZE:
+        return jsonify({'error': f'at most {MAX_BATCH_SIZE} reviews per batch'}), 400
+
+    if key:
+        replay = db.session.get(ReviewBatch, key)
+        if replay:
+            return replay_batch(replay, session_id)
+
+    session = StudySession.query.get_or_404(session_id)
+
+    word_ids = {i.get('word_id') for i in items if isinstance(i, dict) and is_word_id(i.get('word_id'))}
+    known_ids = {row[0] for row in db.session.query(Word.id).filter(Word.id.in_(word_ids))} if word_ids else set()
+
+    now = datetime.utcnow()
+    results = []
+    accepted = []
+    for index, item in enumerate(items):
+        error = None
+        if not isinstance(item, dict):
+            error = 'review must be an object'
+        elif not is_word_id(item.get('word_id')) or item['word_id'] not in known_ids:
+            error = 'word not found'
+        elif not isinstance(item.get('correct'), bool):
+            error = 'correct (boolean) is required'
+        else:
+            created_at = now
+            if item.get('reviewed_at') is not None:
+                try:
+                    created_at = parse_reviewed_at(item['reviewed_at'])
+                except (TypeError, ValueError):
+                    error = 'reviewed_at must be an ISO-8601 timestamp'
+
+        if error:
+            results.append({'index': index, 'status': 'rejected', 'error': error})
+            continue
+
+        results.append({'index': index, 'status': 'created', 'word_id': item['word_id'], 'correct': item['correct'],
+                        'created_at': created_at.isoformat() + 'Z'})
+        accepted.append((results[-1], {'word_id': item['word_id'], 'correct': item['correct'], 'created_at': created_at}))
+
+    ids = record_reviews(session, [review for _, review in accepted])
+    for (result, _), item_id in zip(accepted, ids):
+        result['id'] = item_id
+
+    body = {
+        'study_session_id': session_id,
+        'created': len(accepted),
+        'rejected': len(items) - len(accepted),
+        'results': results,
+    }
+    if key:
+        db.session.add(ReviewBatch(idempotency_key=key, study_session_id=session_id, response=json.dumps(body)))
+
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        if not key:
+            raise
+        # a concurrent retry with the same key won the race
+        return replay_batch(db.session.get(ReviewBatch, key), session_id)
+
+    return jsonify(body), 201
+
+def replay_batch(batch, session_id):
+    if batch.study_session_id != session_id:
+        return jsonify({'error': 'Idempotency-Key already used for another session'}), 409
+    response = jsonify(json.loads(batch.response))
+    response.headers['Idempotent-Replayed'] = 'true'
+    return response, 200
@@ -1,34 +1,27 @@
 from flask import Blueprint, jsonify, request
 from models import db, StudyActivity, StudySession
+from services.pagination import paginate
+from services.review_buffer import consistent_read
+from services.session_summaries import SESSION_ORDER, summarize_sessions, summary_to_dict
+from services.data_version import bump_versions, HISTORY
+from services.rollups import record_session_activity
 
 study_activities_bp = Blueprint('study_activities', __name__)
 
-def paginate_query(query, page=1, per_page=100):
-    total = query.count()
-    pages = (total + per_page - 1) // per_page
-    items = query.offset((page-1)*per_page).limit(per_page).all()
-    return items, {
-        'current_page': page,
-        'per_page': per_page,
-        'total_pages': pages,
-        'total_items': total
-    }
-
 @study_activities_bp.route('/study_activities/<int:activity_id>', methods=['GET'])
 def get_activity(activity_id):
     activity = StudyActivity.query.get_or_404(activity_id)
     return jsonify(activity.to_dict())
 
 @study_activities_bp.route('/study_activities/<int:activity_id>/study_sessions', methods=['GET'])
+@consistent_read
 def activity_sessions(activity_id):
-    page = request.args.get('page', 1, type=int)
     # 404 if activity does not exist
     StudyActivity.query.get_or_404(activity_id)
-    query = StudySession.query.filter_by(study_activity_id=activity_id)\
-                              .order_by(StudySession.created_at.desc())
-    sessions, pag = paginate_query(query, page)
+    query = StudySession.query.filter_by(study_activity_id=activity_id)
+    sessions, pag = paginate(query, SESSION_ORDER, descending=True, fetch=summarize_sessions)
     return jsonify({
-        'data': [s.to_dict() for s in sessions],
+        'data': [summary_to_dict(s) for s in sessions],
         'pagination': pag
     })
 
@@ -53,6 +46,9 @@ def create_activity_session():
     # create the study session
     session = StudySession(group_id=group_id, study_activity_id=activity.id)
     db.session.add(session)
+    db.session.flush()  # to get session.id and created_at
+    record_session_activity(session)
+    bump_versions(HISTORY)
     db.session.commit()
 
     return jsonify({
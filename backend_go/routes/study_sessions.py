@@ -1,42 +1,42 @@
-from flask import Blueprint, jsonify, request
-from models import db, StudySession, WordsReviewItem
+from flask import Blueprint, jsonify, abort
+from models import db, StudySession, WordsReviewItem, Word
 from sqlalchemy import func
+from sqlalchemy.orm import joinedload
+from services.pagination import paginate
+from services.review_buffer import consistent_read
+from services.rollups import activity_totals
+from services.list_responses import compress_response, list_response, parse_fields
+from services.session_summaries import (
+    SESSION_FIELDS, SESSION_ORDER, summarize_sessions, session_summary, summary_to_dict,
+)
 
 study_sessions_bp = Blueprint('study_sessions', __name__)
-
-def paginate_query(query, page=1, per_page=100):
-    total = query.count()
-    pages = (total + per_page - 1) // per_page
-    items = query.offset((page-1)*per_page).limit(per_page).all()
-    return items, {
-        'current_page': page,
-        'per_page': per_page,
-        'total_pages': pages,
-        'total_items': total
-    }
+study_sessions_bp.after_request(compress_response)
 
 @study_sessions_bp.route('/study_sessions', methods=['GET'])
+@consistent_read
 def list_sessions():
-    page = request.args.get('page', 1, type=int)
-    query = StudySession.query.order_by(StudySession.created_at.desc())
-    sessions, pag = paginate_query(query, page)
-    return jsonify({
-        'data': [s.to_dict() for s in sessions],
-        'pagination': pag
-    })
+    fields = parse_fields(SESSION_FIELDS)
+    # the total comes from the daily rollup rather than a COUNT(*) over every session
+    sessions, pag = paginate(StudySession.query, SESSION_ORDER, descending=True,
+                             fetch=lambda page: summarize_sessions(page, fields),
+                             count=lambda: activity_totals()['sessions'])
+    return list_response(sessions, pag, lambda s: summary_to_dict(s, fields))
 
 @study_sessions_bp.route('/study_sessions/<int:session_id>', methods=['GET'])
+@consistent_read
 def get_session(session_id):
-    session = StudySession.query.get_or_404(session_id)
-    return jsonify(session.to_dict())
+    summary = session_summary(session_id)
+    if summary is None:
+        abort(404)
+    return jsonify(summary_to_dict(summary))
 
 @study_sessions_bp.route('/study_sessions/<int:session_id>/words', methods=['GET'])
+@consistent_read
 def session_words(session_id):
-    page = request.args.get('page', 1, type=int)
-    query = WordsReviewItem.query.filter_by(study_session_id=session_id)\
-                                  .order_by(WordsReviewItem.created_at.desc())
-    items, pag = paginate_query(query, page)
-    return jsonify({
-        'data': [i.to_dict(include_word_details=True) for i in items],
-        'pagination': pag
-    })
\ No newline at end of file
+    # word details come in on the same query; the word's stats are not needed here
+    query = WordsReviewItem.query.filter_by(study_session_id=session_id).options(
+        joinedload(WordsReviewItem.word).lazyload(Word.stats)
+    )
+    items, pag = paginate(query, [WordsReviewItem.created_at, WordsReviewItem.id], descending=True)
+    return list_response(items, pag, lambda i: i.to_dict(include_word_details=True))
\ No newline at end of file
@@ -1,33 +1,86 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, jsonify, request, abort
 from models import db, Word
+from services.pagination import cached_count, paginate, paginate_ids, page_params
+from services.catalog import (
+    WORD_FIELDS, get_catalog, word_fields_query, word_row_to_dict, word_stats, word_to_dict, words_to_dicts,
+)
+from services.list_responses import compress_response, list_response, parse_fields
+from services.search import search_word_ids, SEARCH_COLUMNS
+from services.review_buffer import consistent_read
+from services.response_cache import cached_response
+from services.data_version import CATALOG, HISTORY
+from services.leaderboard import hardest_words
 
 words_bp = Blueprint('words', __name__)
+words_bp.after_request(compress_response)
 
-def paginate_query(query, page=1, per_page=100):
-    total_items = query.count()
-    total_pages = (total_items + per_page - 1) // per_page
-    items = query.offset((page - 1) * per_page).limit(per_page).all()
+@words_bp.route('/words', methods=['GET'])
+@consistent_read
+@cached_response(CATALOG, HISTORY)
+def get_words():
+    fields = parse_fields(WORD_FIELDS)
+    catalog = get_catalog()
+    if catalog is None:
+        if fields is None:
+            words, pagination = paginate(Word.query, [Word.id])
+            return list_response(words, pagination, Word.to_dict)
+        rows, pagination = paginate(word_fields_query(fields), [Word.id], count=lambda: cached_count(Word.query))
+        return list_response(rows, pagination, lambda row: word_row_to_dict(row, fields))
+    
+    word_ids, pagination = paginate_ids(catalog.word_ids)
+    
+    return list_response(words_to_dicts(catalog, word_ids, fields), pagination)
+
+@words_bp.route('/words/search', methods=['GET'])
+@consistent_read
+@cached_response(CATALOG, HISTORY)
+def search_words():
+    q = request.args.get('q', '').strip()
+    field = request.args.get('field')
+    fields = parse_fields(WORD_FIELDS)
+    group_id = request.args.get('group_id', type=int)
+    page, per_page = page_params(request.args)
+    
+    if not q:
+        return jsonify({'error': 'q is required'}), 400
+    if field is not None and field not in SEARCH_COLUMNS:
+        return jsonify({'error': f"field must be one of {', '.join(SEARCH_COLUMNS)}"}), 400
     
-    return items, {
+    ids = search_word_ids(q, column=field, group_id=group_id, limit=per_page + 1, offset=(page - 1) * per_page)
+    has_more = len(ids) > per_page
+    ids = ids[:per_page]
+    pagination = {
         'current_page': page,
         'per_page': per_page,
-        'total_pages': total_pages,
-        'total_items': total_items,
+        'has_more': has_more,
     }
-
-@words_bp.route('/words', methods=['GET'])
-def get_words():
-    page = request.args.get('page', 1, type=int)
-    
-    query = Word.query
-    words, pagination = paginate_query(query, page)
+    if fields is None:
+        words = {w.id: w for w in Word.query.filter(Word.id.in_(ids))} if ids else {}
+        return list_response([words[i] for i in ids if i in words], pagination, Word.to_dict)
     
+    rows = {r.id: r for r in word_fields_query(fields).filter(Word.id.in_(ids))} if ids else {}
+    return list_response([rows[i] for i in ids if i in rows], pagination, lambda row: word_row_to_dict(row, fields))
+
+@words_bp.route('/words/hardest', methods=['GET'])
+@consistent_read
+@cached_response(CATALOG, HISTORY)
+def get_hardest_words():
+    data, pagination = hardest_words()
     return jsonify({
-        'data': [w.to_dict() for w in words],
+        'data': data,
         'pagination': pagination,
     })
 
 @words_bp.route('/words/<int:word_id>', methods=['GET'])
+@consistent_read
+@cached_response(CATALOG, HISTORY)
 def get_word(word_id):
-    word = Word.query.get_or_404(word_id)
-    return jsonify(word.to_dict(include_groups=True))
+    catalog = get_catalog()
+    if catalog is None:
+        return jsonify(Word.query.get_or_404(word_id).to_dict(include_groups=True))
+    
+    word = catalog.word(word_id)
+    if word is None:
+        abort(404)
+    stats = word_stats([word_id]).get(word_id)
+    return jsonify(word_to_dict(word, stats, groups=catalog.word_groups(word_id)))
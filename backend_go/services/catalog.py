@@ -0,0 +1,276 @@
+import json
+import logging
+import sys
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from flask import current_app
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from models import db, Word, WordReviewStats
+from services.data_version import CATALOG
+from services.list_responses import project
+
+logger = logging.getLogger(__name__)
+
+
+class WordRecord:
+    """Immutable vocabulary fields of one word; ``parts`` is already parsed"""
+    __slots__ = ('id', 'japanese', 'romaji', 'english', 'parts')
+
+    def __init__(self, id, japanese, romaji, english, parts):
+        self.id = id
+        self.japanese = japanese
+        self.romaji = romaji
+        self.english = english
+        self.parts = parts
+
+
+class GroupRecord:
+    """A group and the sorted ids of its member words"""
+    __slots__ = ('id', 'name', 'word_ids')
+
+    def __init__(self, id, name, word_ids):
+        self.id = id
+        self.name = name
+        self.word_ids = word_ids
+
+
+def _parse_parts(raw):
+    # mirrors Word.to_dict: no key for an empty column, [] for bad JSON
+    if not raw:
+        return None
+    try:
+        return json.loads(raw)
+    except ValueError:
+        return []
+
+
+class Catalog:
+    """Read-only snapshot of words, groups and memberships.
+
+    Words and groups are kept in id order next to an ``array`` of their ids,
+    so lookups are a bisect and pages are slices. Never mutated after load;
+    a newer catalog version produces a new instance.
+    """
+
+    def __init__(self, version, words, groups):
+        self.version = version
+        self.words = words
+        self.word_ids = array('q', (w.id for w in words))
+        self.groups = groups
+        self.group_ids = array('q', (g.id for g in groups))
+        self.memberships = sum(len(g.word_ids) for g in groups)
+
+    @classmethod
+    def load(cls, connection, version):
+        words = [
+            WordRecord(id, japanese, romaji, english, _parse_parts(parts))
+            for id, japanese, romaji, english, parts in connection.execute(text(
+                'SELECT id, japanese, romaji, english, parts FROM words ORDER BY id'))
+        ]
+        members = {}
+        # (group_id, word_id) is unique and indexed: an ordered index scan, no sort
+        for group_id, word_id in connection.execute(text(
+                'SELECT group_id, word_id FROM words_groups ORDER BY group_id, word_id')):
+            members.setdefault(group_id, array('q')).append(word_id)
+        groups = [
+            GroupRecord(id, name, members.get(id, array('q')))
+            for id, name in connection.execute(text('SELECT id, name FROM groups ORDER BY id'))
+        ]
+        return cls(version, words, groups)
+
+    @classmethod
+    def load_group(cls, connection, group_id):
+        """A catalog of just one group and its words, through the membership index"""
+        params = {'group_id': group_id}
+        words = [
+            WordRecord(id, japanese, romaji, english, _parse_parts(parts))
+            for id, japanese, romaji, english, parts in connection.execute(text(
+                'SELECT words.id, words.japanese, words.romaji, words.english, words.parts '
+                'FROM words_groups JOIN words ON words.id = words_groups.word_id '
+                'WHERE words_groups.group_id = :group_id ORDER BY words_groups.word_id'), params)
+        ]
+        groups = [
+            GroupRecord(id, name, array('q', (w.id for w in words)))
+            for id, name in connection.execute(text('SELECT id, name FROM groups WHERE id = :group_id'), params)
+        ]
+        return cls(None, words, groups)
+
+    @staticmethod
+    def _find(ids, records, record_id):
+        i = bisect_left(ids, record_id)
+        return records[i] if i < len(ids) and ids[i] == record_id else None
+
+    def word(self, word_id):
+        return self._find(self.word_ids, self.words, word_id)
+
+    def group(self, group_id):
+        return self._find(self.group_ids, self.groups, group_id)
+
+    def word_groups(self, word_id):
+        """Groups containing the word, in id order"""
+        found = []
+        for group in self.groups:
+            i = bisect_left(group.word_ids, word_id)
+            if i < len(group.word_ids) and group.word_ids[i] == word_id:
+                found.append(group)
+        return found
+
+    def footprint(self):
+        """Approximate bytes held by the snapshot (records, strings, parts and arrays)"""
+        total = sys.getsizeof(self.words) + sys.getsizeof(self.groups)
+        total += sys.getsizeof(self.word_ids) + sys.getsizeof(self.group_ids)
+        for w in self.words:
+            total += sys.getsizeof(w) + sys.getsizeof(w.japanese) + sys.getsizeof(w.romaji)
+            total += sys.getsizeof(w.english) + _deep_size(w.parts)
+        for g in self.groups:
+            total += sys.getsizeof(g) + sys.getsizeof(g.name) + sys.getsizeof(g.word_ids)
+        return total
+
+    def stats(self):
+        size = self.footprint()
+        return {
+            'version': self.version,
+            'words': len(self.words),
+            'groups': len(self.groups),
+            'memberships': self.memberships,
+            'bytes': size,
+            'bytes_per_100k_words': round(size * 100000 / len(self.words)) if self.words else None,
+        }
+
+
+def _deep_size(value):
+    if value is None:
+        return 0
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(_deep_size(k) + _deep_size(v) for k, v in value.items())
+    elif isinstance(value, (list, tuple)):
+        size += sum(_deep_size(v) for v in value)
+    return size
+
+
+class CatalogStore:
+    """Holds the current Catalog and swaps in a fresh one when CATALOG moves on"""
+
+    def __init__(self):
+        self.catalog = None
+        self.lock = threading.Lock()
+        self.load_seconds = None
+
+    def get(self, version):
+        catalog = self.catalog
+        if catalog is not None and catalog.version == version:
+            return catalog
+        with self.lock:
+            catalog = self.catalog
+            if catalog is None or catalog.version != version:
+                started = time.monotonic()
+                catalog = Catalog.load(db.session.connection(), version)
+                self.load_seconds = round(time.monotonic() - started, 3)
+                # a single reference assignment: readers see the old or the new snapshot
+                self.catalog = catalog
+        return catalog
+
+
+def init_catalog(app):
+    """Attach the catalog store and, with CATALOG_PRELOAD, load it right away"""
+    store = CatalogStore()
+    app.extensions['catalog'] = store
+    if app.config.get('CATALOG_ENABLED') and app.config.get('CATALOG_PRELOAD'):
+        with app.app_context():
+            try:
+                get_catalog()
+            except OperationalError:
+                # schema not migrated yet; the first request loads it instead
+                logger.warning('Catalog preload skipped: database not ready')
+            finally:
+                db.session.remove()
+    return store
+
+
+def get_catalog():
+    """The catalog snapshot for the current CATALOG data version, or None if disabled"""
+    if not current_app.config.get('CATALOG_ENABLED'):
+        return None
+    version = db.session.execute(
+        text('SELECT version FROM data_versions WHERE name = :name'), {'name': CATALOG}
+    ).scalar() or 0
+    return current_app.extensions['catalog'].get(version)
+
+
+def word_stats(word_ids):
+    """WordReviewStats rows for the given word ids, keyed by word id"""
+    if not word_ids:
+        return {}
+    return {s.word_id: s for s in WordReviewStats.query.filter(WordReviewStats.word_id.in_(list(word_ids)))}
+
+
+def word_to_dict(record, stats=None, groups=None):
+    """Same shape as Word.to_dict, from a catalog record plus its review stats"""
+    data = {
+        'id': record.id,
+        'japanese': record.japanese,
+        'romaji': record.romaji,
+        'english': record.english,
+    }
+    if record.parts is not None:
+        data['parts'] = record.parts
+
+    data['correct_count'] = stats.correct_count if stats else 0
+    data['wrong_count'] = stats.wrong_count if stats else 0
+    data['last_reviewed_at'] = stats.last_reviewed_at.isoformat() + 'Z' if stats and stats.last_reviewed_at else None
+
+    if groups is not None:
+        data['groups'] = [{'id': g.id, 'name': g.name} for g in groups]
+
+    return data
+
+
+def words_to_dicts(catalog, word_ids, fields=None):
+    """Serialize catalog words in the given order with one stats query.
+
+    With ``fields`` (see WORD_FIELDS) the dicts are cut down to them, and
+    the stats query is skipped unless one of STATS_FIELDS is asked for.
+    """
+    stats = word_stats(word_ids) if fields is None or STATS_FIELDS.intersection(fields) else {}
+    return [project(word_to_dict(catalog.word(i), stats.get(i)), fields)
+            for i in word_ids if catalog.word(i) is not None]
+
+
+# ?fields= of the word lists, in word_to_dict order; the last three come from word_review_stats
+WORD_FIELDS = ('id', 'japanese', 'romaji', 'english', 'parts', 'correct_count', 'wrong_count', 'last_reviewed_at')
+STATS_FIELDS = frozenset(WORD_FIELDS[5:])
+
+
+def word_fields_query(fields):
+    """Query of just the columns behind ``fields`` (plus words.id, the page key).
+
+    Rows are plain tuples rather than Word objects, and word_review_stats
+    is only joined when a stats field is asked for.
+    """
+    columns = [Word.id] + [getattr(Word, name) for name in fields if name != 'id' and name not in STATS_FIELDS]
+    columns += [getattr(WordReviewStats, name) for name in fields if name in STATS_FIELDS]
+    query = db.session.query(*columns)
+    if STATS_FIELDS.intersection(fields):
+        query = query.outerjoin(WordReviewStats, WordReviewStats.word_id == Word.id)
+    return query
+
+
+def word_row_to_dict(row, fields):
+    """word_to_dict cut down to ``fields``, from a word_fields_query row"""
+    data = {}
+    for name in fields:
+        value = getattr(row, name)
+        if name == 'parts':
+            value = _parse_parts(value)
+            if value is None:
+                continue
+        elif name in ('correct_count', 'wrong_count'):
+            value = value or 0
+        elif name == 'last_reviewed_at':
+            value = value.isoformat() + 'Z' if value else None
+        data[name] = value
+    return data
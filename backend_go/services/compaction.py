@@ -0,0 +1,115 @@
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import func
+from sqlalchemy.dialects.sqlite import insert
+from models import db, ReviewAggregate, ScheduleCheckpoint, WordsReviewItem
+from services.data_version import bump_versions, HISTORY
+from services.scheduler import next_state
+
+CHECKPOINT_FIELDS = ('repetitions', 'interval_days', 'ease', 'due_at', 'last_reviewed_at')
+
+
+def compaction_cutoff(horizon_days, now=None):
+    """Reviews created before this instant are old enough to compact"""
+    return (now or datetime.utcnow()) - timedelta(days=horizon_days)
+
+
+def _fold_aggregates(batch):
+    totals = {}
+    for _, session_id, word_id, correct, created_at in batch:
+        key = (session_id, word_id, created_at.date())
+        correct_count, wrong_count, last = totals.get(key, (0, 0, None))
+        if correct:
+            correct_count += 1
+        else:
+            wrong_count += 1
+        totals[key] = (correct_count, wrong_count, created_at if last is None or created_at > last else last)
+
+    rows = [
+        {'study_session_id': s, 'word_id': w, 'day': day, 'correct_count': c, 'wrong_count': wr,
+         'last_reviewed_at': last}
+        for (s, w, day), (c, wr, last) in totals.items()
+    ]
+    stmt = insert(ReviewAggregate)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[ReviewAggregate.study_session_id, ReviewAggregate.word_id, ReviewAggregate.day],
+        set_={
+            'correct_count': ReviewAggregate.correct_count + stmt.excluded.correct_count,
+            'wrong_count': ReviewAggregate.wrong_count + stmt.excluded.wrong_count,
+            'last_reviewed_at': func.max(
+                func.coalesce(ReviewAggregate.last_reviewed_at, stmt.excluded.last_reviewed_at),
+                stmt.excluded.last_reviewed_at,
+            ),
+        },
+    )
+    db.session.execute(stmt, rows)
+    return len(rows)
+
+
+def _advance_checkpoints(batch):
+    word_ids = {word_id for _, _, word_id, _, _ in batch}
+    states = {
+        word_id: (repetitions, interval, ease)
+        for word_id, repetitions, interval, ease in db.session.query(
+            ScheduleCheckpoint.word_id, ScheduleCheckpoint.repetitions,
+            ScheduleCheckpoint.interval_days, ScheduleCheckpoint.ease,
+        ).filter(ScheduleCheckpoint.word_id.in_(word_ids))
+    }
+
+    rows = {}
+    for _, _, word_id, correct, created_at in batch:
+        row = next_state(states.get(word_id), correct, created_at)
+        states[word_id] = (row['repetitions'], row['interval_days'], row['ease'])
+        rows[word_id] = dict(row, word_id=word_id)
+
+    stmt = insert(ScheduleCheckpoint)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[ScheduleCheckpoint.word_id],
+        set_={name: getattr(stmt.excluded, name) for name in CHECKPOINT_FIELDS},
+    )
+    db.session.execute(stmt, list(rows.values()))
+
+
+def compact_reviews(before, batch_size=5000, progress=None):
+    """Fold raw reviews created before ``before`` into per-word, per-session-day aggregates.
+
+    Reviews are taken oldest first, ``batch_size`` at a time, and each batch
+    is its own short transaction, so writers never wait for more than one
+    batch and an interrupted run simply resumes where it stopped. Every
+    batch also advances the words' schedule checkpoints, which keeps
+    rebuilt counters, rollups and schedules identical to the uncompacted
+    history. Returns counters for the run.
+    """
+    stats = {'reviews': 0, 'aggregate_upserts': 0, 'batches': 0}
+    started = time.monotonic()
+
+    while True:
+        batch = db.session.query(
+            WordsReviewItem.id,
+            WordsReviewItem.study_session_id,
+            WordsReviewItem.word_id,
+            WordsReviewItem.correct,
+            WordsReviewItem.created_at,
+        ).filter(WordsReviewItem.created_at < before)\
+            .order_by(WordsReviewItem.created_at, WordsReviewItem.id)\
+            .limit(batch_size)\
+            .all()
+        if not batch:
+            break
+
+        stats['aggregate_upserts'] += _fold_aggregates(batch)
+        _advance_checkpoints(batch)
+        WordsReviewItem.query.filter(WordsReviewItem.id.in_([row[0] for row in batch]))\
+            .delete(synchronize_session=False)
+        db.session.commit()
+
+        stats['reviews'] += len(batch)
+        stats['batches'] += 1
+        if progress:
+            progress(f"    {stats['reviews']:,} reviews folded ({stats['aggregate_upserts']:,} aggregate upserts)")
+
+    if stats['reviews']:
+        bump_versions(HISTORY)
+        db.session.commit()
+    stats['elapsed_seconds'] = round(time.monotonic() - started, 3)
+    return stats
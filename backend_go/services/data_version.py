@@ -0,0 +1,56 @@
+from sqlalchemy.dialects.sqlite import insert
+from models import db, DataVersion, LearnerVersion
+from services.storage import learner_engine
+
+# Vocabulary: words, groups and memberships
+CATALOG = 'catalog'
+# Study sessions, review items and everything derived from them
+HISTORY = 'history'
+
+# Scopes a learner database versions itself in multi-learner mode
+LEARNER_SCOPES = (HISTORY,)
+
+BUMP_SQL = (
+    'INSERT INTO data_versions (name, version) VALUES (?, 1) '
+    'ON CONFLICT(name) DO UPDATE SET version = version + 1'
+)
+LEARNER_BUMP_SQL = BUMP_SQL.replace('data_versions', 'learner_versions')
+
+
+def _bump(model, names):
+    stmt = insert(model).values([{'name': name, 'version': 1} for name in names])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[model.name],
+        set_={'version': model.version + 1},
+    )
+    db.session.execute(stmt)
+
+
+def bump_versions(*names):
+    """Advance the named data versions inside the current transaction"""
+    learner = [n for n in names if n in LEARNER_SCOPES] if learner_engine() is not None else []
+    shared = [n for n in names if n not in learner]
+    if shared:
+        _bump(DataVersion, shared)
+    if learner:
+        _bump(LearnerVersion, learner)
+
+
+def bump_versions_sqlite(conn, *names):
+    """bump_versions for a raw sqlite3 connection (invoke tasks, bulk loaders)"""
+    is_learner_db = conn.execute(
+        "SELECT 1 FROM main.sqlite_master WHERE type = 'table' AND name = 'learner_versions'").fetchone()
+    learner = [n for n in names if n in LEARNER_SCOPES] if is_learner_db else []
+    shared = [(name,) for name in names if name not in learner]
+    if shared:
+        conn.executemany(BUMP_SQL, shared)
+    if learner:
+        conn.executemany(LEARNER_BUMP_SQL, [(name,) for name in learner])
+
+
+def current_versions():
+    """Mapping of every data version name to its current value"""
+    versions = dict(db.session.query(DataVersion.name, DataVersion.version))
+    if learner_engine() is not None:
+        versions.update(db.session.query(LearnerVersion.name, LearnerVersion.version))
+    return versions
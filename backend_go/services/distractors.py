@@ -0,0 +1,341 @@
+import heapq
+import math
+import time
+import unicodedata
+from collections import defaultdict
+from functools import lru_cache
+
+# distractors kept per word and group; quizzes pick among these
+INDEX_SIZE = 8
+# exact scoring only for the best pre-scored candidates of a word
+CANDIDATES = 32
+# inverted index postings read per word when gathering its candidates
+SCAN_BUDGET = 1024
+# refreshing more than this share of a group's words rebuilds the group instead
+REBUILD_FRACTION = 0.2
+# words indexed per transaction by refresh_queued
+REFRESH_CHUNK_SIZE = 5000
+
+SUBSTITUTION_COST = 1.0
+LOOKALIKE_COST = 0.25
+
+# kana that learners confuse at a glance
+LOOKALIKE_KANA = (
+    'あお', 'ぬめ', 'われね', 'はほま', 'はけ', 'るろ', 'さちき', 'いりこ', 'くへ', 'しつ',
+    'うら', 'たな', 'そろ', 'ソンシツ', 'クケタ', 'ウワフ', 'コユロ', 'スヌ', 'アマ', 'チテ',
+    'ノメ', 'ラヲ', 'ヘへ', 'カか', 'キき', 'セせ', 'モも', 'リり', 'ニに',
+)
+
+_LOOKALIKES = {}
+for _kana in LOOKALIKE_KANA:
+    for _ch in _kana:
+        _LOOKALIKES.setdefault(_ch, set()).update(_kana)
+
+
+def _base(ch):
+    # が -> か, ぱ -> は: dakuten and handakuten variants look alike
+    return unicodedata.normalize('NFD', ch)[0]
+
+
+@lru_cache(maxsize=65536)
+def _kana_cost(a, b):
+    if a == b:
+        return 0.0
+    if _base(a) == _base(b) or b in _LOOKALIKES.get(a, ()):
+        return LOOKALIKE_COST
+    return SUBSTITUTION_COST
+
+
+def edit_distance(a, b, cost=None):
+    """Levenshtein distance; ``cost(x, y)`` weights substitutions (default 0/1)"""
+    # a shared prefix or suffix never changes the distance
+    start = 0
+    while start < len(a) and start < len(b) and a[start] == b[start]:
+        start += 1
+    end = 0
+    while end < len(a) - start and end < len(b) - start and a[-1 - end] == b[-1 - end]:
+        end += 1
+    a, b = a[start:len(a) - end], b[start:len(b) - end]
+    if len(a) < len(b):
+        a, b = b, a
+    if not b:
+        return len(a)
+
+    previous = list(range(len(b) + 1))
+    for i, x in enumerate(a, 1):
+        current = [i]
+        left = i
+        for j, y in enumerate(b, 1):
+            substitution = previous[j - 1] + ((0 if x == y else 1) if cost is None else cost(x, y))
+            insertion = left + 1
+            deletion = previous[j] + 1
+            left = substitution if substitution < insertion else insertion
+            if deletion < left:
+                left = deletion
+            current.append(left)
+        previous = current
+    return previous[-1]
+
+
+def similarity_score(a, b):
+    """Distance between two (japanese, romaji) pairs in [0, 1]; lower is more confusable"""
+    kana = edit_distance(a[0], b[0], _kana_cost) / max(len(a[0]), len(b[0]), 1)
+    romaji = edit_distance(a[1], b[1]) / max(len(a[1]), len(b[1]), 1)
+    return round((kana + romaji) / 2, 4)
+
+
+def _tokens(japanese, romaji):
+    tokens = {romaji[i:i + 2] for i in range(len(romaji) - 1)} | set(romaji)
+    for ch in japanese:
+        tokens.add(_base(ch))
+        tokens.update(_LOOKALIKES.get(ch, ()))
+    # words one kana edit apart share a deletion key; tab keeps these apart
+    # from single-character tokens
+    base = ''.join(_base(ch) for ch in japanese)
+    tokens.update('\t' + base[:i] + base[i + 1:] for i in range(len(base)))
+    tokens.add('\t' + base)
+    return tokens
+
+
+class _Member:
+    __slots__ = ('id', 'key', 'tokens')
+
+    def __init__(self, id, japanese, romaji):
+        self.id = id
+        self.key = (japanese, romaji.lower())
+        self.tokens = _tokens(japanese, self.key[1])
+
+
+def _is_candidate(word, other):
+    # a distractor with the same kana or romaji would also be a right answer
+    return other.id != word.id and other.key[0] != word.key[0] and other.key[1] != word.key[1]
+
+
+class _TokenIndex:
+    """Inverted index from token to the positions of the members that have it.
+
+    Candidates of a word come from the postings of its rarest tokens,
+    reading at most SCAN_BUDGET postings in all, so building a group costs
+    about SCAN_BUDGET per word rather than a pass over the whole group.
+    Members are ordered by romaji length, which breaks ties towards words
+    of a similar length.
+    """
+
+    def __init__(self, members):
+        self.members = members = sorted(members, key=lambda m: (len(m.key[1]), m.id))
+        self.positions = {m.id: i for i, m in enumerate(members)}
+        self.postings = {}
+        for position, member in enumerate(members):
+            for token in member.tokens:
+                self.postings.setdefault(token, []).append(position)
+
+    def candidates(self, word):
+        """Up to CANDIDATES members sharing the rarest tokens with ``word``"""
+        members = self.members
+        if len(members) <= CANDIDATES + 1:
+            return [m for m in members if _is_candidate(word, m)]
+
+        # members scored by the summed rarity (idf) of the tokens they share;
+        # tokens too common to fit in what is left of the budget are skipped
+        scores = defaultdict(float)
+        budget = SCAN_BUDGET
+        position = self.positions.get(word.id, 0)
+        for token in sorted(word.tokens, key=lambda t: len(self.postings.get(t, ()))):
+            postings = self.postings.get(token)
+            if postings and len(postings) <= budget:
+                weight = math.log(len(members) / len(postings))
+                for p in postings:
+                    scores[p] += weight
+                budget -= len(postings)
+        # ties go to the members closest in length; the word itself and
+        # same-kana or same-romaji words are usually few, so the head is
+        # filtered first and the whole ranking only when they crowd it out
+        def rank(item):
+            return item[1], -abs(item[0] - position)
+
+        best = [members[p] for p, _ in heapq.nlargest(CANDIDATES * 2, scores.items(), key=rank)
+                if _is_candidate(word, members[p])]
+        if len(best) < CANDIDATES and len(scores) > CANDIDATES * 2:
+            best = [members[p] for p, _ in sorted(scores.items(), key=rank, reverse=True)
+                    if _is_candidate(word, members[p])]
+        return best[:CANDIDATES]
+
+
+def _nearest(word, candidates):
+    """The INDEX_SIZE best (score, id) distractors of ``word`` among ``candidates``"""
+    return heapq.nsmallest(INDEX_SIZE, ((similarity_score(word.key, m.key), m.id) for m in candidates))
+
+
+def _load_members(conn, group_id):
+    return [_Member(*row) for row in conn.execute(
+        'SELECT words.id, words.japanese, words.romaji FROM words_groups '
+        'JOIN words ON words.id = words_groups.word_id '
+        'WHERE words_groups.group_id = ? ORDER BY words.id', (group_id,))]
+
+
+def _write(conn, group_id, word_id, nearest):
+    conn.execute('DELETE FROM word_distractors WHERE group_id = ? AND word_id = ?', (group_id, word_id))
+    conn.executemany(
+        'INSERT INTO word_distractors (group_id, word_id, distractor_id, score) VALUES (?, ?, ?, ?)',
+        [(group_id, word_id, distractor_id, score) for score, distractor_id in nearest])
+
+
+def build_group(conn, group_id):
+    """Recompute the whole distractor index of one group; returns the number of words indexed"""
+    members = _load_members(conn, group_id)
+    index = _TokenIndex(members)
+    conn.execute('DELETE FROM word_distractors WHERE group_id = ?', (group_id,))
+    conn.executemany(
+        'INSERT INTO word_distractors (group_id, word_id, distractor_id, score) VALUES (?, ?, ?, ?)',
+        [(group_id, word.id, distractor_id, score)
+         for word in members for score, distractor_id in _nearest(word, index.candidates(word))])
+    return len(members)
+
+
+def refresh_group(conn, group_id, word_ids):
+    """Index new or changed members and let them displace weaker distractors of the others.
+
+    Only members that are candidates of a refreshed word, or already list
+    one as a distractor, are rescored; past REBUILD_FRACTION of the group
+    the full rebuild is cheaper and is used instead.
+    """
+    members = _load_members(conn, group_id)
+    by_id = {m.id: m for m in members}
+    refreshed = [by_id[i] for i in sorted(set(word_ids)) if i in by_id]
+    if len(refreshed) > max(1, len(members) * REBUILD_FRACTION):
+        return build_group(conn, group_id)
+    _refresh(conn, group_id, _TokenIndex(members), by_id, refreshed)
+    return len(refreshed)
+
+
+def _refresh(conn, group_id, index, by_id, refreshed):
+    current = {}
+    for word_id, distractor_id, score in conn.execute(
+            'SELECT word_id, distractor_id, score FROM word_distractors WHERE group_id = ?', (group_id,)):
+        current.setdefault(word_id, []).append((score, distractor_id))
+
+    refreshed_ids = {w.id for w in refreshed}
+    # member id -> refreshed words that may enter or must leave its list
+    touched = {}
+    for word in refreshed:
+        candidates = index.candidates(word)
+        current[word.id] = _nearest(word, candidates)
+        _write(conn, group_id, word.id, current[word.id])
+        for member in candidates:
+            touched.setdefault(member.id, {})[word.id] = word
+    for member_id, nearest in current.items():
+        for _, distractor_id in nearest:
+            if distractor_id in refreshed_ids:
+                touched.setdefault(member_id, {})[distractor_id] = by_id[distractor_id]
+
+    for member_id, words in touched.items():
+        member = by_id.get(member_id)
+        if member is None or member_id in refreshed_ids:
+            continue
+        nearest = current.get(member_id, [])
+        worst = max(nearest)[0] if len(nearest) >= INDEX_SIZE else None
+        changed = False
+        for word in words.values():
+            if any(n[1] == word.id for n in nearest):
+                nearest = [n for n in nearest if n[1] != word.id]
+                changed = True
+            if not _is_candidate(member, word):
+                continue
+            score = similarity_score(member.key, word.key)
+            if worst is None or score < worst:
+                nearest.append((score, word.id))
+                changed = True
+        if changed:
+            _write(conn, group_id, member_id, heapq.nsmallest(INDEX_SIZE, nearest))
+
+
+def queue_refresh(conn, memberships):
+    """Queue (word_id, group_id) memberships not indexed yet for refresh_queued; the caller owns the commit"""
+    conn.executemany(
+        'INSERT OR IGNORE INTO distractor_refresh_queue (group_id, word_id) SELECT :group_id, :word_id '
+        'WHERE NOT EXISTS (SELECT 1 FROM word_distractors WHERE group_id = :group_id AND word_id = :word_id)',
+        [{'group_id': group_id, 'word_id': word_id} for word_id, group_id in memberships])
+
+
+def _queued(conn, group_id, rebuild, limit):
+    return [row[0] for row in conn.execute(
+        'SELECT word_id FROM distractor_refresh_queue WHERE group_id = ? AND rebuild = ? ORDER BY word_id LIMIT ?',
+        (group_id, rebuild, limit))]
+
+
+def _start_rebuild(conn, group_id):
+    # every member is queued for a full rescore; the flag lets an
+    # interrupted run resume the rebuild instead of starting over
+    conn.execute('INSERT INTO distractor_refresh_queue (group_id, word_id, rebuild) '
+                 'SELECT group_id, word_id, 1 FROM words_groups WHERE group_id = ? '
+                 'ON CONFLICT (group_id, word_id) DO UPDATE SET rebuild = 1', (group_id,))
+    conn.execute('DELETE FROM word_distractors WHERE group_id = ? AND word_id NOT IN '
+                 '(SELECT word_id FROM words_groups WHERE group_id = ?)', (group_id, group_id))
+    conn.commit()
+
+
+def refresh_queued(conn, chunk_size=REFRESH_CHUNK_SIZE, progress=None):
+    """Index the queued memberships group by group, one transaction per chunk of words.
+
+    A chunk is dequeued in the transaction that indexes it, so an
+    interrupted run resumes where it stopped. A group with more than
+    REBUILD_FRACTION of its words queued is rebuilt: every member is
+    queued and scored against the whole group, without the displacement
+    pass of an incremental refresh.
+    """
+    started = time.monotonic()
+    stats = {'groups': 0, 'words': 0}
+    for (group_id,) in conn.execute(
+            'SELECT DISTINCT group_id FROM distractor_refresh_queue ORDER BY group_id').fetchall():
+        members = _load_members(conn, group_id)
+        by_id = {m.id: m for m in members}
+        index = _TokenIndex(members)
+        while True:
+            word_ids = _queued(conn, group_id, 1, chunk_size)
+            rebuild = bool(word_ids)
+            if not rebuild:
+                queued = conn.execute('SELECT COUNT(*) FROM distractor_refresh_queue '
+                                      'WHERE group_id = ? AND rebuild = 0', (group_id,)).fetchone()[0]
+                if not queued:
+                    break
+                if queued > max(1, len(members) * REBUILD_FRACTION):
+                    _start_rebuild(conn, group_id)
+                    continue
+                word_ids = _queued(conn, group_id, 0, chunk_size)
+            if any(i not in by_id for i in word_ids):
+                # joined after the members were loaded, or left the group since
+                members = _load_members(conn, group_id)
+                by_id = {m.id: m for m in members}
+                index = _TokenIndex(members)
+            words = [by_id[i] for i in word_ids if i in by_id]
+
+            if rebuild:
+                for word in words:
+                    _write(conn, group_id, word.id, _nearest(word, index.candidates(word)))
+            else:
+                _refresh(conn, group_id, index, by_id, words)
+            conn.executemany('DELETE FROM distractor_refresh_queue WHERE group_id = ? AND word_id = ?',
+                             [(group_id, word_id) for word_id in word_ids])
+            conn.commit()
+            stats['words'] += len(words)
+            if progress:
+                progress(f"    group {group_id}: {stats['words']:,} words indexed")
+        stats['groups'] += 1
+    stats['elapsed_seconds'] = round(time.monotonic() - started, 3)
+    return stats
+
+
+def rebuild_distractors(conn, progress=None):
+    """Recompute the distractor index of every group, one commit per group"""
+    started = time.monotonic()
+    stats = {'groups': 0, 'words': 0}
+    for (group_id,) in conn.execute('SELECT id FROM groups ORDER BY id').fetchall():
+        stats['words'] += build_group(conn, group_id)
+        conn.execute('DELETE FROM distractor_refresh_queue WHERE group_id = ?', (group_id,))
+        conn.commit()
+        stats['groups'] += 1
+        if progress:
+            progress(f"    group {group_id}: {stats['words']:,} words indexed")
+    stats['elapsed_seconds'] = round(time.monotonic() - started, 3)
+    return stats
+
@@ -0,0 +1,337 @@
+import json
+import time
+import zlib
+from datetime import datetime
+from services.data_version import bump_versions_sqlite, CATALOG, HISTORY
+
+FORMAT = 'history-ndjson'
+FORMAT_VERSION = 2
+IMPORT_MODES = ('merge', 'restore')
+EXPORT_CHUNK_BYTES = 1 << 16
+DEFERRED_INDEX_TABLES = ('study_sessions', 'words_review_items', 'review_aggregates')
+
+# (record type, query); rows come back in this order and in id order
+EXPORT_QUERIES = (
+    ('group', 'SELECT id, name FROM groups ORDER BY id'),
+    ('word', 'SELECT id, japanese, romaji, english FROM words ORDER BY id'),
+    ('activity', 'SELECT id, name, description, thumbnail_url, activity_type, launch_url, created_at '
+                 'FROM study_activities ORDER BY id'),
+    ('session', 'SELECT id, group_id, study_activity_id, created_at FROM study_sessions ORDER BY id'),
+    ('review', 'SELECT study_session_id AS session_id, word_id, correct, created_at '
+               'FROM words_review_items ORDER BY id'),
+    ('aggregate', 'SELECT study_session_id AS session_id, word_id, day, correct_count, wrong_count, '
+                  'last_reviewed_at FROM review_aggregates ORDER BY study_session_id, word_id, day'),
+    ('checkpoint', 'SELECT word_id, repetitions, interval_days, ease, due_at, last_reviewed_at '
+                   'FROM schedule_checkpoints ORDER BY word_id'),
+)
+
+
+def _dumps(record):
+    return json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n'
+
+
+def iter_history_lines(conn):
+    """Yield the study history of a sqlite3 connection as NDJSON lines.
+
+    Rows are streamed straight off the cursors inside one read transaction,
+    so memory stays flat and the export is a consistent snapshot. The
+    vocabulary (groups, words) and activities are included so that ids can
+    be remapped by natural key on import; timestamps are written as stored.
+    """
+    cursor = conn.cursor()
+    cursor.execute('BEGIN')
+    try:
+        yield _dumps({'type': 'header', 'format': FORMAT, 'version': FORMAT_VERSION,
+                      'exported_at': datetime.utcnow().isoformat() + 'Z'})
+        counts = {}
+        for record_type, sql in EXPORT_QUERIES:
+            cursor.execute(sql)
+            columns = [d[0] for d in cursor.description]
+            n = 0
+            for row in cursor:
+                record = {'type': record_type, **dict(zip(columns, row))}
+                if record_type == 'review':
+                    record['correct'] = bool(record['correct'])
+                yield _dumps(record)
+                n += 1
+            counts[record_type] = n
+        yield _dumps({'type': 'footer', 'sessions': counts['session'], 'reviews': counts['review'],
+                      'aggregates': counts['aggregate']})
+    finally:
+        conn.rollback()
+        cursor.close()
+
+
+def iter_chunks(lines, compress=False, chunk_bytes=EXPORT_CHUNK_BYTES):
+    """Group lines into byte chunks of about ``chunk_bytes``, gzip-compressed if asked"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+    buf = []
+    size = 0
+    for line in lines:
+        data = line.encode('utf-8')
+        buf.append(data)
+        size += len(data)
+        if size >= chunk_bytes:
+            chunk = b''.join(buf)
+            buf, size = [], 0
+            chunk = compressor.compress(chunk) if compressor else chunk
+            if chunk:
+                yield chunk
+    chunk = b''.join(buf)
+    if compressor:
+        chunk = compressor.compress(chunk) + compressor.flush()
+    if chunk:
+        yield chunk
+
+
+class HistoryImporter:
+    """Bulk loader for history exports over a sqlite3 connection.
+
+    ``merge`` appends the file's sessions after the existing ones (session
+    ids are shifted past the current maximum); ``restore`` first deletes all
+    sessions, reviews (raw and compacted), schedule checkpoints and review
+    batches and keeps the original session ids.
+    Groups and words are matched by name and (japanese, romaji, english)
+    and created when missing. The whole import is one transaction, written
+    with executemany in chunks while the secondary indexes of the history
+    tables are dropped (they are rebuilt before commit, and come back on
+    rollback). Derived tables are left for the caller to rebuild. Use it as
+    a context manager.
+    """
+
+    def __init__(self, conn, mode='merge', chunk_size=5000, progress=None):
+        if mode not in IMPORT_MODES:
+            raise ValueError(f"mode must be one of {', '.join(IMPORT_MODES)}")
+        self.conn = conn
+        self.mode = mode
+        self.chunk_size = chunk_size
+        self.progress = progress
+        self.session_offset = 0
+        self.word_ids = {}
+        self.group_ids = {}
+        self.activity_ids = {}
+        self.activity_keys = {}
+        # ids in the file -> local ids
+        self.word_map = {}
+        self.group_map = {}
+        self.activity_map = {}
+        self.sessions = []
+        self.reviews = []
+        self.aggregates = []
+        self.deferred_indexes = []
+        self.header = None
+        self.footer = None
+        self.stats = {'sessions': 0, 'reviews': 0, 'aggregates': 0, 'checkpoints': 0, 'words_created': 0,
+                      'groups_created': 0, 'activities_created': 0}
+        self.started = None
+
+    def __enter__(self):
+        self.started = time.monotonic()
+        cursor = self.conn.cursor()
+        cursor.execute('PRAGMA cache_size = -65536')
+        # explicit, so the index drops below are part of the transaction too
+        cursor.execute('BEGIN')
+        if self.mode == 'restore':
+            cursor.execute('DELETE FROM words_review_items')
+            cursor.execute('DELETE FROM review_aggregates')
+            cursor.execute('DELETE FROM schedule_checkpoints')
+            cursor.execute('DELETE FROM study_sessions')
+            cursor.execute('DELETE FROM review_batches')
+        else:
+            self.session_offset = cursor.execute('SELECT MAX(id) FROM study_sessions').fetchone()[0] or 0
+
+        for word_id, japanese, romaji, english in cursor.execute(
+                'SELECT id, japanese, romaji, english FROM words'):
+            self.word_ids[(japanese, romaji, english)] = word_id
+        for group_id, name in cursor.execute('SELECT id, name FROM groups'):
+            self.group_ids[name] = group_id
+        for activity_id, name, activity_type, launch_url in cursor.execute(
+                'SELECT id, name, activity_type, launch_url FROM study_activities'):
+            key = (name, activity_type, launch_url)
+            self.activity_keys[activity_id] = key
+            self.activity_ids.setdefault(key, activity_id)
+
+        placeholders = ','.join('?' for _ in DEFERRED_INDEX_TABLES)
+        self.deferred_indexes = cursor.execute(
+            f"SELECT name, sql FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL "
+            f"AND tbl_name IN ({placeholders})", DEFERRED_INDEX_TABLES
+        ).fetchall()
+        for name, _ in self.deferred_indexes:
+            cursor.execute(f'DROP INDEX IF EXISTS "{name}"')
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.conn.rollback()
+            return False
+        self._flush()
+        if self.header is None:
+            self.conn.rollback()
+            raise ValueError('empty history file')
+        if self.footer is None:
+            self.conn.rollback()
+            raise ValueError('truncated history file: no footer')
+        if self.progress:
+            self.progress(f"  Rebuilding {len(self.deferred_indexes)} deferred indexes")
+        cursor = self.conn.cursor()
+        for _, sql in self.deferred_indexes:
+            cursor.execute(sql)
+        versions = [HISTORY]
+        if self.stats['words_created'] or self.stats['groups_created']:
+            versions.append(CATALOG)
+        bump_versions_sqlite(self.conn, *versions)
+        self.conn.commit()
+        self.stats['elapsed_seconds'] = round(time.monotonic() - self.started, 3)
+        self.stats['rows_per_second'] = round(
+            (self.stats['sessions'] + self.stats['reviews']) / max(self.stats['elapsed_seconds'], 1e-9))
+        return False
+
+    def import_lines(self, lines):
+        for number, line in enumerate(lines, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+                handler = self._handlers[record['type']]
+            except (ValueError, KeyError, TypeError):
+                raise ValueError(f'line {number}: not a history record')
+            if self.header is None and record['type'] != 'header':
+                raise ValueError('not a history export: missing header')
+            try:
+                handler(self, record)
+            except KeyError as e:
+                raise ValueError(f'line {number}: missing field or unknown reference {e}')
+        return self.stats
+
+    def _header(self, record):
+        if record.get('format') != FORMAT or record.get('version', 0) > FORMAT_VERSION:
+            raise ValueError(f"unsupported history format {record.get('format')!r} v{record.get('version')}")
+        self.header = record
+
+    def _group(self, record):
+        name = record['name']
+        if name not in self.group_ids:
+            cursor = self.conn.execute('INSERT INTO groups (name) VALUES (?)', (name,))
+            self.group_ids[name] = cursor.lastrowid
+            self.stats['groups_created'] += 1
+        self.group_map[record['id']] = self.group_ids[name]
+
+    def _word(self, record):
+        key = (record['japanese'], record['romaji'], record['english'])
+        if key not in self.word_ids:
+            cursor = self.conn.execute(
+                'INSERT INTO words (japanese, romaji, english, parts) VALUES (?, ?, ?, ?)', key + ('[]',))
+            self.word_ids[key] = cursor.lastrowid
+            self.stats['words_created'] += 1
+        self.word_map[record['id']] = self.word_ids[key]
+
+    def _activity(self, record):
+        key = (record['name'], record.get('activity_type'), record.get('launch_url'))
+        # the same row when it is still there (restores), else any row that looks the same
+        local_id = record['id'] if self.activity_keys.get(record['id']) == key else self.activity_ids.get(key)
+        if local_id is None:
+            cursor = self.conn.execute(
+                'INSERT INTO study_activities (name, description, thumbnail_url, activity_type, launch_url, '
+                'created_at) VALUES (?, ?, ?, ?, ?, ?)',
+                (record['name'], record.get('description'), record.get('thumbnail_url'),
+                 record.get('activity_type'), record.get('launch_url'), record.get('created_at')))
+            local_id = cursor.lastrowid
+            self.activity_ids[key] = local_id
+            self.stats['activities_created'] += 1
+        self.activity_map[record['id']] = local_id
+
+    def _session(self, record):
+        activity_id = record.get('study_activity_id')
+        self.sessions.append((
+            record['id'] + self.session_offset,
+            self.group_map[record['group_id']],
+            self.activity_map.get(activity_id) if activity_id is not None else None,
+            record['created_at'],
+        ))
+        if len(self.sessions) >= self.chunk_size:
+            self._flush()
+
+    def _review(self, record):
+        self.reviews.append((
+            self.word_map[record['word_id']],
+            record['session_id'] + self.session_offset,
+            1 if record['correct'] else 0,
+            record['created_at'],
+        ))
+        if len(self.reviews) >= self.chunk_size:
+            self._flush()
+
+    def _aggregate(self, record):
+        self.aggregates.append((
+            record['session_id'] + self.session_offset,
+            self.word_map[record['word_id']],
+            record['day'],
+            record['correct_count'],
+            record['wrong_count'],
+            record['last_reviewed_at'],
+        ))
+        if len(self.aggregates) >= self.chunk_size:
+            self._flush()
+
+    def _checkpoint(self, record):
+        # a merge keeps the local schedule state of words reviewed on both sides
+        cursor = self.conn.execute(
+            'INSERT OR IGNORE INTO schedule_checkpoints (word_id, repetitions, interval_days, ease, due_at, '
+            'last_reviewed_at) VALUES (?, ?, ?, ?, ?, ?)',
+            (self.word_map[record['word_id']], record['repetitions'], record['interval_days'], record['ease'],
+             record['due_at'], record['last_reviewed_at']))
+        self.stats['checkpoints'] += cursor.rowcount
+
+    def _footer(self, record):
+        self._flush()
+        if record.get('aggregates', 0) != self.stats['aggregates']:
+            raise ValueError(f"history file incomplete: expected {record['aggregates']} aggregates, "
+                             f"read {self.stats['aggregates']}")
+        if record['sessions'] != self.stats['sessions'] or record['reviews'] != self.stats['reviews']:
+            raise ValueError(f"history file incomplete: expected {record['sessions']} sessions and "
+                             f"{record['reviews']} reviews, read {self.stats['sessions']} and "
+                             f"{self.stats['reviews']}")
+        self.footer = record
+
+    _handlers = {
+        'header': _header,
+        'group': _group,
+        'word': _word,
+        'activity': _activity,
+        'session': _session,
+        'review': _review,
+        'aggregate': _aggregate,
+        'checkpoint': _checkpoint,
+        'footer': _footer,
+    }
+
+    def _flush(self):
+        cursor = self.conn.cursor()
+        if self.sessions:
+            cursor.executemany(
+                'INSERT INTO study_sessions (id, group_id, study_activity_id, created_at) VALUES (?, ?, ?, ?)',
+                self.sessions,
+            )
+            self.stats['sessions'] += len(self.sessions)
+            self.sessions = []
+        if self.reviews:
+            cursor.executemany(
+                'INSERT INTO words_review_items (word_id, study_session_id, correct, created_at) '
+                'VALUES (?, ?, ?, ?)',
+                self.reviews,
+            )
+            self.stats['reviews'] += len(self.reviews)
+            self.reviews = []
+            if self.progress:
+                elapsed = time.monotonic() - self.started
+                self.progress(f"    {self.stats['sessions']:,} sessions, {self.stats['reviews']:,} reviews "
+                              f"({self.stats['reviews'] / max(elapsed, 1e-9):,.0f} reviews/s)")
+        if self.aggregates:
+            cursor.executemany(
+                'INSERT INTO review_aggregates (study_session_id, word_id, day, correct_count, wrong_count, '
+                'last_reviewed_at) VALUES (?, ?, ?, ?, ?, ?)',
+                self.aggregates,
+            )
+            self.stats['aggregates'] += len(self.aggregates)
+            self.aggregates = []
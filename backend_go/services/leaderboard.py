@@ -0,0 +1,56 @@
+from flask import request
+from sqlalchemy.orm import noload
+from werkzeug.datastructures import MultiDict
+from models import db, GroupWordStats, Word, WordReviewStats
+from services.catalog import get_catalog
+from services.pagination import paginate
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+
+def _page_args(args):
+    # ?limit=&cursor= map onto paginate()'s keyset mode; rankings have no page numbers
+    limit = max(1, min(args.get('limit', DEFAULT_LIMIT, type=int), MAX_LIMIT))
+    return MultiDict({'per_page': limit, 'cursor': args.get('cursor', '')})
+
+
+def _words(word_ids):
+    catalog = get_catalog()
+    if catalog is not None:
+        return {i: catalog.word(i) for i in word_ids}
+    if not word_ids:
+        return {}
+    return {w.id: w for w in Word.query.options(noload(Word.stats)).filter(Word.id.in_(word_ids))}
+
+
+def hardest_words(group_id=None, args=None):
+    """A page of the most-missed words, highest smoothed error rate first.
+
+    Overall the page is read off the error_rate index of word_review_stats;
+    for a group, off group_word_stats, which counts only the reviews made in
+    that group's study sessions. Words never reviewed are not ranked.
+    """
+    args = request.args if args is None else args
+    model = WordReviewStats if group_id is None else GroupWordStats
+    query = db.session.query(model.word_id, model.correct_count, model.wrong_count, model.error_rate)
+    if group_id is not None:
+        query = query.filter(GroupWordStats.group_id == group_id)
+    rows, pagination = paginate(query, [model.error_rate, model.word_id], descending=True, args=_page_args(args))
+
+    words = _words([row.word_id for row in rows])
+    data = []
+    for row in rows:
+        word = words.get(row.word_id)
+        if word is None:
+            continue
+        data.append({
+            'id': row.word_id,
+            'japanese': word.japanese,
+            'romaji': word.romaji,
+            'english': word.english,
+            'correct_count': row.correct_count,
+            'wrong_count': row.wrong_count,
+            'error_rate': round(row.error_rate, 4),
+        })
+    return data, pagination
@@ -0,0 +1,109 @@
+import zlib
+from functools import partial
+from flask import abort, current_app, jsonify, request, stream_with_context
+
+# Content-Encodings offered to clients, in order of preference, with their zlib wbits
+ENCODINGS = {'gzip': 31, 'deflate': 15}
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def parse_fields(allowed, args=None):
+    """Field names asked for with ``?fields=a,b``, or None for every field.
+
+    Names keep the order given, without repeats; an unknown name is a 400
+    listing the ``allowed`` ones.
+    """
+    args = request.args if args is None else args
+    names = [name.strip() for name in args.get('fields', '').split(',') if name.strip()]
+    if not names:
+        return None
+    unknown = [name for name in names if name not in allowed]
+    if unknown:
+        abort(400, description=f"Unknown fields: {', '.join(unknown)}; allowed: {', '.join(allowed)}")
+    return tuple(dict.fromkeys(names))
+
+
+def project(data, fields):
+    """``data`` reduced to ``fields`` (all of it for None); absent keys stay absent"""
+    if fields is None:
+        return data
+    return {name: data[name] for name in fields if name in data}
+
+
+def _pretty(app):
+    # jsonify indents in debug mode unless JSON compaction is forced
+    return (app.json.compact is None and app.debug) or app.json.compact is False
+
+
+def list_response(items, pagination, serialize=None):
+    """``{"data": [...], "pagination": {...}}`` for a page of ``items``.
+
+    Pages of at least STREAM_MIN_ITEMS items are streamed, each chunk
+    serialized as it is sent, instead of building the whole body first;
+    the bytes are the ones jsonify would produce. Pretty-printed (debug)
+    responses are always built whole.
+    """
+    serialize = serialize or (lambda item: item)
+    app = current_app._get_current_object()
+    if len(items) < app.config['STREAM_MIN_ITEMS'] or _pretty(app):
+        return jsonify({'data': [serialize(item) for item in items], 'pagination': pagination})
+
+    dumps = partial(app.json.dumps, separators=(',', ':'))
+
+    def generate():
+        parts, size = ['{"data":['], 0
+        for i, item in enumerate(items):
+            part = dumps(serialize(item))
+            parts.append(',' + part if i else part)
+            size += len(part) + 1
+            if size >= STREAM_CHUNK_SIZE:
+                yield ''.join(parts).encode()
+                parts, size = [], 0
+        parts.append('],"pagination":' + dumps(pagination) + '}\n')
+        yield ''.join(parts).encode()
+
+    return app.response_class(stream_with_context(generate()), mimetype=app.json.mimetype)
+
+
+def _compress_chunks(chunks, wbits, level):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, wbits)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def compress_response(response):
+    """after_request hook: gzip or deflate JSON bodies the client accepts.
+
+    The encoding is negotiated from Accept-Encoding (q-values honoured,
+    gzip preferred). Buffered bodies under RESPONSE_COMPRESSION_MIN_BYTES
+    go out as they are; streamed ones are compressed chunk by chunk. An
+    encoded body gets its own ETag, ``<etag>-<encoding>``.
+    """
+    config = current_app.config
+    if not config.get('RESPONSE_COMPRESSION_ENABLED'):
+        return response
+    response.vary.add('Accept-Encoding')
+    if (response.status_code != 200 or response.direct_passthrough
+            or response.mimetype != current_app.json.mimetype or 'Content-Encoding' in response.headers):
+        return response
+    encoding = request.accept_encodings.best_match(list(ENCODINGS))
+    if encoding is None:
+        return response
+
+    wbits, level = ENCODINGS[encoding], config['RESPONSE_COMPRESSION_LEVEL']
+    if response.is_streamed:
+        response.response = _compress_chunks(response.iter_encoded(), wbits, level)
+        response.headers.pop('Content-Length', None)
+    else:
+        body = response.get_data()
+        if len(body) < config['RESPONSE_COMPRESSION_MIN_BYTES']:
+            return response
+        response.set_data(b''.join(_compress_chunks([body], wbits, level)))
+    response.headers['Content-Encoding'] = encoding
+    etag, weak = response.get_etag()
+    if etag:
+        response.set_etag(f'{etag}-{encoding}', weak)
+    return response
@@ -0,0 +1,18 @@
+from models import db, Word, WordsGroup
+from services.catalog import word_fields_query
+from services.pagination import paginate
+
+
+def group_words_page(group, args=None, fields=None):
+    """A page of the group's words, without the catalog.
+
+    Pages over words_groups(group_id, word_id), so the cost follows the page
+    size rather than the group size; the total is the stored word_count.
+    With ``fields`` the page is word_fields_query rows instead of Words.
+    """
+    query = db.session.query(WordsGroup.word_id).filter(WordsGroup.group_id == group.id)
+    rows, pagination = paginate(query, [WordsGroup.word_id], args=args, count=lambda: group.word_count)
+    ids = [row.word_id for row in rows]
+    words_query = Word.query if fields is None else word_fields_query(fields)
+    words = {w.id: w for w in words_query.filter(Word.id.in_(ids))} if ids else {}
+    return [words[i] for i in ids if i in words], pagination
@@ -0,0 +1,204 @@
+import logging
+import random
+import re
+import threading
+import time
+from collections import Counter
+from flask import current_app, g, has_app_context, request
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 250)
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus layout"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.count += 1
+        self.sum += value
+
+    def samples(self, labels):
+        """(suffix, labels, value) rows for _bucket, _sum and _count"""
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            yield '_bucket', dict(labels, le=_format_value(bound)), cumulative
+        yield '_bucket', dict(labels, le='+Inf'), self.count
+        yield '_sum', labels, self.sum
+        yield '_count', labels, self.count
+
+
+class RequestStats:
+    """SQL statements seen during one sampled request"""
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.shapes = Counter()
+
+    def record(self, statement, seconds):
+        self.queries += 1
+        self.sql_seconds += seconds
+        self.shapes[_WHITESPACE.sub(' ', statement).strip()] += 1
+
+    def repeated(self, threshold):
+        return [(shape, n) for shape, n in self.shapes.most_common() if n >= threshold]
+
+
+class Metrics:
+    """Per-endpoint request, SQL and N+1 metrics for the Prometheus endpoint"""
+
+    def __init__(self, sample_rate=1.0, n_plus_one_threshold=5):
+        self.sample_rate = sample_rate
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self.lock = threading.Lock()
+        self.requests = Counter()            # (endpoint, method, status) -> n
+        self.latency = {}                    # endpoint -> Histogram (seconds)
+        self.sampled = Counter()             # endpoint -> sampled requests
+        self.sql_latency = {}                # endpoint -> Histogram (seconds)
+        self.query_counts = {}               # endpoint -> Histogram (statements)
+        self.n_plus_one = Counter()          # endpoint -> requests flagged
+
+    def should_sample(self):
+        return self.sample_rate >= 1.0 or random.random() < self.sample_rate
+
+    def observe(self, endpoint, method, status, seconds, stats=None):
+        suspects = stats.repeated(self.n_plus_one_threshold) if stats is not None else []
+        with self.lock:
+            self.requests[(endpoint, method, str(status))] += 1
+            _histogram(self.latency, endpoint, LATENCY_BUCKETS).observe(seconds)
+            if stats is not None:
+                self.sampled[endpoint] += 1
+                _histogram(self.sql_latency, endpoint, LATENCY_BUCKETS).observe(stats.sql_seconds)
+                _histogram(self.query_counts, endpoint, QUERY_COUNT_BUCKETS).observe(stats.queries)
+                if suspects:
+                    self.n_plus_one[endpoint] += 1
+        return suspects
+
+    def render(self, gauges=()):
+        """Everything collected so far in the Prometheus text exposition format"""
+        with self.lock:
+            families = [
+                ('http_requests_total', 'counter', 'Requests handled, by endpoint, method and status',
+                 [('', {'endpoint': e, 'method': m, 'status': s}, n)
+                  for (e, m, s), n in sorted(self.requests.items())]),
+                ('http_request_duration_seconds', 'histogram', 'Wall time of request handling',
+                 _histogram_samples(self.latency)),
+                ('sql_sampled_requests_total', 'counter', 'Requests whose SQL was instrumented',
+                 [('', {'endpoint': e}, n) for e, n in sorted(self.sampled.items())]),
+                ('sql_request_duration_seconds', 'histogram', 'SQL time per sampled request',
+                 _histogram_samples(self.sql_latency)),
+                ('sql_queries_per_request', 'histogram', 'SQL statements per sampled request',
+                 _histogram_samples(self.query_counts)),
+                ('sql_n_plus_one_requests_total', 'counter',
+                 'Sampled requests repeating one statement shape at least the N+1 threshold',
+                 [('', {'endpoint': e}, n) for e, n in sorted(self.n_plus_one.items())]),
+            ]
+        families.extend(gauges)
+
+        lines = []
+        for name, kind, help_text, samples in families:
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            for suffix, labels, value in samples:
+                lines.append(f'{name}{suffix}{_format_labels(labels)} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+def _histogram(histograms, endpoint, buckets):
+    if endpoint not in histograms:
+        histograms[endpoint] = Histogram(buckets)
+    return histograms[endpoint]
+
+
+def _histogram_samples(histograms):
+    samples = []
+    for endpoint, histogram in sorted(histograms.items()):
+        samples.extend(histogram.samples({'endpoint': endpoint}))
+    return samples
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for v in labels.values())
+    return '{' + ','.join(f'{k}="{v}"' for k, v in zip(labels, escaped)) + '}'
+
+
+def _format_value(value):
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def init_metrics(app, db):
+    """Hook request timing and SQL instrumentation into the app and its engines"""
+    if not app.config.get('METRICS_ENABLED'):
+        return None
+
+    metrics = Metrics(
+        sample_rate=app.config['METRICS_SAMPLE_RATE'],
+        n_plus_one_threshold=app.config['METRICS_N_PLUS_ONE_THRESHOLD'],
+    )
+    app.extensions['metrics'] = metrics
+
+    with app.app_context():
+        for engine in db.engines.values():
+            instrument_engine(engine)
+
+    @app.before_request
+    def start_request_metrics():
+        g.metrics_started = time.perf_counter()
+        g.query_stats = RequestStats() if metrics.should_sample() else None
+
+    @app.after_request
+    def finish_request_metrics(response):
+        started = g.get('metrics_started')
+        if started is None:
+            return response
+        endpoint = request.url_rule.endpoint if request.url_rule is not None else 'unmatched'
+        stats = g.get('query_stats')
+        suspects = metrics.observe(endpoint, request.method, response.status_code,
+                                   time.perf_counter() - started, stats)
+        for shape, n in suspects:
+            logger.warning('Possible N+1 in %s: %d executions of %s', endpoint, n, shape[:200])
+        return response
+
+    return metrics
+
+
+def get_metrics():
+    return current_app.extensions.get('metrics')
+
+
+def instrument_engine(engine):
+    """Record the engine's statements in the sampled requests' SQL stats"""
+    event.listen(engine, 'before_cursor_execute', _before_execute)
+    event.listen(engine, 'after_cursor_execute', _after_execute)
+
+
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_app_context() and g.get('query_stats') is not None:
+        conn.info.setdefault('metrics_started', []).append(time.perf_counter())
+
+
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+    if not has_app_context():
+        return
+    stats = g.get('query_stats')
+    started = conn.info.get('metrics_started')
+    if stats is not None and started:
+        stats.record(statement, time.perf_counter() - started.pop())
@@ -0,0 +1,294 @@
+import hashlib
+import importlib.util
+import logging
+import os
+import sqlite3
+import time
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'db', 'migrations')
+MIGRATION_EXTENSIONS = ('.sql', '.py')
+
+BOOTSTRAP_SQL = '''
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    version TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    checksum TEXT NOT NULL,
+    applied_at DATETIME NOT NULL,
+    duration_ms INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS schema_migration_steps (
+    version TEXT NOT NULL,
+    step TEXT NOT NULL,
+    last_rowid INTEGER,
+    completed_at DATETIME,
+    PRIMARY KEY (version, step)
+);
+
+CREATE TABLE IF NOT EXISTS schema_deferred_indexes (
+    name TEXT PRIMARY KEY,
+    sql TEXT NOT NULL
+);
+'''
+
+
+class MigrationError(Exception):
+    pass
+
+
+def migration_files(migrations_dir=MIGRATIONS_DIR):
+    return sorted(f for f in os.listdir(migrations_dir)
+                  if f.endswith(MIGRATION_EXTENSIONS) and not f.startswith(('_', '.')))
+
+
+def migration_version(migration_file):
+    """'0008' for 0008_review_compaction.sql"""
+    return migration_file.split('_', 1)[0]
+
+
+def _checksum(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def _now():
+    return datetime.utcnow().isoformat(' ')
+
+
+def applied_migrations(conn):
+    """Mapping of applied version -> (name, checksum); empty before the first run"""
+    try:
+        return {version: (name, checksum) for version, name, checksum in conn.execute(
+            'SELECT version, name, checksum FROM schema_migrations')}
+    except sqlite3.OperationalError:
+        return {}
+
+
+def pending_migrations(conn, migrations_dir=MIGRATIONS_DIR):
+    """Migration files not recorded in schema_migrations yet, in order.
+
+    One directory listing and one query, cheap enough for every startup.
+    """
+    applied = applied_migrations(conn)
+    return [f for f in migration_files(migrations_dir) if migration_version(f) not in applied]
+
+
+def verify_checksums(conn, migrations_dir=MIGRATIONS_DIR):
+    """Raise MigrationError if an applied migration file was edited afterwards"""
+    changed = []
+    for version, (name, checksum) in applied_migrations(conn).items():
+        path = os.path.join(migrations_dir, name)
+        if os.path.exists(path) and _checksum(path) != checksum:
+            changed.append(name)
+    if changed:
+        raise MigrationError(f"Applied migrations changed on disk: {', '.join(sorted(changed))}; "
+                             'add a new migration instead')
+
+
+class Migration:
+    """Handle passed to ``upgrade(migration)`` of a .py migration.
+
+    Every step is its own transaction and is recorded in
+    schema_migration_steps, so re-running an interrupted migration skips
+    finished steps and resumes a backfill at the last committed chunk.
+    """
+
+    def __init__(self, conn, version, progress=None):
+        self.conn = conn
+        self.version = version
+        self.progress = progress
+
+    def _step_state(self, step):
+        return self.conn.execute(
+            'SELECT last_rowid, completed_at FROM schema_migration_steps WHERE version = ? AND step = ?',
+            (self.version, step)).fetchone()
+
+    def _record_step(self, step, last_rowid=None, completed=False):
+        self.conn.execute(
+            'INSERT INTO schema_migration_steps (version, step, last_rowid, completed_at) VALUES (?, ?, ?, ?) '
+            'ON CONFLICT(version, step) DO UPDATE SET last_rowid = excluded.last_rowid, '
+            'completed_at = excluded.completed_at',
+            (self.version, step, last_rowid, _now() if completed else None))
+
+    def execute(self, step, sql):
+        """Run ``sql`` (e.g. a CREATE INDEX) once, in its own transaction"""
+        state = self._step_state(step)
+        if state and state[1]:
+            return
+        started = time.monotonic()
+        try:
+            self.conn.executescript('BEGIN;\n' + sql)
+            self._record_step(step, completed=True)
+            self.conn.commit()
+        except BaseException:
+            self.conn.rollback()
+            raise
+        if self.progress:
+            self.progress(f"    {step}: {(time.monotonic() - started) * 1000:,.0f} ms")
+
+    def run(self, step, fn):
+        """Call ``fn(conn)`` once, in its own transaction, for work that is not plain SQL"""
+        state = self._step_state(step)
+        if state and state[1]:
+            return
+        started = time.monotonic()
+        try:
+            fn(self.conn)
+            self._record_step(step, completed=True)
+            self.conn.commit()
+        except BaseException:
+            self.conn.rollback()
+            raise
+        if self.progress:
+            self.progress(f"    {step}: {(time.monotonic() - started) * 1000:,.0f} ms")
+
+    def backfill(self, step, table, sql, batch_size=5000):
+        """Run ``sql`` over ``table`` in rowid ranges [:start, :end), one transaction per chunk.
+
+        Rows up to the table's max rowid when the step first starts are
+        covered; writes after that must be handled by the application or
+        a trigger added in the same migration.
+        """
+        state = self._step_state(step)
+        if state and state[1]:
+            return
+        last_rowid = state[0] if state else None
+        if last_rowid is None:
+            last_rowid = (self.conn.execute(f'SELECT min(rowid) FROM {table}').fetchone()[0] or 1) - 1
+        end_rowid = self.conn.execute(f'SELECT max(rowid) FROM {table}').fetchone()[0] or 0
+
+        started = time.monotonic()
+        rows = 0
+        while last_rowid < end_rowid:
+            chunk_end = min(last_rowid + batch_size, end_rowid)
+            try:
+                rows += self.conn.execute(sql, {'start': last_rowid + 1, 'end': chunk_end + 1}).rowcount
+                self._record_step(step, last_rowid=chunk_end)
+                self.conn.commit()
+            except BaseException:
+                self.conn.rollback()
+                raise
+            last_rowid = chunk_end
+            if self.progress:
+                self.progress(f"    {step}: up to rowid {last_rowid:,} of {end_rowid:,} "
+                              f"({(time.monotonic() - started) * 1000:,.0f} ms)")
+        self._record_step(step, last_rowid=last_rowid, completed=True)
+        self.conn.commit()
+        if self.progress:
+            self.progress(f"    {step}: {rows:,} rows in {(time.monotonic() - started) * 1000:,.0f} ms")
+
+
+def defer_indexes(conn, tables):
+    """Drop the secondary indexes of ``tables`` for a bulk load; returns their names.
+
+    The DDL is recorded in schema_deferred_indexes in the same transaction,
+    so restore_deferred_indexes recreates them even if the load never
+    finishes.
+    """
+    placeholders = ','.join('?' for _ in tables)
+    indexes = conn.execute(
+        f"SELECT name, sql FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL "
+        f"AND tbl_name IN ({placeholders})", tables
+    ).fetchall()
+    try:
+        conn.executemany('INSERT OR REPLACE INTO schema_deferred_indexes (name, sql) VALUES (?, ?)', indexes)
+        for name, _ in indexes:
+            conn.execute(f'DROP INDEX IF EXISTS "{name}"')
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    return [name for name, _ in indexes]
+
+
+def restore_deferred_indexes(conn):
+    """Recreate indexes dropped by defer_indexes; returns the names rebuilt"""
+    try:
+        deferred = conn.execute('SELECT name, sql FROM schema_deferred_indexes ORDER BY name').fetchall()
+    except sqlite3.OperationalError:
+        return []
+    restored = []
+    for name, sql in deferred:
+        try:
+            if not conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = ?", (name,)).fetchone():
+                conn.execute(sql)
+                restored.append(name)
+            conn.execute('DELETE FROM schema_deferred_indexes WHERE name = ?', (name,))
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+    return restored
+
+
+def _apply_sql(conn, path):
+    with open(path, 'r') as f:
+        sql = f.read()
+    try:
+        # one transaction per file: the script and its schema_migrations row commit together
+        conn.executescript('BEGIN;\n' + sql)
+    except BaseException:
+        conn.rollback()
+        raise
+
+
+def _apply_py(conn, path, version, progress):
+    spec = importlib.util.spec_from_file_location(f'migration_{version}', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    module.upgrade(Migration(conn, version, progress))
+
+
+def run_migrations(conn, progress=None, migrations_dir=MIGRATIONS_DIR):
+    """Apply pending migration files, in order, on a sqlite3 connection.
+
+    .sql files run in a single transaction each; .py files define
+    ``upgrade(migration)`` and run as resumable steps (see Migration).
+    Each applied file is recorded in schema_migrations with its checksum
+    and duration. Returns [(file, milliseconds)] of what was applied.
+    """
+    conn.executescript(BOOTSTRAP_SQL)
+    verify_checksums(conn, migrations_dir)
+    # indexes left dropped by an interrupted bulk import
+    for name in restore_deferred_indexes(conn):
+        if progress:
+            progress(f"  Restored deferred index: {name}")
+
+    applied = []
+    for migration_file in pending_migrations(conn, migrations_dir):
+        version = migration_version(migration_file)
+        path = os.path.join(migrations_dir, migration_file)
+        if progress:
+            progress(f"  Running: {migration_file}")
+        started = time.monotonic()
+        if migration_file.endswith('.py'):
+            _apply_py(conn, path, version, progress)
+        else:
+            _apply_sql(conn, path)
+        duration_ms = round((time.monotonic() - started) * 1000)
+        conn.execute(
+            'INSERT OR REPLACE INTO schema_migrations (version, name, checksum, applied_at, duration_ms) '
+            'VALUES (?, ?, ?, ?, ?)',
+            (version, migration_file, _checksum(path), _now(), duration_ms))
+        conn.commit()
+        applied.append((migration_file, duration_ms))
+        if progress:
+            progress(f"    done in {duration_ms:,} ms")
+    return applied
+
+
+def init_migrations(app, db):
+    """Startup schema check: apply pending migrations with MIGRATE_ON_STARTUP, else warn"""
+    with app.app_context():
+        conn = db.engine.raw_connection()
+        try:
+            pending = pending_migrations(conn.driver_connection)
+            if pending and app.config.get('MIGRATE_ON_STARTUP'):
+                run_migrations(conn.driver_connection, progress=logger.info)
+            elif pending:
+                logger.warning('Database schema is behind; pending migrations: %s', ', '.join(pending))
+        finally:
+            conn.close()
@@ -0,0 +1,207 @@
+import base64
+import json
+import time
+from bisect import bisect_right
+from datetime import datetime
+from flask import abort, g, request
+from sqlalchemy import and_, false, or_
+from services.data_version import current_versions
+
+DEFAULT_PER_PAGE = 100
+MAX_PER_PAGE = 500
+COUNT_CACHE_TTL = 60.0
+COUNT_CACHE_SIZE = 256
+
+# (sql, params, data versions) -> (expires_at, total)
+_count_cache = {}
+
+
+def encode_cursor(values):
+    """Pack the ordering values of the last row into an opaque token"""
+    packed = [{'dt': v.isoformat()} if isinstance(v, datetime) else v for v in values]
+    raw = json.dumps(packed, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Inverse of encode_cursor; raises ValueError on a malformed token"""
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        packed = json.loads(raw)
+        if not isinstance(packed, list):
+            raise ValueError('not a list')
+        values = [datetime.fromisoformat(v['dt']) if isinstance(v, dict) else v for v in packed]
+        if not all(v is None or isinstance(v, (str, int, float, datetime)) for v in values):
+            raise ValueError('not a scalar')
+        return values
+    except (KeyError, TypeError, ValueError):
+        raise ValueError('invalid cursor')
+
+
+def cached_count(query):
+    """COUNT(*) for a query, memoized per learner, statement, parameters and data version"""
+    compiled = query.statement.compile()
+    key = (
+        g.get('learner_id'),
+        str(compiled),
+        tuple(sorted((k, repr(v)) for k, v in compiled.params.items())),
+        tuple(sorted(current_versions().items())),
+    )
+    now = time.monotonic()
+    hit = _count_cache.get(key)
+    if hit and hit[0] > now:
+        return hit[1]
+
+    total = query.order_by(None).count()
+    if len(_count_cache) >= COUNT_CACHE_SIZE:
+        _count_cache.clear()
+    _count_cache[key] = (now + COUNT_CACHE_TTL, total)
+    return total
+
+
+def _equal(column, value):
+    return column.is_(None) if value is None else column == value
+
+
+def _past(column, value, descending):
+    # SQLite sorts NULLs first ascending and last descending; a nullable
+    # column's NULLs come after every value going down, before going up
+    nullable = getattr(column.expression, 'nullable', True)
+    if value is None:
+        return column.isnot(None) if not descending else false()
+    step = column < value if descending else column > value
+    return or_(step, column.is_(None)) if descending and nullable else step
+
+
+def _keyset_filter(columns, values, descending):
+    clauses = []
+    for i, column in enumerate(columns):
+        prefix = [_equal(c, v) for c, v in zip(columns[:i], values[:i])]
+        clauses.append(and_(*prefix, _past(column, values[i], descending)))
+    return or_(*clauses)
+
+
+def _row_values(item, columns):
+    return [getattr(item, c.key) for c in columns]
+
+
+def _arg_flag(args, name, default):
+    value = args.get(name)
+    if value is None:
+        return default
+    return value.lower() not in ('0', 'false', 'no', '')
+
+
+def page_params(args):
+    """(page, per_page) from request args, with per_page capped at MAX_PER_PAGE"""
+    page = max(1, args.get('page', 1, type=int))
+    per_page = args.get('per_page', DEFAULT_PER_PAGE, type=int)
+    return page, max(1, min(per_page, MAX_PER_PAGE))
+
+
+def paginate(query, columns, descending=False, args=None, fetch=None, count=None):
+    """Page a query ordered by ``columns`` (unique together, e.g. id or created_at+id).
+
+    With ``?cursor=`` the page is found by seeking past the cursor's key on the
+    ordered columns; without it the legacy ``?page=`` offset mode is used.
+    ``per_page`` is capped at MAX_PER_PAGE and ``total=0`` skips the count;
+    counts are cached until the data versions move on. ``fetch`` turns the
+    ordered, limited query into rows (default ``.all()``), e.g. to aggregate
+    over just the page; rows must expose the ordering columns as attributes.
+    ``count`` returns the total instead of the cached COUNT(*), e.g. from a
+    denormalized counter.
+    """
+    args = request.args if args is None else args
+    fetch = fetch or (lambda page_query: page_query.all())
+    count = count or (lambda: cached_count(query))
+    page, per_page = page_params(args)
+    ordering = [c.desc() if descending else c.asc() for c in columns]
+    cursor = args.get('cursor')
+
+    if cursor is not None:
+        ordered = query.order_by(*ordering)
+        if cursor:
+            try:
+                values = decode_cursor(cursor)
+            except ValueError:
+                abort(400, description='Invalid cursor')
+            if len(values) != len(columns):
+                abort(400, description='Invalid cursor')
+            ordered = ordered.filter(_keyset_filter(columns, values, descending))
+        rows = fetch(ordered.limit(per_page + 1))
+        has_more = len(rows) > per_page
+        items = rows[:per_page]
+        pagination = {
+            'per_page': per_page,
+            'next_cursor': encode_cursor(_row_values(items[-1], columns)) if has_more else None,
+            'has_more': has_more,
+        }
+        if _arg_flag(args, 'total', False):
+            pagination['total_items'] = count()
+        return items, pagination
+
+    rows = fetch(query.order_by(*ordering).offset((page - 1) * per_page).limit(per_page + 1))
+    has_more = len(rows) > per_page
+    items = rows[:per_page]
+
+    total_items = total_pages = None
+    if _arg_flag(args, 'total', True):
+        total_items = count()
+        total_pages = (total_items + per_page - 1) // per_page
+
+    return items, {
+        'current_page': page,
+        'per_page': per_page,
+        'total_pages': total_pages,
+        'total_items': total_items,
+        'next_cursor': encode_cursor(_row_values(items[-1], columns)) if has_more else None,
+    }
+
+
+def paginate_ids(ids, args=None):
+    """paginate() over an ascending array of unique ids held in memory.
+
+    Accepts the same ``page``/``per_page``/``cursor``/``total`` arguments and
+    returns the same pagination block; the cursor seeks by bisection.
+    """
+    args = request.args if args is None else args
+    page, per_page = page_params(args)
+    cursor = args.get('cursor')
+
+    if cursor is not None:
+        start = 0
+        if cursor:
+            try:
+                values = decode_cursor(cursor)
+            except ValueError:
+                abort(400, description='Invalid cursor')
+            if len(values) != 1 or not isinstance(values[0], int):
+                abort(400, description='Invalid cursor')
+            start = bisect_right(ids, values[0])
+        items = ids[start:start + per_page]
+        has_more = start + per_page < len(ids)
+        pagination = {
+            'per_page': per_page,
+            'next_cursor': encode_cursor([items[-1]]) if has_more else None,
+            'has_more': has_more,
+        }
+        if _arg_flag(args, 'total', False):
+            pagination['total_items'] = len(ids)
+        return items, pagination
+
+    start = (page - 1) * per_page
+    items = ids[start:start + per_page]
+    has_more = start + per_page < len(ids)
+
+    total_items = total_pages = None
+    if _arg_flag(args, 'total', True):
+        total_items = len(ids)
+        total_pages = (total_items + per_page - 1) // per_page
+
+    return items, {
+        'current_page': page,
+        'per_page': per_page,
+        'total_pages': total_pages,
+        'total_items': total_items,
+        'next_cursor': encode_cursor([items[-1]]) if has_more else None,
+    }
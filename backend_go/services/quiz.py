@@ -0,0 +1,63 @@
+import random
+from models import db, WordDistractor
+
+MAX_QUESTIONS = 100
+MAX_CHOICES = 8
+
+
+def indexed_distractors(group_id, word_ids):
+    """{word_id: [distractor ids, most confusable first]} in one index lookup"""
+    found = {}
+    if not word_ids:
+        return found
+    rows = db.session.query(WordDistractor.word_id, WordDistractor.distractor_id)\
+        .filter(WordDistractor.group_id == group_id, WordDistractor.word_id.in_(word_ids))\
+        .order_by(WordDistractor.word_id, WordDistractor.score, WordDistractor.distractor_id)
+    for word_id, distractor_id in rows:
+        found.setdefault(word_id, []).append(distractor_id)
+    return found
+
+
+def build_quiz(catalog, group, n, choices, rng=None):
+    """``n`` multiple-choice questions over the group's words.
+
+    Each question shows a word's kana and offers its romaji among
+    ``choices - 1`` distractors sampled from the word's most confusable
+    indexed neighbours, topped up with random group members when the
+    index has too few (tiny groups, words added since the last refresh).
+    """
+    rng = rng or random.Random()
+    members = group.word_ids
+    # sample positions, not a copy of the group: cost follows n, not the group size
+    word_ids = [members[i] for i in rng.sample(range(len(members)), min(n, len(members)))]
+    distractors = indexed_distractors(group.id, word_ids)
+
+    questions = []
+    for word_id in word_ids:
+        word = catalog.word(word_id)
+        wanted = choices - 1
+        # sample among the best few so repeated quizzes do not always look the same
+        pool = distractors.get(word_id, [])[:wanted * 2]
+        picked = rng.sample(pool, min(wanted, len(pool)))
+        seen = {word.romaji.lower()} | {catalog.word(i).romaji.lower() for i in picked}
+        if len(picked) < wanted:
+            # a few spare draws cover the word itself and repeated romaji
+            for i in rng.sample(range(len(members)), min(len(members), wanted * 3)):
+                if len(picked) >= wanted:
+                    break
+                other_id = members[i]
+                romaji = catalog.word(other_id).romaji.lower()
+                if romaji not in seen:
+                    picked.append(other_id)
+                    seen.add(romaji)
+
+        options = [word] + [catalog.word(i) for i in picked]
+        rng.shuffle(options)
+        questions.append({
+            'word_id': word.id,
+            'prompt': word.japanese,
+            'english': word.english,
+            'choices': [{'word_id': o.id, 'romaji': o.romaji} for o in options],
+            'answer_index': options.index(word),
+        })
+    return questions
@@ -0,0 +1,148 @@
+import hashlib
+import threading
+from collections import OrderedDict, namedtuple
+from functools import wraps
+from flask import current_app, g, request
+from services.data_version import current_versions
+from services.list_responses import ENCODINGS
+
+CacheEntry = namedtuple('CacheEntry', 'body etag mimetype')
+
+
+class ResponseCache:
+    """LRU of serialized GET responses bounded by total body bytes"""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, entry):
+        if len(entry.body) > self.max_bytes:
+            return
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.size -= len(old.body)
+            self.entries[key] = entry
+            self.size += len(entry.body)
+            while self.size > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= len(evicted.body)
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self.entries),
+                'bytes': self.size,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'not_modified': self.not_modified,
+                'evictions': self.evictions,
+            }
+
+
+def init_response_cache(app):
+    if app.config.get('RESPONSE_CACHE_ENABLED'):
+        app.extensions['response_cache'] = ResponseCache(app.config['RESPONSE_CACHE_MAX_BYTES'])
+
+
+def get_response_cache():
+    return current_app.extensions.get('response_cache')
+
+
+def _matched_etag(etag):
+    # the client may hold the identity body's tag or that of an encoding it accepts
+    accepted = [f'{etag}-{encoding}' for encoding in ENCODINGS if request.accept_encodings[encoding]]
+    for tag in (etag, *accepted):
+        if request.if_none_match.contains(tag):
+            return tag
+    return None
+
+
+def _conditional(entry, cache):
+    matched = _matched_etag(entry.etag)
+    if matched is not None:
+        if cache is not None:
+            with cache.lock:
+                cache.not_modified += 1
+        response = current_app.response_class(status=304)
+        response.set_etag(matched)
+    else:
+        response = current_app.response_class(entry.body, mimetype=entry.mimetype)
+        response.set_etag(entry.etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+def _cache_when_sent(cache, key, chunks, mimetype):
+    sent = []
+    for chunk in chunks:
+        sent.append(chunk)
+        yield chunk
+    body = b''.join(sent)
+    cache.put(key, CacheEntry(body, hashlib.sha1(body).hexdigest(), mimetype))
+
+
+def cached_response(*scopes):
+    """Serve a GET view from the response cache, keyed on the data ``scopes``.
+
+    The key combines learner, path, query string and the current versions
+    of the given scopes, so any write that bumps one of them makes old entries
+    unreachable. Responses carry a strong ETag and honour If-None-Match.
+    A streamed response goes out as it is generated and is cached once
+    its last chunk is sent; later requests get the ETag.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            cache = get_response_cache()
+            versions = current_versions()
+            key = (
+                g.get('learner_id'),
+                request.path,
+                tuple(sorted(request.args.items(multi=True))),
+                tuple(versions.get(scope, 0) for scope in scopes),
+            )
+
+            entry = cache.get(key) if cache is not None else None
+            if entry is None:
+                response = current_app.make_response(view(*args, **kwargs))
+                if response.status_code != 200 or response.direct_passthrough:
+                    return response
+                if response.is_streamed:
+                    if cache is not None:
+                        response.response = _cache_when_sent(
+                            cache, key, response.iter_encoded(), response.mimetype)
+                    return response
+                body = response.get_data()
+                entry = CacheEntry(body, hashlib.sha1(body).hexdigest(), response.mimetype)
+                if cache is not None:
+                    cache.put(key, entry)
+            return _conditional(entry, cache)
+        return wrapper
+    return decorator
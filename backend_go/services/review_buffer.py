@@ -0,0 +1,287 @@
+import atexit
+import json
+import logging
+import threading
+import time
+import weakref
+from collections import Counter, deque, namedtuple
+from functools import wraps
+from flask import current_app, g
+from models import db
+from services.reviews import record_reviews
+
+logger = logging.getLogger(__name__)
+
+PendingReview = namedtuple('PendingReview', 'session_id group_id word_id correct created_at learner_id attempts',
+                           defaults=(None, 0))
+SessionRef = namedtuple('SessionRef', 'id group_id')
+# flush() target covering every learner's reviews
+ALL_LEARNERS = object()
+
+
+class BufferFull(Exception):
+    """Raised when the buffer stays full for longer than the put timeout"""
+
+
+class ReviewBuffer:
+    """Bounded in-process queue of acknowledged reviews.
+
+    A daemon thread group-commits the queue every ``flush_items`` reviews or
+    every ``window_ms`` milliseconds, whichever comes first, so an
+    acknowledged review is at most one durability window away from disk.
+
+    A review whose flush fails ``max_attempts`` times is retried on its own
+    and, if it still fails, appended to the NDJSON ``dead_letter_path``
+    instead of being requeued.
+    """
+
+    def __init__(self, app, max_items=10000, flush_items=500, window_ms=200, put_timeout_ms=1000,
+                 max_attempts=3, dead_letter_path=None):
+        self.app = app
+        self.max_items = max_items
+        self.flush_items = flush_items
+        self.window = window_ms / 1000.0
+        self.put_timeout = put_timeout_ms / 1000.0
+        self.max_attempts = max_attempts
+        self.dead_letter_path = dead_letter_path
+        self.pending = deque()
+        self.pending_by_learner = Counter()
+        self.cond = threading.Condition()
+        self.flush_lock = threading.Lock()
+        self.thread = None
+        self.closed = False
+        self.flushed_total = 0
+        self.dead_lettered_total = 0
+        _open_buffers.add(self)
+
+    def submit(self, review):
+        """Queue a PendingReview, blocking up to the put timeout when full"""
+        deadline = time.monotonic() + self.put_timeout
+        with self.cond:
+            if self.closed:
+                raise BufferFull('review buffer is shut down')
+            while len(self.pending) >= self.max_items:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise BufferFull('review buffer is full')
+                self.cond.notify_all()
+                self.cond.wait(remaining)
+            self.pending.append(review)
+            self.pending_by_learner[review.learner_id] += 1
+            if len(self.pending) >= self.flush_items:
+                self.cond.notify_all()
+        self._ensure_thread()
+
+    def __len__(self):
+        return len(self.pending)
+
+    def pending_for(self, learner_id):
+        """Number of queued reviews of one learner (None in single-learner mode)"""
+        return self.pending_by_learner[learner_id]
+
+    def _take(self, learner_id):
+        with self.cond:
+            if learner_id is ALL_LEARNERS:
+                batch = list(self.pending)
+                self.pending.clear()
+                self.pending_by_learner.clear()
+            else:
+                batch = [r for r in self.pending if r.learner_id == learner_id]
+                if batch:
+                    self.pending = deque(r for r in self.pending if r.learner_id != learner_id)
+                    del self.pending_by_learner[learner_id]
+            self.cond.notify_all()
+        return batch
+
+    def _requeue(self, reviews):
+        with self.cond:
+            self.pending.extendleft(reversed(reviews))
+            self.pending_by_learner.update(r.learner_id for r in reviews)
+
+    def flush(self, learner_id=ALL_LEARNERS):
+        """Write what is queued so far; returns the number of reviews written.
+
+        ``learner_id`` limits the flush to one learner's reviews (None in
+        single-learner mode).
+        """
+        with self.flush_lock:
+            batch = self._take(learner_id)
+            if not batch:
+                return 0
+            written = set()
+            try:
+                with self.app.app_context():
+                    deferred = self._write(batch, written)
+            except Exception as e:
+                unwritten = [r._replace(attempts=r.attempts + 1) for r in batch if r.learner_id not in written]
+                retry = [r for r in unwritten if r.attempts < self.max_attempts]
+                exhausted = [r for r in unwritten if r.attempts >= self.max_attempts]
+                logger.exception('Review buffer flush failed; requeueing %d reviews, giving up on %d',
+                                 len(retry), len(exhausted))
+                self._requeue(retry)
+                count = len(batch) - len(unwritten) + self._write_each(exhausted, e)
+                self.flushed_total += count
+                if retry:
+                    raise
+                return count
+            if deferred:
+                self._requeue(deferred)
+            self.flushed_total += len(batch) - len(deferred)
+            return len(batch) - len(deferred)
+
+    def _write_each(self, reviews, error):
+        """Write reviews one at a time so only the failing ones are dead-lettered.
+
+        Returns the number written.
+        """
+        written = 0
+        for review in reviews:
+            try:
+                with self.app.app_context():
+                    deferred = self._write([review], set())
+            except Exception as e:
+                self._dead_letter(review, e)
+                continue
+            if deferred:
+                # the learner started moving meanwhile; the move will finish
+                self._dead_letter(review, error)
+            else:
+                written += 1
+        return written
+
+    def _dead_letter(self, review, error):
+        record = dict(review._asdict(), created_at=review.created_at.isoformat() + 'Z', error=repr(error))
+        line = json.dumps(record, separators=(',', ':'))
+        self.dead_lettered_total += 1
+        logger.error('Dead-lettering review after %d failed flushes: %s', review.attempts, line)
+        if self.dead_letter_path:
+            try:
+                with open(self.dead_letter_path, 'a', encoding='utf-8') as f:
+                    f.write(line + '\n')
+            except OSError:
+                logger.exception('Could not write review dead-letter file %s', self.dead_letter_path)
+
+    def _write(self, batch, written):
+        """Write a batch, adding each committed learner to ``written``.
+
+        Returns the reviews of learners being moved between shards, to retry later.
+        """
+        by_learner = {}
+        for review in batch:
+            ref = SessionRef(review.session_id, review.group_id)
+            by_learner.setdefault(review.learner_id, {}).setdefault(ref, []).append(review)
+        deferred = []
+        for learner_id, by_session in by_learner.items():
+            # one commit per learner database in multi-learner mode
+            if learner_id is not None:
+                from services.sharding import activate_learner, ACTIVE
+                if activate_learner(learner_id) != ACTIVE:
+                    deferred.extend(r for reviews in by_session.values() for r in reviews)
+                    continue
+            try:
+                for ref, reviews in by_session.items():
+                    record_reviews(ref, [
+                        {'word_id': r.word_id, 'correct': r.correct, 'created_at': r.created_at} for r in reviews
+                    ])
+                db.session.commit()
+                written.add(learner_id)
+            finally:
+                db.session.remove()
+                g.pop('learner_id', None)
+                g.pop('learner_engine', None)
+        return deferred
+
+    def _ensure_thread(self):
+        if self.thread is not None:
+            return
+        with self.cond:
+            if self.thread is None and not self.closed:
+                self.thread = threading.Thread(target=self._run, name='review-buffer-flusher', daemon=True)
+                self.thread.start()
+
+    def _run(self):
+        while True:
+            with self.cond:
+                if not self.closed and len(self.pending) < self.flush_items:
+                    self.cond.wait(self.window)
+                if self.closed:
+                    return
+            try:
+                self.flush()
+            except Exception:
+                time.sleep(self.window)
+
+    def close(self):
+        """Stop the flusher and write whatever is still queued"""
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+        if self.thread is not None:
+            self.thread.join()
+        _open_buffers.discard(self)
+        self.flush()
+
+
+# Buffers still open at interpreter exit; weak so that every create_app
+# does not pin its app and buffer for the life of the process
+_open_buffers = weakref.WeakSet()
+
+
+@atexit.register
+def _close_open_buffers():
+    for buffer in list(_open_buffers):
+        try:
+            buffer.close()
+        except Exception:
+            logger.exception('Review buffer failed to flush at exit')
+
+
+def init_review_buffer(app):
+    """Attach a ReviewBuffer to the app when REVIEW_WRITE_BEHIND is enabled"""
+    if not app.config.get('REVIEW_WRITE_BEHIND'):
+        return None
+
+    buffer = ReviewBuffer(
+        app,
+        max_items=app.config['REVIEW_BUFFER_SIZE'],
+        flush_items=app.config['REVIEW_FLUSH_ITEMS'],
+        window_ms=app.config['REVIEW_DURABILITY_WINDOW_MS'],
+        put_timeout_ms=app.config['REVIEW_BUFFER_PUT_TIMEOUT_MS'],
+        max_attempts=app.config['REVIEW_FLUSH_MAX_ATTEMPTS'],
+        dead_letter_path=app.config['REVIEW_DEAD_LETTER_PATH'],
+    )
+    app.extensions['review_buffer'] = buffer
+    return buffer
+
+
+def get_review_buffer():
+    return current_app.extensions.get('review_buffer')
+
+
+def flush_pending_reviews(strict=False):
+    """Make the current learner's queued reviews visible to this request's reads.
+
+    Other learners' reviews are left to the flusher. A failed flush is
+    logged and the read is served from what is already written, the
+    reviews staying queued; ``strict`` re-raises instead, for admin writes
+    that must not run ahead of queued reviews.
+    """
+    buffer = get_review_buffer()
+    learner_id = g.get('learner_id')
+    if buffer is None or not buffer.pending_for(learner_id):
+        return
+    try:
+        buffer.flush(learner_id)
+    except Exception:
+        if strict:
+            raise
+        logger.warning('Serving a read without the queued reviews of learner %s', learner_id)
+
+
+def consistent_read(view):
+    """Flush the current learner's queued reviews before a view that reads review data"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        flush_pending_reviews()
+        return view(*args, **kwargs)
+    return wrapper
@@ -0,0 +1,39 @@
+from sqlalchemy import insert, text
+from models import db, WordsReviewItem
+from services.word_stats import record_word_reviews, record_group_word_reviews
+from services.rollups import record_review_activity
+from services.scheduler import record_schedule_reviews
+from services.data_version import bump_versions, HISTORY
+
+
+def record_reviews(session, reviews):
+    """Insert review dicts (word_id, correct, created_at) for one session.
+
+    Rows go out as one executemany INSERT together with the word counter,
+    daily rollup and schedule updates; the caller owns the commit. Returns the new ids
+    in input order.
+    """
+    if not reviews:
+        return []
+
+    rows = [
+        {
+            'study_session_id': session.id,
+            'word_id': r['word_id'],
+            'correct': r['correct'],
+            'created_at': r['created_at'],
+        }
+        for r in reviews
+    ]
+    db.session.execute(insert(WordsReviewItem), rows)
+    # one executemany inside the write transaction allocates consecutive ids
+    last_id = db.session.execute(text('SELECT last_insert_rowid()')).scalar()
+    ids = list(range(last_id - len(rows) + 1, last_id + 1))
+
+    word_reviews = [(r['word_id'], r['correct'], r['created_at']) for r in rows]
+    record_word_reviews(word_reviews)
+    record_group_word_reviews(session.group_id, word_reviews)
+    record_schedule_reviews(word_reviews)
+    record_review_activity([(session.group_id, r['correct'], r['created_at']) for r in rows])
+    bump_versions(HISTORY)
+    return ids
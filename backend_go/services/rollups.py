@@ -0,0 +1,129 @@
+from datetime import timedelta
+from sqlalchemy import case, func, or_, text
+from sqlalchemy.dialects.sqlite import insert
+from models import db, DailyActivity
+
+REBUILD_SQL = text("""
+INSERT INTO daily_activity (day, group_id, sessions_count, reviews_count, correct_count, last_session_id, last_session_at)
+SELECT day, group_id, SUM(sessions_count), SUM(reviews_count), SUM(correct_count), last_session_id, MAX(last_session_at)
+FROM (
+    SELECT DATE(created_at) AS day, group_id, COUNT(*) AS sessions_count, 0 AS reviews_count, 0 AS correct_count,
+           id AS last_session_id, MAX(created_at) AS last_session_at
+    FROM study_sessions
+    GROUP BY DATE(created_at), group_id
+    UNION ALL
+    SELECT r.day, s.group_id, 0, SUM(r.correct_count + r.wrong_count), SUM(r.correct_count), NULL, NULL
+    FROM review_history r
+    JOIN study_sessions s ON s.id = r.study_session_id
+    GROUP BY r.day, s.group_id
+)
+GROUP BY day, group_id
+""")
+
+
+def _upsert(totals):
+    if not totals:
+        return
+
+    rows = [dict(day=day, group_id=group_id, **counts) for (day, group_id), counts in totals.items()]
+    stmt = insert(DailyActivity)
+    excluded = stmt.excluded
+    newer_session = or_(
+        DailyActivity.last_session_at.is_(None),
+        excluded.last_session_at >= DailyActivity.last_session_at,
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[DailyActivity.day, DailyActivity.group_id],
+        set_={
+            'sessions_count': DailyActivity.sessions_count + excluded.sessions_count,
+            'reviews_count': DailyActivity.reviews_count + excluded.reviews_count,
+            'correct_count': DailyActivity.correct_count + excluded.correct_count,
+            'last_session_id': case(
+                (excluded.last_session_at.is_not(None) & newer_session, excluded.last_session_id),
+                else_=DailyActivity.last_session_id,
+            ),
+            'last_session_at': case(
+                (excluded.last_session_at.is_not(None) & newer_session, excluded.last_session_at),
+                else_=DailyActivity.last_session_at,
+            ),
+        },
+    )
+    db.session.execute(stmt, rows)
+
+
+def record_session_activity(session):
+    """Count a newly created study session towards its day"""
+    _upsert({
+        (session.created_at.date(), session.group_id): {
+            'sessions_count': 1,
+            'reviews_count': 0,
+            'correct_count': 0,
+            'last_session_id': session.id,
+            'last_session_at': session.created_at,
+        }
+    })
+
+
+def record_review_activity(reviews):
+    """Count (group_id, correct, reviewed_at) tuples towards their days"""
+    totals = {}
+    for group_id, correct, reviewed_at in reviews:
+        key = (reviewed_at.date(), group_id)
+        counts = totals.setdefault(key, {
+            'sessions_count': 0,
+            'reviews_count': 0,
+            'correct_count': 0,
+            'last_session_id': None,
+            'last_session_at': None,
+        })
+        counts['reviews_count'] += 1
+        if correct:
+            counts['correct_count'] += 1
+    _upsert(totals)
+
+
+def rebuild_daily_activity():
+    """Recompute the rollup from sessions and the review history"""
+    db.session.query(DailyActivity).delete()
+    db.session.execute(REBUILD_SQL)
+
+
+def activity_totals():
+    """Lifetime totals summed over the rollup rows"""
+    row = db.session.query(
+        func.coalesce(func.sum(DailyActivity.sessions_count), 0),
+        func.coalesce(func.sum(DailyActivity.reviews_count), 0),
+        func.coalesce(func.sum(DailyActivity.correct_count), 0),
+        func.count(func.distinct(case((DailyActivity.sessions_count > 0, DailyActivity.group_id)))),
+    ).one()
+    return {
+        'sessions': row[0],
+        'reviews': row[1],
+        'correct': row[2],
+        'active_groups': row[3],
+    }
+
+
+def study_streak(today):
+    """Number of consecutive days up to ``today`` with at least one session"""
+    days = db.session.query(DailyActivity.day)\
+        .filter(DailyActivity.sessions_count > 0, DailyActivity.day <= today)\
+        .group_by(DailyActivity.day)\
+        .order_by(DailyActivity.day.desc())
+
+    streak = 0
+    expected = today
+    for (day,) in days.yield_per(64):
+        if day != expected:
+            break
+        streak += 1
+        expected -= timedelta(days=1)
+    return streak
+
+
+def last_session_ref():
+    """(session_id, created_at) of the most recent session, or None"""
+    return db.session.query(DailyActivity.last_session_id, DailyActivity.last_session_at)\
+        .filter(DailyActivity.last_session_id.is_not(None))\
+        .order_by(DailyActivity.day.desc(), DailyActivity.last_session_at.desc())\
+        .first()
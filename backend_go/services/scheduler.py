@@ -0,0 +1,143 @@
+from datetime import timedelta
+from sqlalchemy import text
+from sqlalchemy.dialects.sqlite import insert
+from models import db, WordSchedule, WordsReviewItem, WordsGroup, ScheduleCheckpoint
+
+INITIAL_EASE = 2.5
+MIN_EASE = 1.3
+MAX_INTERVAL_DAYS = 3650.0
+# SM-2 answer quality for a correct / wrong review
+QUALITY_CORRECT = 4
+QUALITY_WRONG = 1
+REBUILD_CHUNK = 5000
+
+RESTORE_CHECKPOINTS_SQL = text("""
+INSERT INTO word_schedules (word_id, repetitions, interval_days, ease, due_at, last_reviewed_at)
+SELECT word_id, repetitions, interval_days, ease, due_at, last_reviewed_at FROM schedule_checkpoints
+""")
+
+# CROSS JOIN pins word_schedules as the outer loop, so SQLite walks the
+# due_at index in order and probes the (word_id, group_id) unique index
+# instead of sorting the whole group.
+DUE_SQL = text("""
+SELECT word_schedules.* FROM word_schedules
+CROSS JOIN words_groups
+WHERE words_groups.word_id = word_schedules.word_id
+  AND words_groups.group_id = :group_id
+  AND word_schedules.due_at <= :now
+ORDER BY word_schedules.due_at
+LIMIT :limit
+""")
+
+
+def next_state(state, correct, reviewed_at):
+    """Apply one SM-2 step to (repetitions, interval_days, ease); returns the new row values"""
+    repetitions, interval, ease = state or (0, 0.0, INITIAL_EASE)
+    quality = QUALITY_CORRECT if correct else QUALITY_WRONG
+
+    if quality >= 3:
+        if repetitions == 0:
+            interval = 1.0
+        elif repetitions == 1:
+            interval = 6.0
+        else:
+            interval = min(MAX_INTERVAL_DAYS, round(interval * ease, 2))
+        repetitions += 1
+    else:
+        repetitions = 0
+        interval = 1.0
+    ease = max(MIN_EASE, ease + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
+
+    return {
+        'repetitions': repetitions,
+        'interval_days': interval,
+        'ease': round(ease, 4),
+        'due_at': reviewed_at + timedelta(days=interval),
+        'last_reviewed_at': reviewed_at,
+    }
+
+
+def _upsert(rows):
+    if not rows:
+        return
+    stmt = insert(WordSchedule)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[WordSchedule.word_id],
+        set_={name: getattr(stmt.excluded, name)
+              for name in ('repetitions', 'interval_days', 'ease', 'due_at', 'last_reviewed_at')},
+    )
+    db.session.execute(stmt, rows)
+
+
+def record_schedule_reviews(reviews):
+    """Advance the schedules of (word_id, correct, reviewed_at) tuples, oldest review first"""
+    if not reviews:
+        return
+    word_ids = {word_id for word_id, _, _ in reviews}
+    states = {
+        s.word_id: (s.repetitions, s.interval_days, s.ease)
+        for s in WordSchedule.query.filter(WordSchedule.word_id.in_(word_ids))
+    }
+
+    rows = {}
+    for word_id, correct, reviewed_at in sorted(reviews, key=lambda r: r[2]):
+        row = next_state(states.get(word_id), correct, reviewed_at)
+        states[word_id] = (row['repetitions'], row['interval_days'], row['ease'])
+        rows[word_id] = dict(row, word_id=word_id)
+    _upsert(list(rows.values()))
+
+
+def rebuild_schedules():
+    """Replay the whole review history into fresh schedules in one streaming pass.
+
+    Words with compacted reviews start from their schedule checkpoint and
+    replay only the raw reviews that remain.
+    """
+    db.session.query(WordSchedule).delete()
+    db.session.execute(RESTORE_CHECKPOINTS_SQL)
+    checkpoints = dict(
+        (word_id, (repetitions, interval, ease))
+        for word_id, repetitions, interval, ease in db.session.query(
+            ScheduleCheckpoint.word_id, ScheduleCheckpoint.repetitions,
+            ScheduleCheckpoint.interval_days, ScheduleCheckpoint.ease)
+    )
+    history = db.session.query(WordsReviewItem.word_id, WordsReviewItem.correct, WordsReviewItem.created_at)\
+        .order_by(WordsReviewItem.word_id, WordsReviewItem.created_at, WordsReviewItem.id)\
+        .yield_per(REBUILD_CHUNK)
+
+    rows = []
+    current_id = None
+    state = row = None
+    for word_id, correct, reviewed_at in history:
+        if word_id != current_id:
+            if row is not None:
+                rows.append(dict(row, word_id=current_id))
+            current_id, state = word_id, checkpoints.get(word_id)
+        row = next_state(state, correct, reviewed_at)
+        state = (row['repetitions'], row['interval_days'], row['ease'])
+        if len(rows) >= REBUILD_CHUNK:
+            _upsert(rows)
+            rows = []
+    if row is not None:
+        rows.append(dict(row, word_id=current_id))
+    _upsert(rows)
+
+
+def due_words(group_id, now, limit, include_new=True):
+    """(due schedules, unseen word ids) for a group, most overdue first.
+
+    Due words come from a range scan of the due_at index probed against the
+    group's memberships; unseen words fill the rest in membership order.
+    """
+    due = WordSchedule.query.from_statement(DUE_SQL)\
+        .params(group_id=group_id, now=now, limit=limit)\
+        .all()
+
+    new_ids = []
+    if include_new and len(due) < limit:
+        new_ids = [row[0] for row in db.session.query(WordsGroup.word_id)
+                   .outerjoin(WordSchedule, WordSchedule.word_id == WordsGroup.word_id)
+                   .filter(WordsGroup.group_id == group_id, WordSchedule.word_id.is_(None))
+                   .order_by(WordsGroup.id)
+                   .limit(limit - len(due))]
+    return due, new_ids
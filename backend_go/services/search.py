@@ -0,0 +1,41 @@
+import re
+from sqlalchemy import text
+from models import db
+
+SEARCH_COLUMNS = ('japanese', 'romaji', 'english')
+# bm25 column weights, in SEARCH_COLUMNS order
+BM25_WEIGHTS = (10.0, 5.0, 1.0)
+
+_TERM = re.compile(r'[^\s"*]+')
+
+
+def build_match(q, column=None):
+    """Turn free text into an FTS5 query where every term is a quoted prefix"""
+    terms = _TERM.findall(q)
+    if not terms:
+        return None
+    expr = ' '.join('"%s"*' % term for term in terms)
+    if column:
+        expr = '%s : (%s)' % (column, expr)
+    return expr
+
+
+def search_word_ids(q, column=None, group_id=None, limit=100, offset=0):
+    """Ids of words matching ``q``, best bm25 rank first"""
+    match = build_match(q, column)
+    if match is None:
+        return []
+
+    join = ''
+    params = {'match': match, 'limit': limit, 'offset': offset}
+    if group_id is not None:
+        join = ' JOIN words_groups ON words_groups.word_id = words_fts.rowid AND words_groups.group_id = :group_id'
+        params['group_id'] = group_id
+
+    sql = text(
+        'SELECT words_fts.rowid FROM words_fts' + join +
+        ' WHERE words_fts MATCH :match'
+        ' ORDER BY bm25(words_fts, %s), words_fts.rowid' % ', '.join(str(w) for w in BM25_WEIGHTS) +
+        ' LIMIT :limit OFFSET :offset'
+    )
+    return [row[0] for row in db.session.execute(sql, params)]
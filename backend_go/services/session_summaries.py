@@ -0,0 +1,80 @@
+from sqlalchemy import case, func, select
+from models import db, Group, ReviewAggregate, StudyActivity, StudySession, WordsReviewItem
+
+# newest first; unique together so it doubles as the keyset
+SESSION_ORDER = [StudySession.created_at, StudySession.id]
+
+
+def _iso(value):
+    return value.isoformat() + 'Z' if value else None
+
+
+# ?fields= of the session lists and how each is read off a summary row
+SESSION_FIELDS = {
+    'id': lambda row: row.id,
+    'group_id': lambda row: row.group_id,
+    'group_name': lambda row: row.group_name,
+    'study_activity_id': lambda row: row.study_activity_id,
+    'activity_name': lambda row: row.activity_name,
+    'start_time': lambda row: _iso(row.created_at),
+    'end_time': lambda row: _iso(row.last_reviewed_at),
+    'review_item_count': lambda row: row.review_item_count,
+    'correct_count': lambda row: row.correct_count,
+    'wrong_count': lambda row: row.review_item_count - row.correct_count,
+    'created_at': lambda row: _iso(row.created_at),
+}
+# fields that need the GROUP BY over the page's reviews
+REVIEW_FIELDS = {'end_time', 'review_item_count', 'correct_count', 'wrong_count'}
+
+
+def _compacted(page, column):
+    return select(column).where(ReviewAggregate.study_session_id == page.c.id).scalar_subquery()
+
+
+def summarize_sessions(sessions_query, fields=None):
+    """Session rows with group/activity names and review counts in one query.
+
+    ``sessions_query`` is an ordered, limited StudySession query (a page);
+    it becomes a derived table so the GROUP BY over words_review_items only
+    touches that page's sessions. Compacted reviews are added from
+    review_aggregates by primary-key lookups. Rows come back newest first.
+    With ``fields`` (see SESSION_FIELDS) the name joins and the review
+    aggregation are left out unless a field needs them.
+    """
+    wanted = set(SESSION_FIELDS if fields is None else fields)
+    page = sessions_query.subquery()
+    stmt = select(page.c.id, page.c.group_id, page.c.study_activity_id, page.c.created_at).select_from(page)
+    if 'group_name' in wanted:
+        stmt = stmt.add_columns(Group.name.label('group_name')).join(Group, Group.id == page.c.group_id)
+    if 'activity_name' in wanted:
+        stmt = stmt.add_columns(StudyActivity.name.label('activity_name')).outerjoin(
+            StudyActivity, StudyActivity.id == page.c.study_activity_id)
+    if wanted & REVIEW_FIELDS:
+        compacted_correct = _compacted(page, func.coalesce(func.sum(ReviewAggregate.correct_count), 0))
+        compacted_total = _compacted(
+            page, func.coalesce(func.sum(ReviewAggregate.correct_count + ReviewAggregate.wrong_count), 0))
+        compacted_last = _compacted(page, func.max(ReviewAggregate.last_reviewed_at))
+        raw_last = func.max(WordsReviewItem.created_at)
+        correct = func.coalesce(func.sum(case((WordsReviewItem.correct, 1), else_=0)), 0) + compacted_correct
+        stmt = (
+            stmt.add_columns(
+                (func.count(WordsReviewItem.id) + compacted_total).label('review_item_count'),
+                correct.label('correct_count'),
+                func.max(func.coalesce(raw_last, compacted_last), func.coalesce(compacted_last, raw_last))
+                    .label('last_reviewed_at'),
+            )
+            .outerjoin(WordsReviewItem, WordsReviewItem.study_session_id == page.c.id)
+            .group_by(page.c.id)
+        )
+    stmt = stmt.order_by(page.c.created_at.desc(), page.c.id.desc())
+    return db.session.execute(stmt).all()
+
+
+def session_summary(session_id):
+    """Summary row of a single session, or None"""
+    rows = summarize_sessions(StudySession.query.filter(StudySession.id == session_id))
+    return rows[0] if rows else None
+
+
+def summary_to_dict(row, fields=None):
+    return {name: SESSION_FIELDS[name](row) for name in (fields or SESSION_FIELDS)}
@@ -0,0 +1,391 @@
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from datetime import datetime
+from flask import current_app, g, jsonify, request
+from sqlalchemy import create_engine, event
+from services.migrations import run_migrations, pending_migrations
+from services.storage import READER_BIND, connection_pragmas
+
+logger = logging.getLogger(__name__)
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LEARNER_MIGRATIONS_DIR = os.path.join(BACKEND_DIR, 'db', 'learner_migrations')
+DEFAULT_SHARD_ROOT = os.path.join(BACKEND_DIR, 'shards')
+
+ACTIVE = 'active'
+MOVING = 'moving'
+
+# a move still ``moving`` after this long was interrupted (crash, kill) and is undone
+STALE_MOVE_SECONDS = 15 * 60
+
+_LEARNER_ID = re.compile(r'^[A-Za-z0-9][A-Za-z0-9_-]{0,63}$')
+
+
+def valid_learner_id(learner_id):
+    return bool(learner_id) and _LEARNER_ID.match(learner_id) is not None
+
+
+# -- layout: <root>/<shard>/<learner_id>.db ----------------------------------
+
+def list_shards(root):
+    """Shard directories under ``root``, sorted; each holds learner databases"""
+    if not os.path.isdir(root):
+        return []
+    return sorted(d for d in os.listdir(root) if os.path.isdir(os.path.join(root, d)) and not d.startswith('.'))
+
+
+def ensure_shards(root, count):
+    """Create shard-00 .. shard-NN under an empty ``root``; returns the shard names"""
+    shards = list_shards(root)
+    if not shards:
+        shards = [f'shard-{i:02d}' for i in range(count)]
+        for shard in shards:
+            os.makedirs(os.path.join(root, shard), exist_ok=True)
+    return shards
+
+
+def learner_path(root, shard, learner_id):
+    return os.path.join(root, shard, f'{learner_id}.db')
+
+
+def placement(learner_id, shards):
+    """Default shard of a new learner: a stable hash bucket over the shard list"""
+    return shards[zlib.crc32(learner_id.encode()) % len(shards)]
+
+
+def migrate_learner_db(conn, progress=None):
+    """Bring a learner database (a sqlite3 connection) up to db/learner_migrations"""
+    return run_migrations(conn, progress, migrations_dir=LEARNER_MIGRATIONS_DIR)
+
+
+# -- directory: learner_shards in the catalog database -----------------------
+
+def lookup_learner(conn, learner_id):
+    """(shard, state) of a learner, or None; ``conn`` is a catalog sqlite3 connection"""
+    return conn.execute('SELECT shard, state FROM learner_shards WHERE learner_id = ?', (learner_id,)).fetchone()
+
+
+def register_learner(conn, learner_id, shard):
+    conn.execute('INSERT OR IGNORE INTO learner_shards (learner_id, shard, state) VALUES (?, ?, ?)',
+                 (learner_id, shard, ACTIVE))
+    conn.commit()
+    return lookup_learner(conn, learner_id)
+
+
+def shard_usage(conn, root):
+    """{shard: [(learner_id, bytes)]} for every shard directory, biggest learners first"""
+    usage = {shard: [] for shard in list_shards(root)}
+    for learner_id, shard in conn.execute('SELECT learner_id, shard FROM learner_shards ORDER BY learner_id'):
+        path = learner_path(root, shard, learner_id)
+        size = sum(os.path.getsize(p) for p in (path, path + '-wal') if os.path.exists(p))
+        usage.setdefault(shard, []).append((learner_id, size))
+    for learners in usage.values():
+        learners.sort(key=lambda learner: (-learner[1], learner[0]))
+    return usage
+
+
+# -- tooling: move, rebalance, split ----------------------------------------
+
+def _remove_db_files(path):
+    for suffix in ('', '-wal', '-shm', '-journal'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+
+def _seal(src, learner_id):
+    # triggers that abort every later write to the old copy: a request or
+    # flush still holding an engine on it fails and retries on the new shard
+    # instead of committing reviews the delete would lose
+    tables = [name for (name,) in src.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' "
+        "AND name != 'schema_migrations'")]
+    message = f'learner {learner_id} moved to another shard'.replace("'", "''")
+    for table in tables:
+        for op in ('INSERT', 'UPDATE', 'DELETE'):
+            src.execute(f'CREATE TRIGGER "moved_{table}_{op.lower()}" BEFORE {op} ON "{table}" '
+                        f"BEGIN SELECT RAISE(ABORT, '{message}'); END")
+
+
+def move_learner(conn, root, learner_id, target, drain_seconds=1.0, progress=None):
+    """Copy a learner database to the ``target`` shard and repoint the directory.
+
+    The learner is marked ``moving`` first, so routed requests answer 503
+    with Retry-After. After ``drain_seconds`` for requests routed before
+    that, a write lock on the source waits out in-flight writes and is held
+    while the database is copied with the online backup API, checked,
+    renamed into place and the directory entry flipped back to active.
+    Before the lock is released the old copy is sealed against writes, then
+    deleted.
+    """
+    row = lookup_learner(conn, learner_id)
+    if row is None:
+        raise ValueError(f'unknown learner {learner_id!r}')
+    source = row[0]
+    if source == target:
+        return False
+    os.makedirs(os.path.join(root, target), exist_ok=True)
+    source_path = learner_path(root, source, learner_id)
+    target_path = learner_path(root, target, learner_id)
+
+    conn.execute('UPDATE learner_shards SET state = ?, moved_at = ? WHERE learner_id = ?',
+                 (MOVING, datetime.utcnow().isoformat(' '), learner_id))
+    conn.commit()
+    started = time.monotonic()
+    lock = None
+    try:
+        time.sleep(drain_seconds)
+        if os.path.exists(source_path):
+            # the write lock waits out in-flight writes and keeps new ones out;
+            # the backup reads through a second connection, which it still allows
+            lock = sqlite3.connect(source_path, timeout=max(drain_seconds, 5.0), isolation_level=None)
+            lock.execute('BEGIN IMMEDIATE')
+            tmp_path = target_path + '.tmp'
+            _remove_db_files(tmp_path)
+            src = sqlite3.connect(source_path)
+            dst = sqlite3.connect(tmp_path)
+            try:
+                src.backup(dst)
+                if dst.execute('PRAGMA quick_check').fetchone()[0] != 'ok':
+                    raise RuntimeError(f'copy of {learner_id!r} failed its integrity check')
+            finally:
+                dst.close()
+                src.close()
+            _seal(lock, learner_id)
+            os.replace(tmp_path, target_path)
+        conn.execute('UPDATE learner_shards SET shard = ?, state = ?, moved_at = ? WHERE learner_id = ?',
+                     (target, ACTIVE, datetime.utcnow().isoformat(' '), learner_id))
+        conn.commit()
+    except BaseException:
+        if lock is not None:
+            lock.rollback()
+            lock.close()
+        conn.execute('UPDATE learner_shards SET state = ? WHERE learner_id = ?', (ACTIVE, learner_id))
+        conn.commit()
+        raise
+    if lock is not None:
+        lock.execute('COMMIT')
+        lock.close()
+    _remove_db_files(source_path)
+    if progress:
+        progress(f"  {learner_id}: {source} -> {target} ({(time.monotonic() - started) * 1000:,.0f} ms)")
+    return True
+
+
+def recover_stale_moves(conn, max_age_seconds=STALE_MOVE_SECONDS):
+    """Flip learners left ``moving`` by an interrupted move back to active.
+
+    Until the directory flip the learner's database is untouched on its
+    source shard, so the entry is simply reactivated there. Returns the
+    recovered learner ids.
+    """
+    cutoff = datetime.utcfromtimestamp(time.time() - max_age_seconds).isoformat(' ')
+    learners = [learner_id for (learner_id,) in conn.execute(
+        'SELECT learner_id FROM learner_shards WHERE state = ? AND (moved_at IS NULL OR moved_at < ?)',
+        (MOVING, cutoff))]
+    if learners:
+        conn.executemany('UPDATE learner_shards SET state = ? WHERE learner_id = ? AND state = ?',
+                         [(ACTIVE, learner_id, MOVING) for learner_id in learners])
+        conn.commit()
+        for learner_id in learners:
+            logger.warning('Learner %s was left moving by an interrupted move; reactivated', learner_id)
+    return learners
+
+
+def plan_rebalance(usage, tolerance=0.1):
+    """Moves [(learner_id, source, target)] evening out bytes per shard.
+
+    Greedy: repeatedly move the largest learner of the fullest shard that
+    fits into half the gap to the emptiest one, until every shard is within
+    ``tolerance`` of the mean.
+    """
+    load = {shard: sum(size for _, size in learners) for shard, learners in usage.items()}
+    members = {shard: list(learners) for shard, learners in usage.items()}
+    if len(load) < 2:
+        return []
+    mean = sum(load.values()) / len(load)
+    moves = []
+    while True:
+        heavy = max(load, key=lambda s: (load[s], s))
+        light = min(load, key=lambda s: (load[s], s))
+        gap = load[heavy] - load[light]
+        if gap <= max(tolerance * mean, 0) or gap == 0:
+            break
+        candidate = next((m for m in members[heavy] if 0 < m[1] <= gap / 2), None)
+        if candidate is None:
+            break
+        members[heavy].remove(candidate)
+        members[light].append(candidate)
+        load[heavy] -= candidate[1]
+        load[light] += candidate[1]
+        moves.append((candidate[0], heavy, light))
+    return moves
+
+
+def plan_split(usage, shard, new_shard):
+    """Moves handing roughly half of ``shard``'s bytes to the new ``new_shard``"""
+    if shard not in usage:
+        raise ValueError(f'unknown shard {shard!r}')
+    if new_shard in usage and usage[new_shard]:
+        raise ValueError(f'shard {new_shard!r} already holds learners')
+    keep = give = 0
+    moves = []
+    for learner_id, size in usage[shard]:
+        if give < keep:
+            moves.append((learner_id, shard, new_shard))
+            give += size
+        else:
+            keep += size
+    return moves
+
+
+# -- request routing ---------------------------------------------------------
+
+class LearnerRouter:
+    """Maps learner ids to engines of their databases for the current app.
+
+    Engines are created on first use (migrating the learner database and
+    attaching the catalog read-only as ``catalog``) and kept per learner in
+    an LRU of SHARD_ENGINE_CACHE_SIZE, so hot learners keep their pooled
+    connections. Stale ``moving`` entries are recovered at startup.
+    """
+
+    def __init__(self, app, db):
+        self.app = app
+        self.db = db
+        self.root = app.config['SHARD_ROOT']
+        self.catalog_path = os.path.abspath(app.config['DATABASE_PATH'])
+        self.pragmas = connection_pragmas(app)
+        self.pool_size = app.config['SHARD_POOL_SIZE']
+        self.max_engines = app.config['SHARD_ENGINE_CACHE_SIZE']
+        self.shards = ensure_shards(self.root, app.config['SHARD_COUNT'])
+        self.engines = OrderedDict()
+        self.lock = threading.Lock()
+        with app.app_context():
+            conn = self._catalog_conn(write=True)
+            try:
+                recover_stale_moves(conn.driver_connection)
+            finally:
+                conn.close()
+
+    def _catalog_conn(self, write=False):
+        engine = self.db.engine if write else self.db.engines.get(READER_BIND, self.db.engine)
+        return engine.raw_connection()
+
+    def locate(self, learner_id):
+        """(shard, state) of the learner, registering new learners on a hashed shard"""
+        conn = self._catalog_conn()
+        try:
+            row = lookup_learner(conn.driver_connection, learner_id)
+        finally:
+            conn.close()
+        if row is not None:
+            return row
+        self.shards = list_shards(self.root) or self.shards
+        conn = self._catalog_conn(write=True)
+        try:
+            return register_learner(conn.driver_connection, learner_id, placement(learner_id, self.shards))
+        finally:
+            conn.close()
+
+    def engine(self, learner_id, path):
+        with self.lock:
+            cached = self.engines.get(learner_id)
+            # a move changes the path, or replaces the file under it; pooled
+            # connections would still hold the old one
+            inode = os.stat(path).st_ino if os.path.exists(path) else None
+            if cached is not None and cached[1:] == (path, inode):
+                self.engines.move_to_end(learner_id)
+                return cached[0]
+            if cached is not None:
+                cached[0].dispose()
+            engine = self._create_engine(path)
+            self.engines[learner_id] = (engine, path, os.stat(path).st_ino)
+            self.engines.move_to_end(learner_id)
+            while len(self.engines) > self.max_engines:
+                _, (evicted, _, _) = self.engines.popitem(last=False)
+                evicted.dispose()
+            return engine
+
+    def _create_engine(self, path):
+        # migrate before the catalog is attached: its schema_migrations would shadow the learner's
+        conn = sqlite3.connect(path)
+        try:
+            if pending_migrations(conn, migrations_dir=LEARNER_MIGRATIONS_DIR):
+                migrate_learner_db(conn)
+        finally:
+            conn.close()
+
+        busy_timeout_ms = self.pragmas.get('busy_timeout', 5000)
+        engine = create_engine(
+            f'sqlite:///file:{path}?uri=true',
+            pool_size=self.pool_size,
+            max_overflow=0,
+            pool_timeout=self.app.config['SQLITE_POOL_TIMEOUT'],
+            connect_args={'check_same_thread': False, 'timeout': busy_timeout_ms / 1000.0},
+        )
+        statements = [f'PRAGMA {name} = {value}' for name, value in self.pragmas.items()]
+        catalog_uri = f'file:{self.catalog_path}?mode=ro'
+
+        @event.listens_for(engine, 'connect')
+        def attach_catalog(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            for statement in statements:
+                cursor.execute(statement)
+            cursor.execute('ATTACH DATABASE ? AS catalog', (catalog_uri,))
+            cursor.close()
+
+        metrics = self.app.extensions.get('metrics')
+        if metrics is not None:
+            from services.metrics import instrument_engine
+            instrument_engine(engine)
+
+        return engine
+
+
+def get_router():
+    return current_app.extensions.get('learner_router')
+
+
+def activate_learner(learner_id):
+    """Route the current app context's session to the learner's database.
+
+    Returns the learner's state; only an ``active`` learner is routed.
+    """
+    router = get_router()
+    shard, state = router.locate(learner_id)
+    if state == ACTIVE:
+        g.learner_id = learner_id
+        g.learner_engine = router.engine(learner_id, learner_path(router.root, shard, learner_id))
+    return state
+
+
+def init_sharding(app, db):
+    """Multi-learner mode: route each request to its learner's database (MULTI_LEARNER)"""
+    if not app.config.get('MULTI_LEARNER'):
+        return None
+
+    router = LearnerRouter(app, db)
+    app.extensions['learner_router'] = router
+    header = app.config['LEARNER_HEADER']
+
+    @app.before_request
+    def route_learner():
+        learner_id = request.headers.get(header) or request.args.get('learner_id')
+        if not learner_id:
+            # no learner: the catalog database's own history, as in single-learner mode
+            return None
+        if not valid_learner_id(learner_id):
+            return jsonify({'error': 'learner id must be 1-64 letters, digits, "-" or "_"'}), 400
+        if activate_learner(learner_id) != ACTIVE:
+            response = jsonify({'error': 'Learner is being moved between shards, retry shortly'})
+            response.headers['Retry-After'] = '1'
+            return response, 503
+        return None
+
+    return router
@@ -0,0 +1,121 @@
+import os
+import sqlite3
+from datetime import datetime
+from services.data_version import CATALOG, HISTORY
+from services.distractors import refresh_queued
+from services.migrations import MIGRATIONS_DIR, migration_files, run_migrations
+from services.vocab_import import VocabImporter, seed_files
+
+TEMPLATE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'db', 'template.db')
+
+DEFAULT_ACTIVITIES = (
+    ('Hiragana Quiz', 'quiz', 'https://external-app.com/hiragana'),
+    ('Katakana Quiz', 'quiz', 'https://external-app.com/katakana'),
+)
+
+
+def template_sources():
+    """Files the template is built from; editing any of them makes it stale"""
+    return [os.path.join(MIGRATIONS_DIR, f) for f in migration_files()] + [path for path, _ in seed_files()]
+
+
+def template_is_stale(path):
+    if not os.path.exists(path):
+        return True
+    built = os.path.getmtime(path)
+    return any(os.path.getmtime(source) > built for source in template_sources())
+
+
+def build_template(path=TEMPLATE_PATH, progress=None):
+    """Build a migrated and seeded database with the default activities at ``path``.
+
+    The template is written next to its destination and moved into place
+    with an atomic rename, so readers never see a half-built file.
+    """
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    conn = sqlite3.connect(tmp_path)
+    try:
+        run_migrations(conn, progress)
+        with VocabImporter(conn, progress=progress) as importer:
+            for seed_file, group_name in seed_files():
+                if progress:
+                    progress(f"  Seeding: {group_name}")
+                importer.import_file(seed_file, group_name)
+        refresh_queued(conn, progress=progress)
+        created_at = datetime.utcnow().isoformat(' ')
+        conn.executemany(
+            'INSERT INTO study_activities (name, activity_type, launch_url, created_at) VALUES (?, ?, ?, ?)',
+            [activity + (created_at,) for activity in DEFAULT_ACTIVITIES],
+        )
+        conn.commit()
+        conn.execute('ANALYZE')
+        conn.commit()
+        conn.execute('VACUUM')
+    except BaseException:
+        conn.close()
+        os.remove(tmp_path)
+        raise
+    conn.close()
+
+    os.replace(tmp_path, path)
+    return path
+
+
+def ensure_template(path=TEMPLATE_PATH, progress=None):
+    """Path of an up-to-date template, (re)building it if missing or stale"""
+    if template_is_stale(path):
+        build_template(path, progress)
+    return path
+
+
+def restore_snapshot(template_path, conn):
+    """Overwrite the database behind sqlite3 connection ``conn`` with the template.
+
+    Uses the online backup API: the copy is a single write transaction on
+    ``conn``, so other connections see either the old or the restored
+    database, and the destination keeps its own journal mode.
+    """
+    source = sqlite3.connect(f'file:{template_path}?mode=ro', uri=True)
+    try:
+        source.backup(conn)
+    finally:
+        source.close()
+
+
+def clone_template(dest_path, template_path=TEMPLATE_PATH):
+    """Create ``dest_path`` as a fresh copy of the template, e.g. a per-test database"""
+    conn = sqlite3.connect(dest_path)
+    try:
+        restore_snapshot(ensure_template(template_path), conn)
+    finally:
+        conn.close()
+    return dest_path
+
+
+def _versions(conn):
+    try:
+        return dict(conn.execute('SELECT name, version FROM data_versions'))
+    except sqlite3.OperationalError:
+        return {}
+
+
+def reset_database(conn, template_path=TEMPLATE_PATH):
+    """Restore the template over ``conn``'s database, moving every data version past its old value.
+
+    Versions are carried over (max of old and template, plus one) so caches
+    keyed on the old data never match the restored database.
+    """
+    versions = _versions(conn)
+    conn.commit()
+    restore_snapshot(ensure_template(template_path), conn)
+    for name, version in _versions(conn).items():
+        versions[name] = max(versions.get(name, 0), version)
+    conn.executemany(
+        'INSERT INTO data_versions (name, version) VALUES (?, ?) '
+        'ON CONFLICT(name) DO UPDATE SET version = excluded.version',
+        [(name, versions.get(name, 0) + 1) for name in (CATALOG, HISTORY)],
+    )
+    conn.commit()
@@ -0,0 +1,137 @@
+from flask import g, has_app_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+
+READER_BIND = 'reader'
+READ_METHODS = ('GET', 'HEAD')
+
+# Tables of a learner database in multi-learner mode (db/learner_migrations);
+# everything else is the shared catalog
+LEARNER_TABLES = frozenset((
+    'study_sessions', 'words_review_items', 'review_batches', 'word_review_stats', 'daily_activity',
+    'word_schedules', 'review_aggregates', 'schedule_checkpoints', 'learner_versions', 'group_word_stats',
+))
+
+# Pragmas applied to every connection of each profile. journal_mode is
+# persistent in the file; the rest are per connection.
+STORAGE_PROFILES = {
+    'default': {
+        'pragmas': {},
+        'separate_reader': False,
+    },
+    'production': {
+        'pragmas': {
+            'journal_mode': 'WAL',
+            'synchronous': 'NORMAL',
+            'busy_timeout': 5000,
+            'mmap_size': 268435456,
+            'cache_size': -65536,
+            'temp_store': 'MEMORY',
+        },
+        'separate_reader': True,
+    },
+}
+
+
+def learner_engine():
+    """Engine of the learner database the current request is routed to, or None"""
+    return g.get('learner_engine') if has_app_context() else None
+
+
+def _written_table(session, mapper, clause):
+    if mapper is not None and session._flushing:
+        return mapper.persist_selectable.name
+    if clause is not None and getattr(clause, 'is_dml', False):
+        return clause.table.name
+    return None
+
+
+class RoutingSession(Session):
+    """Session that sends reads of GET/HEAD requests to the read-only engine.
+
+    In a request routed to a learner database everything runs there (the
+    catalog is attached read-only), except writes to catalog tables, which
+    go to the catalog writer.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None:
+            engine = learner_engine()
+            if engine is not None:
+                table = _written_table(self, mapper, clause)
+                if table is None or table in LEARNER_TABLES:
+                    return engine
+                return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+        if bind is None and not self._flushing and has_app_context() and g.get('use_reader'):
+            engines = self._db.engines
+            if READER_BIND in engines:
+                return engines[READER_BIND]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def connection_pragmas(app):
+    profile = STORAGE_PROFILES[app.config['STORAGE_PROFILE']]
+    pragmas = dict(profile['pragmas'])
+    pragmas.update(app.config.get('SQLITE_PRAGMAS') or {})
+    return pragmas
+
+
+def configure_storage(app):
+    """Fill in engine options and binds for the configured STORAGE_PROFILE.
+
+    Call before ``db.init_app``. With a separate reader, the default bind is
+    the single serialized writer (a pool of SQLITE_WRITER_POOL_SIZE, 1 by
+    default) and the ``reader`` bind opens the file read-only.
+    """
+    profile_name = app.config['STORAGE_PROFILE']
+    if profile_name not in STORAGE_PROFILES:
+        raise ValueError(f'unknown STORAGE_PROFILE {profile_name!r}')
+    if not STORAGE_PROFILES[profile_name]['separate_reader']:
+        return
+
+    busy_timeout_ms = connection_pragmas(app).get('busy_timeout', 5000)
+    connect_args = {'check_same_thread': False, 'timeout': busy_timeout_ms / 1000.0}
+    db_path = app.config['DATABASE_PATH']
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', {
+        'pool_size': app.config['SQLITE_WRITER_POOL_SIZE'],
+        'max_overflow': 0,
+        'pool_timeout': app.config['SQLITE_POOL_TIMEOUT'],
+        'connect_args': connect_args,
+    })
+    binds = app.config.setdefault('SQLALCHEMY_BINDS', {})
+    binds.setdefault(READER_BIND, {
+        'url': f'sqlite:///file:{db_path}?mode=ro&uri=true',
+        'pool_size': app.config['SQLITE_READER_POOL_SIZE'],
+        'max_overflow': 0,
+        'pool_timeout': app.config['SQLITE_POOL_TIMEOUT'],
+        'connect_args': connect_args,
+    })
+
+
+def init_storage(app, db):
+    """Install connection pragmas and request routing; call after ``db.init_app``"""
+    pragmas = connection_pragmas(app)
+
+    with app.app_context():
+        for key, engine in db.engines.items():
+            statements = [f'PRAGMA {name} = {value}' for name, value in pragmas.items()]
+            if key == READER_BIND:
+                statements = [s for s in statements if not s.startswith('PRAGMA journal_mode')]
+                statements.append('PRAGMA query_only = 1')
+            if statements:
+                _listen_connect(engine, statements)
+        has_reader = READER_BIND in db.engines
+
+    if has_reader:
+        @app.before_request
+        def route_reads():
+            g.use_reader = request.method in READ_METHODS
+
+
+def _listen_connect(engine, statements):
+    @event.listens_for(engine, 'connect')
+    def apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for statement in statements:
+            cursor.execute(statement)
+        cursor.close()
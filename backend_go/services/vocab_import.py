@@ -0,0 +1,202 @@
+import csv
+import json
+import os
+import re
+import time
+from services.data_version import bump_versions_sqlite, CATALOG
+from services.distractors import queue_refresh
+from services.migrations import defer_indexes, restore_deferred_indexes
+
+SUPPORTED_EXTENSIONS = ('.json', '.jsonl', '.ndjson', '.csv')
+SEEDS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'db', 'seeds')
+DEFERRED_INDEX_TABLES = ('words', 'words_groups')
+
+_SEPARATORS = re.compile(r'[\s,]*')
+
+
+def iter_json_array(f, chunk_size=1 << 16):
+    """Yield the elements of a top-level JSON array without loading the whole file"""
+    decoder = json.JSONDecoder()
+    buf = f.read(chunk_size).lstrip()
+    if not buf.startswith('['):
+        raise ValueError('expected a JSON array')
+    pos = 1
+    eof = False
+
+    while True:
+        pos = _SEPARATORS.match(buf, pos).end()
+        if pos < len(buf) and buf[pos] == ']':
+            return
+        try:
+            if pos == len(buf):
+                raise ValueError('need more data')
+            obj, end = decoder.raw_decode(buf, pos)
+            # a value ending exactly at the buffer edge may be truncated (e.g. a number)
+            complete = end < len(buf) or eof
+        except ValueError:
+            complete = False
+        if complete:
+            yield obj
+            pos = end
+            continue
+        if eof:
+            raise ValueError('truncated or malformed JSON array')
+        chunk = f.read(chunk_size)
+        eof = not chunk
+        buf = buf[pos:] + chunk
+        pos = 0
+
+
+def iter_records(path):
+    """Stream raw records from a .json array, .jsonl/.ndjson or .csv file"""
+    ext = os.path.splitext(path)[1].lower()
+    if ext not in SUPPORTED_EXTENSIONS:
+        raise ValueError(f'unsupported vocabulary file type: {path}')
+
+    with open(path, encoding='utf-8', newline='' if ext == '.csv' else None) as f:
+        if ext == '.json':
+            yield from iter_json_array(f)
+        elif ext == '.csv':
+            yield from csv.DictReader(f)
+        else:
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+
+
+def normalize_record(record):
+    """Map a seed record onto (japanese, romaji, english, parts_json, group names)"""
+    parts = record.get('parts') or []
+    if isinstance(parts, str):
+        parts = json.loads(parts) if parts.strip() else []
+
+    groups = record.get('groups') or record.get('group') or []
+    if isinstance(groups, str):
+        groups = [g.strip() for g in groups.split('|') if g.strip()]
+
+    return (
+        record.get('japanese') or record.get('kanji') or '',
+        record.get('romaji') or '',
+        record.get('english') or '',
+        json.dumps(parts),
+        groups,
+    )
+
+
+class VocabImporter:
+    """Bulk loader for words and group memberships over a sqlite3 connection.
+
+    Words are deduplicated on (japanese, romaji, english) across files and
+    groups, rows are written with executemany in chunked transactions, and
+    secondary indexes on the vocabulary tables are dropped for the duration
+    of the import and rebuilt once at the end, or by the next import or
+    migration run if this one is killed. New memberships are queued for the
+    quiz distractor index in the same transactions; refresh_queued indexes
+    them afterwards. Use it as a context manager.
+    """
+
+    def __init__(self, conn, chunk_size=5000, progress=None):
+        self.conn = conn
+        self.chunk_size = chunk_size
+        self.progress = progress
+        self.word_ids = {}
+        self.group_ids = {}
+        self.deferred_indexes = []
+        self.stats = {'records': 0, 'words_inserted': 0, 'duplicates': 0, 'memberships': 0}
+        self.started = None
+        self.next_id = None
+
+    def __enter__(self):
+        self.started = time.monotonic()
+        cursor = self.conn.cursor()
+        cursor.execute('PRAGMA cache_size = -65536')
+
+        for word_id, japanese, romaji, english in cursor.execute(
+                'SELECT id, japanese, romaji, english FROM words'):
+            self.word_ids[(japanese, romaji, english)] = word_id
+        self.next_id = (cursor.execute('SELECT MAX(id) FROM words').fetchone()[0] or 0) + 1
+
+        restore_deferred_indexes(self.conn)
+        self.deferred_indexes = defer_indexes(self.conn, DEFERRED_INDEX_TABLES)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.rollback()
+        if self.progress:
+            self.progress(f"  Rebuilding {len(self.deferred_indexes)} deferred indexes")
+        restore_deferred_indexes(self.conn)
+        # chunks already committed are visible even if the import failed
+        if self.stats['words_inserted'] or self.stats['memberships']:
+            bump_versions_sqlite(self.conn, CATALOG)
+        self.conn.commit()
+        self.stats['elapsed_seconds'] = round(time.monotonic() - self.started, 3)
+        self.stats['rows_per_second'] = round(self.stats['records'] / max(self.stats['elapsed_seconds'], 1e-9))
+        return False
+
+    def group_id(self, name):
+        if name not in self.group_ids:
+            cursor = self.conn.cursor()
+            cursor.execute('INSERT OR IGNORE INTO groups (name) VALUES (?)', (name,))
+            cursor.execute('SELECT id FROM groups WHERE name = ?', (name,))
+            self.group_ids[name] = cursor.fetchone()[0]
+        return self.group_ids[name]
+
+    def import_file(self, path, group_name=None):
+        """Import one file; ``group_name`` applies to every record in it"""
+        return self.import_records(iter_records(path), group_name)
+
+    def import_records(self, records, group_name=None):
+        chunk = []
+        for record in records:
+            chunk.append(record)
+            if len(chunk) >= self.chunk_size:
+                self._write_chunk(chunk, group_name)
+                chunk = []
+        if chunk:
+            self._write_chunk(chunk, group_name)
+        return self.stats
+
+    def _write_chunk(self, records, group_name):
+        new_words = []
+        memberships = []
+        for record in records:
+            japanese, romaji, english, parts, groups = normalize_record(record)
+            key = (japanese, romaji, english)
+            word_id = self.word_ids.get(key)
+            if word_id is None:
+                word_id = self.next_id
+                self.next_id += 1
+                self.word_ids[key] = word_id
+                new_words.append((word_id, japanese, romaji, english, parts))
+            else:
+                self.stats['duplicates'] += 1
+            for name in ([group_name] if group_name else []) + groups:
+                memberships.append((word_id, self.group_id(name)))
+
+        cursor = self.conn.cursor()
+        cursor.executemany(
+            'INSERT INTO words (id, japanese, romaji, english, parts) VALUES (?, ?, ?, ?, ?)',
+            new_words,
+        )
+        cursor.executemany('INSERT OR IGNORE INTO words_groups (word_id, group_id) VALUES (?, ?)', memberships)
+        queue_refresh(self.conn, memberships)
+        self.conn.commit()
+
+        self.stats['records'] += len(records)
+        self.stats['words_inserted'] += len(new_words)
+        self.stats['memberships'] += cursor.rowcount if cursor.rowcount > 0 else 0
+        if self.progress:
+            elapsed = time.monotonic() - self.started
+            self.progress(f"    {self.stats['records']:,} records, "
+                          f"{self.stats['words_inserted']:,} new words "
+                          f"({self.stats['records'] / max(elapsed, 1e-9):,.0f} records/s)")
+
+
+def seed_files(seeds_dir=SEEDS_DIR):
+    """(path, group name) of every seed file, e.g. hiragana.json -> Hiragana"""
+    return [
+        (os.path.join(seeds_dir, name), os.path.splitext(name)[0].replace('_', ' ').title())
+        for name in sorted(os.listdir(seeds_dir))
+        if name.endswith(SUPPORTED_EXTENSIONS)
+    ]
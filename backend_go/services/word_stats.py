@@ -0,0 +1,134 @@
+from flask import current_app
+from sqlalchemy import func, text
+from sqlalchemy.dialects.sqlite import insert
+from models import db, GroupWordStats, WordReviewStats
+
+# review_history covers raw reviews and compacted per-day aggregates alike
+REBUILD_SQL = text("""
+INSERT INTO word_review_stats (word_id, correct_count, wrong_count, last_reviewed_at, error_rate)
+SELECT word_id, SUM(correct_count), SUM(wrong_count), MAX(last_reviewed_at),
+       (SUM(wrong_count) + :prior_wrong) / (SUM(correct_count) + SUM(wrong_count) + :prior_reviews)
+FROM review_history
+GROUP BY word_id
+""")
+
+GROUP_REBUILD_SQL = text("""
+INSERT INTO group_word_stats (group_id, word_id, correct_count, wrong_count, error_rate)
+SELECT study_sessions.group_id, review_history.word_id,
+       SUM(review_history.correct_count), SUM(review_history.wrong_count),
+       (SUM(review_history.wrong_count) + :prior_wrong)
+           / (SUM(review_history.correct_count) + SUM(review_history.wrong_count) + :prior_reviews)
+FROM review_history
+JOIN study_sessions ON study_sessions.id = review_history.study_session_id
+GROUP BY study_sessions.group_id, review_history.word_id
+""")
+
+
+def smoothing_prior():
+    """(reviews, wrong answers) the prior adds to every word's counts before ranking"""
+    reviews = float(current_app.config['HARDEST_PRIOR_REVIEWS'])
+    return reviews, reviews * float(current_app.config['HARDEST_PRIOR_ERROR_RATE'])
+
+
+def smoothed_error_rate(correct, wrong, prior=None):
+    """Error rate pulled towards the prior, so one miss in one review does not top a ranking.
+
+    Works on plain counts and on SQL column expressions alike.
+    """
+    prior_reviews, prior_wrong = prior or smoothing_prior()
+    return (wrong + prior_wrong) / (correct + wrong + prior_reviews)
+
+
+def _fold(reviews):
+    totals = {}
+    for word_id, correct, reviewed_at in reviews:
+        correct_count, wrong_count, last = totals.get(word_id, (0, 0, None))
+        if correct:
+            correct_count += 1
+        else:
+            wrong_count += 1
+        if last is None or (reviewed_at is not None and reviewed_at > last):
+            last = reviewed_at
+        totals[word_id] = (correct_count, wrong_count, last)
+    return totals
+
+
+def record_word_reviews(reviews):
+    """Fold (word_id, correct, reviewed_at) tuples into the per-word counters"""
+    totals = _fold(reviews)
+    if not totals:
+        return
+
+    prior = smoothing_prior()
+    rows = [
+        {'word_id': word_id, 'correct_count': c, 'wrong_count': w, 'last_reviewed_at': last,
+         'error_rate': smoothed_error_rate(c, w, prior)}
+        for word_id, (c, w, last) in totals.items()
+    ]
+    stmt = insert(WordReviewStats)
+    correct = WordReviewStats.correct_count + stmt.excluded.correct_count
+    wrong = WordReviewStats.wrong_count + stmt.excluded.wrong_count
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[WordReviewStats.word_id],
+        set_={
+            'correct_count': correct,
+            'wrong_count': wrong,
+            'last_reviewed_at': func.max(
+                func.coalesce(WordReviewStats.last_reviewed_at, stmt.excluded.last_reviewed_at),
+                stmt.excluded.last_reviewed_at,
+            ),
+            'error_rate': smoothed_error_rate(correct, wrong, prior),
+        },
+    )
+    db.session.execute(stmt, rows)
+
+
+def record_group_word_reviews(group_id, reviews):
+    """Fold (word_id, correct, reviewed_at) tuples from a session of ``group_id`` into its counters"""
+    totals = _fold(reviews)
+    if not totals:
+        return
+
+    prior = smoothing_prior()
+    rows = [
+        {'group_id': group_id, 'word_id': word_id, 'correct_count': c, 'wrong_count': w,
+         'error_rate': smoothed_error_rate(c, w, prior)}
+        for word_id, (c, w, _) in totals.items()
+    ]
+    stmt = insert(GroupWordStats)
+    correct = GroupWordStats.correct_count + stmt.excluded.correct_count
+    wrong = GroupWordStats.wrong_count + stmt.excluded.wrong_count
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[GroupWordStats.group_id, GroupWordStats.word_id],
+        set_={
+            'correct_count': correct,
+            'wrong_count': wrong,
+            'error_rate': smoothed_error_rate(correct, wrong, prior),
+        },
+    )
+    db.session.execute(stmt, rows)
+
+
+def record_word_review(word_id, correct, reviewed_at):
+    """Fold a single review into the word's counters"""
+    record_word_reviews([(word_id, correct, reviewed_at)])
+
+
+def rerank_word_stats():
+    """Recompute every stored error rate with the current prior, e.g. after changing it"""
+    prior = smoothing_prior()
+    for model in (WordReviewStats, GroupWordStats):
+        db.session.query(model).update(
+            {model.error_rate: smoothed_error_rate(model.correct_count, model.wrong_count, prior)},
+            synchronize_session=False,
+        )
+
+
+def rebuild_word_stats():
+    """Recompute every word's counters, overall and per group, from the review history"""
+    prior_reviews, prior_wrong = smoothing_prior()
+    params = {'prior_reviews': prior_reviews, 'prior_wrong': prior_wrong}
+    db.session.query(WordReviewStats).delete()
+    db.session.execute(REBUILD_SQL, params)
+    db.session.query(GroupWordStats).delete()
+    db.session.execute(GROUP_REBUILD_SQL, params)
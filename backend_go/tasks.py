@@ -1,7 +1,6 @@
 from invoke import task
 import os
 import sqlite3
-import json
 
 @task
 def init(c):
@@ -19,70 +18,348 @@ def init(c):
 @task
 def migrate(c):
     """Run database migrations"""
+    from services.migrations import MigrationError, run_migrations
+    
     db_path = os.path.join(os.path.dirname(__file__), 'words.db')
-    migrations_dir = os.path.join(os.path.dirname(__file__), 'db', 'migrations')
     
     if not os.path.exists(db_path):
         print("✗ Database not initialized. Run 'invoke init' first.")
         return
     
     conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    
-    migration_files = sorted([f for f in os.listdir(migrations_dir) if f.endswith('.sql')])
+    try:
+        applied = run_migrations(conn, progress=print)
+    except MigrationError as e:
+        print(f"✗ {e}")
+        return
+    finally:
+        conn.close()
+    if applied:
+        print(f"✓ Applied {len(applied)} migrations in {sum(ms for _, ms in applied):,} ms")
+    else:
+        print("✓ Schema is up to date")
+
+@task
+def migration_status(c):
+    """List applied and pending migrations"""
+    from services.migrations import migration_files, migration_version, applied_migrations
     
-    for migration_file in migration_files:
-        file_path = os.path.join(migrations_dir, migration_file)
-        print(f"  Running: {migration_file}")
-        
-        with open(file_path, 'r') as f:
-            sql = f.read()
-        
-        cursor.executescript(sql)
-        conn.commit()
+    db_path = os.path.join(os.path.dirname(__file__), 'words.db')
     
+    conn = sqlite3.connect(db_path)
+    applied = applied_migrations(conn)
+    durations = dict(conn.execute('SELECT version, duration_ms FROM schema_migrations')) if applied else {}
     conn.close()
-    print("✓ Migrations completed successfully")
+    for migration_file in migration_files():
+        version = migration_version(migration_file)
+        if version in applied:
+            print(f"  ✓ {migration_file} ({durations[version]:,} ms)")
+        else:
+            print(f"  ✗ {migration_file} (pending)")
 
 @task
-def seed(c):
-    """Seed the database with initial data from JSON files"""
+def seed(c, chunk_size=5000):
+    """Seed the database with initial data from the files in db/seeds"""
+    from services.vocab_import import VocabImporter, seed_files
+    
     db_path = os.path.join(os.path.dirname(__file__), 'words.db')
-    seeds_dir = os.path.join(os.path.dirname(__file__), 'db', 'seeds')
     
     if not os.path.exists(db_path):
         print("✗ Database not initialized. Run 'invoke init' first.")
         return
     
     conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
     
-    for seed_file in sorted(os.listdir(seeds_dir)):
-        if seed_file.endswith('.json'):
-            group_name = seed_file.replace('.json', '').replace('_', ' ').title()
+    with VocabImporter(conn, chunk_size=chunk_size, progress=print) as importer:
+        for seed_file, group_name in seed_files():
             print(f"  Seeding: {group_name}")
-            
-            with open(os.path.join(seeds_dir, seed_file)) as f:
-                words_data = json.load(f)
-            
-            # Insert group
-            cursor.execute('INSERT OR IGNORE INTO groups (name) VALUES (?)', (group_name,))
-            conn.commit()
-            
-            cursor.execute('SELECT id FROM groups WHERE name = ?', (group_name,))
-            group_id = cursor.fetchone()[0]
-            
-            # Insert words
-            for word_data in words_data:
-                cursor.execute(
-                    'INSERT INTO words (japanese, romaji, english, parts) VALUES (?, ?, ?, ?)',
-                    (word_data.get('kanji', ''), word_data.get('romaji', ''), word_data.get('english', ''), json.dumps(word_data.get('parts', [])))
-                )
-                conn.commit()
-                
-                word_id = cursor.lastrowid
-                cursor.execute('INSERT INTO words_groups (word_id, group_id) VALUES (?, ?)', (word_id, group_id))
-                conn.commit()
+            importer.import_file(seed_file, group_name)
+    print_import_stats(importer.stats)
+    run_distractor_refresh(conn)
     
     conn.close()
     print("✓ Seeding completed successfully")
+
+@task
+def import_vocab(c, path, group=None, chunk_size=5000):
+    """Bulk import words from a large .json, .jsonl or .csv file"""
+    from services.vocab_import import VocabImporter
+    
+    db_path = os.path.join(os.path.dirname(__file__), 'words.db')
+    
+    if not os.path.exists(db_path):
+        print("✗ Database not initialized. Run 'invoke init' first.")
+        return
+    
+    conn = sqlite3.connect(db_path)
+    
+    with VocabImporter(conn, chunk_size=chunk_size, progress=print) as importer:
+        print(f"  Importing: {path}")
+        importer.import_file(path, group)
+    print_import_stats(importer.stats)
+    run_distractor_refresh(conn)
+    
+    conn.close()
+    print("✓ Import completed successfully")
+
+def print_import_stats(stats):
+    print(f"  {stats['records']:,} records read, {stats['words_inserted']:,} words inserted, "
+          f"{stats['duplicates']:,} duplicates merged, {stats['memberships']:,} memberships added "
+          f"in {stats['elapsed_seconds']}s ({stats['rows_per_second']:,} records/s)")
+
+def run_distractor_refresh(conn, chunk_size=None):
+    from services.distractors import REFRESH_CHUNK_SIZE, refresh_queued
+    
+    print("  Indexing quiz distractors of the imported words")
+    stats = refresh_queued(conn, chunk_size=int(chunk_size or REFRESH_CHUNK_SIZE), progress=print)
+    print(f"  Distractors of {stats['words']:,} words in {stats['groups']:,} groups "
+          f"indexed in {stats['elapsed_seconds']}s")
+
+@task
+def rebuild_rollups(c):
+    """Rebuild word review counters, daily activity rollups and review schedules from raw history"""
+    from app import create_app
+    from models import db
+    from services.word_stats import rebuild_word_stats
+    from services.rollups import rebuild_daily_activity
+    from services.scheduler import rebuild_schedules
+    from services.data_version import bump_versions, HISTORY
+    
+    app = create_app()
+    with app.app_context():
+        rebuild_word_stats()
+        rebuild_daily_activity()
+        rebuild_schedules()
+        bump_versions(HISTORY)
+        db.session.commit()
+    print("✓ Rollups rebuilt successfully")
+
+@task
+def rerank_hardest(c):
+    """Recompute the hardest-words error rates with the configured HARDEST_PRIOR_* smoothing"""
+    from app import create_app
+    from models import db
+    from services.word_stats import rerank_word_stats
+    from services.data_version import bump_versions, HISTORY
+    
+    app = create_app()
+    with app.app_context():
+        rerank_word_stats()
+        bump_versions(HISTORY)
+        db.session.commit()
+    print("✓ Hardest-words rankings recomputed")
+
+@task
+def refresh_distractors(c, chunk_size=None):
+    """Index the quiz distractors of words queued by imports, resuming an interrupted run"""
+    db_path = os.path.join(os.path.dirname(__file__), 'words.db')
+    
+    conn = sqlite3.connect(db_path)
+    run_distractor_refresh(conn, chunk_size)
+    conn.close()
+    print("✓ Distractor refresh completed")
+
+@task
+def rebuild_distractors(c):
+    """Recompute the quiz distractor index of every group"""
+    from services.distractors import rebuild_distractors as rebuild
+    
+    db_path = os.path.join(os.path.dirname(__file__), 'words.db')
+    
+    conn = sqlite3.connect(db_path)
+    stats = rebuild(conn, progress=print)
+    conn.close()
+    print(f"✓ Distractors of {stats['words']:,} words in {stats['groups']:,} groups "
+          f"rebuilt in {stats['elapsed_seconds']}s")
+
+@task
+def compact_reviews(c, horizon_days=None, batch_size=None):
+    """Fold reviews older than the horizon into per-word, per-session-day aggregates"""
+    from app import create_app
+    from services.compaction import compact_reviews as compact, compaction_cutoff
+    
+    app = create_app()
+    with app.app_context():
+        horizon_days = int(horizon_days) if horizon_days is not None else app.config['REVIEW_COMPACTION_HORIZON_DAYS']
+        batch_size = int(batch_size) if batch_size is not None else app.config['REVIEW_COMPACTION_BATCH_SIZE']
+        before = compaction_cutoff(horizon_days)
+        print(f"  Compacting reviews before {before.isoformat()}Z")
+        stats = compact(before, batch_size=batch_size, progress=print)
+    print(f"✓ {stats['reviews']:,} reviews compacted in {stats['batches']} batches ({stats['elapsed_seconds']}s)")
+
+@task
+def export_history(c, path, compress=None):
+    """Write study history to an NDJSON file (gzip-compressed for a .gz path)"""
+    from services.history_io import iter_chunks, iter_history_lines
+    
+    db_path = os.path.join(os.path.dirname(__file__), 'words.db')
+    compress = path.endswith('.gz') if compress is None else compress
+    
+    conn = sqlite3.connect(db_path)
+    written = 0
+    with open(path, 'wb') as f:
+        for chunk in iter_chunks(iter_history_lines(conn), compress=compress):
+            f.write(chunk)
+            written += len(chunk)
+    conn.close()
+    print(f"✓ History exported to {path} ({written:,} bytes)")
+
+@task
+def import_history(c, path, mode='merge', chunk_size=5000):
+    """Merge or restore (--mode restore) study history from an NDJSON export, then rebuild rollups"""
+    import gzip
+    from services.history_io import HistoryImporter
+    
+    db_path = os.path.join(os.path.dirname(__file__), 'words.db')
+    
+    if not os.path.exists(db_path):
+        print("✗ Database not initialized. Run 'invoke init' first.")
+        return
+    
+    conn = sqlite3.connect(db_path)
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt', encoding='utf-8') as f:
+        with HistoryImporter(conn, mode=mode, chunk_size=chunk_size, progress=print) as importer:
+            importer.import_lines(f)
+    conn.close()
+    
+    stats = importer.stats
+    print(f"  {stats['sessions']:,} sessions and {stats['reviews']:,} reviews imported in "
+          f"{stats['elapsed_seconds']}s ({stats['rows_per_second']:,} rows/s)")
+    rebuild_rollups(c)
+    print("✓ History import completed successfully")
+
+@task
+def build_template(c):
+    """(Re)build the pristine migrated and seeded template used by full_reset and fixtures"""
+    from services.snapshots import TEMPLATE_PATH, build_template as build
+    
+    build(TEMPLATE_PATH, progress=print)
+    print(f"✓ Template built at {TEMPLATE_PATH}")
+
+@task
+def reset(c):
+    """Reset words.db to the pristine template (built first if missing or stale)"""
+    from services.snapshots import reset_database
+    import time
+    
+    db_path = os.path.join(os.path.dirname(__file__), 'words.db')
+    
+    started = time.monotonic()
+    conn = sqlite3.connect(db_path)
+    reset_database(conn)
+    conn.close()
+    print(f"✓ Database reset from template in {(time.monotonic() - started) * 1000:.0f} ms")
+
+@task
+def shard_status(c, root=None):
+    """Learners and bytes per shard directory (multi-learner mode)"""
+    from services.sharding import DEFAULT_SHARD_ROOT, recover_stale_moves, shard_usage
+    
+    conn = sqlite3.connect(os.path.join(os.path.dirname(__file__), 'words.db'))
+    for learner_id in recover_stale_moves(conn):
+        print(f"  {learner_id}: interrupted move undone, active again")
+    usage = shard_usage(conn, root or DEFAULT_SHARD_ROOT)
+    moving = conn.execute("SELECT COUNT(*) FROM learner_shards WHERE state != 'active'").fetchone()[0]
+    conn.close()
+    for shard, learners in sorted(usage.items()):
+        print(f"  {shard}: {len(learners):,} learners, {sum(size for _, size in learners):,} bytes")
+    print(f"✓ {sum(len(l) for l in usage.values()):,} learners in {len(usage)} shards ({moving} moving)")
+
+@task
+def shard_move(c, learner, to, root=None, drain=1.0):
+    """Move one learner's database to another shard directory"""
+    from services.sharding import DEFAULT_SHARD_ROOT, move_learner
+    
+    conn = sqlite3.connect(os.path.join(os.path.dirname(__file__), 'words.db'))
+    try:
+        moved = move_learner(conn, root or DEFAULT_SHARD_ROOT, learner, to, float(drain), progress=print)
+    except ValueError as e:
+        print(f"✗ {e}")
+        return
+    finally:
+        conn.close()
+    print(f"✓ {learner} {'moved to' if moved else 'already on'} {to}")
+
+def run_shard_moves(conn, root, moves, dry_run, drain):
+    from services.sharding import move_learner
+    
+    for learner_id, source, target in moves:
+        if dry_run:
+            print(f"  would move {learner_id}: {source} -> {target}")
+        else:
+            move_learner(conn, root, learner_id, target, drain, progress=print)
+    print(f"✓ {len(moves)} learners {'to move' if dry_run else 'moved'}")
+
+@task
+def shard_rebalance(c, root=None, tolerance=0.1, dry_run=False, drain=1.0):
+    """Move learners until every shard holds about the same bytes"""
+    from services.sharding import DEFAULT_SHARD_ROOT, plan_rebalance, shard_usage
+    
+    root = root or DEFAULT_SHARD_ROOT
+    conn = sqlite3.connect(os.path.join(os.path.dirname(__file__), 'words.db'))
+    moves = plan_rebalance(shard_usage(conn, root), float(tolerance))
+    run_shard_moves(conn, root, moves, dry_run, float(drain))
+    conn.close()
+
+@task
+def shard_split(c, shard, into, root=None, dry_run=False, drain=1.0):
+    """Create shard directory INTO and move about half of SHARD's bytes there"""
+    from services.sharding import DEFAULT_SHARD_ROOT, plan_split, shard_usage
+    
+    root = root or DEFAULT_SHARD_ROOT
+    conn = sqlite3.connect(os.path.join(os.path.dirname(__file__), 'words.db'))
+    try:
+        moves = plan_split(shard_usage(conn, root), shard, into)
+    except ValueError as e:
+        print(f"✗ {e}")
+        conn.close()
+        return
+    if not dry_run:
+        os.makedirs(os.path.join(root, into), exist_ok=True)
+    run_shard_moves(conn, root, moves, dry_run, float(drain))
+    conn.close()
+
+@task
+def shard_migrate(c, root=None):
+    """Apply pending db/learner_migrations to every learner database"""
+    from services.sharding import DEFAULT_SHARD_ROOT, learner_path, migrate_learner_db
+    
+    root = root or DEFAULT_SHARD_ROOT
+    conn = sqlite3.connect(os.path.join(os.path.dirname(__file__), 'words.db'))
+    learners = conn.execute('SELECT learner_id, shard FROM learner_shards ORDER BY shard, learner_id').fetchall()
+    conn.close()
+    applied = 0
+    for learner_id, shard in learners:
+        path = learner_path(root, shard, learner_id)
+        if not os.path.exists(path):
+            continue
+        learner_conn = sqlite3.connect(path)
+        applied += len(migrate_learner_db(learner_conn))
+        learner_conn.close()
+    print(f"✓ {applied} migrations applied across {len(learners):,} learner databases")
+
+@task
+def bench_data(c, path='bench.db', words=20000, groups=50, sessions=20000, reviews=1000000, days=365):
+    """Generate a synthetic benchmark database"""
+    from bench.generate import generate
+    
+    generate(os.path.abspath(path), words, groups, sessions, reviews, days)
+    print(f"✓ Benchmark data written to {path}")
+
+@task
+def bench(c, path='bench.db', threads=8, duration=30):
+    """Run the load driver against a benchmark database and write a JSON report"""
+    from bench.driver import main
+    
+    main(['--path', path, '--threads', str(threads), '--duration', str(duration)])
+
+@task
+def test(c):
+    """Run the test suite (EXPLAIN QUERY PLAN checks on a generated database)"""
+    import pytest
+    from invoke import Exit
+    
+    code = pytest.main(['-q', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tests')])
+    if code:
+        raise Exit(code=int(code))
@@ -0,0 +1,30 @@
+import os
+import sqlite3
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope='session')
+def populated_db(tmp_path_factory):
+    """A migrated database with a year of synthetic history, the older part compacted"""
+    from app import create_app
+    from bench.generate import generate
+    from services.compaction import compact_reviews, compaction_cutoff
+    from services.distractors import rebuild_distractors
+
+    path = str(tmp_path_factory.mktemp('plans') / 'words.db')
+    generate(path, words=5000, groups=40, sessions=4000, reviews=80000, days=365)
+
+    app = create_app({'DATABASE_PATH': path})
+    with app.app_context():
+        compact_reviews(compaction_cutoff(app.config['REVIEW_COMPACTION_HORIZON_DAYS']))
+
+    conn = sqlite3.connect(path)
+    rebuild_distractors(conn)
+    conn.execute('ANALYZE')
+    conn.commit()
+    conn.close()
+    return path
@@ -0,0 +1,101 @@
+"""Sparse fieldsets, streamed pages and compression on the list endpoints.
+
+A streamed page must be byte for byte the body jsonify builds, a sparse
+page the full page cut down to the asked fields, and an encoded body must
+decode to the identity one.
+"""
+import gzip
+import zlib
+
+import pytest
+
+LISTS = [
+    ('/api/words?per_page=300', 'id,romaji,parts,correct_count'),
+    ('/api/words?cursor=&per_page=300', 'japanese,last_reviewed_at'),
+    ('/api/words/search?q=ka&per_page=300', 'id,english,wrong_count'),
+    ('/api/groups', 'name'),
+    ('/api/groups/3/words?per_page=300', 'id,parts'),
+    ('/api/groups/3/study_sessions?per_page=300', 'id,group_name,end_time'),
+    ('/api/study_sessions?per_page=300', 'start_time,activity_name,wrong_count'),
+    ('/api/study_sessions/3999/words', None),
+]
+DECODERS = {'gzip': gzip.decompress, 'deflate': zlib.decompress}
+
+
+def _client(db, catalog, stream_min_items, cache=False):
+    from app import create_app
+
+    return create_app({
+        'DATABASE_PATH': db,
+        'CATALOG_ENABLED': catalog,
+        'RESPONSE_CACHE_ENABLED': cache,
+        'STREAM_MIN_ITEMS': stream_min_items,
+    }).test_client()
+
+
+@pytest.fixture(scope='module', params=[True, False], ids=['catalog', 'sql'])
+def clients(request, populated_db):
+    return _client(populated_db, request.param, 10 ** 9), _client(populated_db, request.param, 1)
+
+
+def _with_fields(url, fields):
+    return f"{url}{'&' if '?' in url else '?'}fields={fields}"
+
+
+@pytest.mark.parametrize('url,fields', LISTS, ids=[url for url, _ in LISTS])
+def test_streamed_page_matches_buffered(clients, url, fields):
+    buffered, streamed = clients
+    whole, chunked = buffered.get(url), streamed.get(url)
+    assert whole.status_code == chunked.status_code == 200
+    assert 'Content-Length' not in chunked.headers
+    assert chunked.get_data() == whole.get_data()
+
+
+@pytest.mark.parametrize('url,fields', [(u, f) for u, f in LISTS if f], ids=[u for u, f in LISTS if f])
+def test_sparse_page_is_projection(clients, url, fields):
+    buffered, streamed = clients
+    full = buffered.get(url).get_json()
+    response = buffered.get(_with_fields(url, fields))
+    assert response.status_code == 200
+    names = fields.split(',')
+    sparse = response.get_json()
+    assert sparse['data'] == [{k: item[k] for k in names if k in item} for item in full['data']]
+    assert sparse['pagination'] == full['pagination']
+    assert streamed.get(_with_fields(url, fields)).get_data() == response.get_data()
+
+
+def test_unknown_field_is_rejected(clients):
+    response = clients[0].get('/api/words?fields=id,nope')
+    assert response.status_code == 400
+    assert 'nope' in response.get_json()['error']
+
+
+@pytest.mark.parametrize('encoding', DECODERS)
+@pytest.mark.parametrize('url', ['/api/words?per_page=300', '/api/study_sessions?per_page=300'])
+def test_negotiated_encoding(clients, url, encoding):
+    identity = clients[0].get(url).get_data()
+    for client in clients:
+        response = client.get(url, headers={'Accept-Encoding': f'br, {encoding}'})
+        assert response.headers['Content-Encoding'] == encoding
+        assert 'Accept-Encoding' in response.vary
+        assert DECODERS[encoding](response.get_data()) == identity
+    refused = clients[0].get(url, headers={'Accept-Encoding': f'{encoding};q=0'})
+    assert 'Content-Encoding' not in refused.headers
+
+
+def test_encoded_etag_revalidates(populated_db):
+    client = _client(populated_db, True, 1, cache=True)
+    headers = {'Accept-Encoding': 'gzip'}
+    first = client.get('/api/words?per_page=300', headers=headers)
+    body = gzip.decompress(first.get_data())
+    assert first.headers['Content-Encoding'] == 'gzip'
+    # the streamed first response is cached once sent; the next one has an ETag
+    second = client.get('/api/words?per_page=300', headers=headers)
+    etag = second.headers['ETag']
+    assert etag.endswith('-gzip"')
+    assert gzip.decompress(second.get_data()) == body
+
+    revalidated = client.get('/api/words?per_page=300', headers={**headers, 'If-None-Match': etag})
+    assert revalidated.status_code == 304
+    assert revalidated.headers['ETag'] == etag
+    assert client.get('/api/words?per_page=300', headers={'If-None-Match': etag}).status_code == 200
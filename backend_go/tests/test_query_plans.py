@@ -0,0 +1,158 @@
+"""EXPLAIN QUERY PLAN over the SQL every endpoint emits, on a populated database.
+
+A statement fails when its plan reads a large table start to end, or when
+rows coming out of a large table are sorted in a temp B-tree; both grow
+with the data instead of with the page. Allowed exceptions:
+
+- an ordered walk that a LIMIT cuts short (the plain word list by id);
+- a bare COUNT over a table bounded by the vocabulary size (cached by the
+  pagination count cache until the catalog changes);
+- a temp B-tree for the right part of an ORDER BY, which only sorts rows
+  sharing the index prefix (a word's few distractors), or for a single
+  row looked up by its primary key.
+
+Full-text matches are ranked in a temp B-tree by design, and the history
+export streams whole tables through a raw connection; neither is checked.
+"""
+import re
+import sqlite3
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+
+# tables that grow with study history
+HISTORY_TABLES = {'study_sessions', 'words_review_items', 'review_aggregates', 'review_batches'}
+# tables that grow with the vocabulary; daily_activity, groups and
+# study_activities stay small and may be scanned
+VOCABULARY_TABLES = {'words', 'words_groups', 'word_distractors', 'word_review_stats', 'word_schedules'}
+LARGE_TABLES = HISTORY_TABLES | VOCABULARY_TABLES
+
+ENDPOINTS = [
+    ('GET', '/api/dashboard/last_study_session', None),
+    ('GET', '/api/dashboard/study_progress', None),
+    ('GET', '/api/dashboard/quick_stats', None),
+    ('GET', '/api/words', None),
+    ('GET', '/api/words?page=3', None),
+    ('GET', '/api/words?cursor=', None),
+    ('GET', '/api/words?fields=id,romaji', None),
+    ('GET', '/api/words?cursor=&fields=japanese,correct_count', None),
+    ('GET', '/api/words/search?q=ka', None),
+    ('GET', '/api/words/search?q=ka&fields=id,last_reviewed_at', None),
+    ('GET', '/api/words/search?q=meaning&field=english', None),
+    ('GET', '/api/words/search?q=ka&group_id=3', None),
+    ('GET', '/api/words/17', None),
+    ('GET', '/api/words/hardest', None),
+    ('GET', '/api/words/hardest?cursor=WzAuNSwxMDBd', None),
+    ('GET', '/api/groups', None),
+    ('GET', '/api/groups?fields=name', None),
+    ('GET', '/api/groups/3', None),
+    ('GET', '/api/groups/3/words', None),
+    ('GET', '/api/groups/3/words?page=2', None),
+    ('GET', '/api/groups/3/words?cursor=', None),
+    ('GET', '/api/groups/3/words?fields=id,wrong_count', None),
+    ('GET', '/api/groups/3/quiz?seed=1', None),
+    ('GET', '/api/groups/3/study_sessions', None),
+    ('GET', '/api/groups/3/study_sessions?page=2', None),
+    ('GET', '/api/groups/3/study_sessions?fields=id,start_time', None),
+    ('GET', '/api/groups/3/due', None),
+    ('GET', '/api/groups/3/hardest', None),
+    ('GET', '/api/groups/3/hardest?cursor=WzAuNSwxMDBd', None),
+    ('GET', '/api/study_sessions', None),
+    ('GET', '/api/study_sessions?page=5', None),
+    ('GET', '/api/study_sessions?cursor=', None),
+    ('GET', '/api/study_sessions?cursor=&fields=id,activity_name,correct_count', None),
+    ('GET', '/api/study_sessions/100', None),
+    ('GET', '/api/study_sessions/3999/words', None),
+    ('GET', '/api/study_sessions/3999/words?cursor=', None),
+    ('GET', '/api/study_activities/1', None),
+    ('GET', '/api/study_activities/1/study_sessions', None),
+    ('GET', '/api/study_activities/1/study_sessions?page=3', None),
+    ('POST', '/api/study_activities', {'group_id': 3, 'study_activity_type': 'quiz'}),
+    ('POST', '/api/study_sessions/3999/words/17/review', {'correct': True}),
+    ('POST', '/api/study_sessions/3999/reviews', {'reviews': [{'word_id': 18, 'correct': False}]}),
+]
+
+CHECKED = re.compile(r'^\s*(SELECT|WITH|UPDATE|DELETE)\b', re.IGNORECASE)
+ACCESS = re.compile(r'^(SCAN|SEARCH) (\w+)')
+ALIAS = re.compile(r'\b(\w+) AS (\w+)\b', re.IGNORECASE)
+LIMIT = re.compile(r'\bLIMIT\b', re.IGNORECASE)
+BARE_COUNT = re.compile(r'^\s*SELECT count\(\*\) AS \w+\s+FROM\b', re.IGNORECASE)
+
+
+@contextmanager
+def captured_statements(engines):
+    statements = []
+
+    def on_execute(conn, cursor, statement, parameters, context, executemany):
+        if CHECKED.match(statement):
+            statements.append((statement, parameters[0] if executemany else parameters))
+
+    for engine in engines:
+        event.listen(engine, 'before_cursor_execute', on_execute)
+    try:
+        yield statements
+    finally:
+        for engine in engines:
+            event.remove(engine, 'before_cursor_execute', on_execute)
+
+
+def plan_problems(conn, statement, parameters):
+    """Why the plan of ``statement`` does not scale, as a list of messages"""
+    rows = conn.execute('EXPLAIN QUERY PLAN ' + statement, parameters).fetchall()
+    aliases = {alias: table for table, alias in ALIAS.findall(statement)}
+    levels = {}
+    for _, parent, _, detail in rows:
+        levels.setdefault(parent, []).append(detail)
+
+    problems = []
+    for details in levels.values():
+        accesses = [(m.group(1), aliases.get(m.group(2), m.group(2)), d)
+                    for d in details if (m := ACCESS.match(d))]
+        sorts = [d for d in details if d.startswith('USE TEMP B-TREE') and 'RIGHT PART' not in d]
+        for kind, table, detail in accesses:
+            if kind != 'SCAN' or table not in LARGE_TABLES:
+                continue
+            if LIMIT.search(statement) and not sorts:
+                continue
+            if BARE_COUNT.match(statement) and table in VOCABULARY_TABLES:
+                continue
+            problems.append(f'full scan: {detail}')
+        # the outermost loop feeds the sort; a sorted page, subquery result or
+        # single row looked up by its primary key is fine
+        if sorts and accesses and accesses[0][1] in LARGE_TABLES and '(rowid=?)' not in accesses[0][2]:
+            problems.extend(f'{accesses[0][1]} rows sorted: {d}' for d in sorts)
+    return problems
+
+
+@pytest.fixture(scope='module', params=[True, False], ids=['catalog', 'sql'])
+def app(request, populated_db):
+    from app import create_app
+
+    return create_app({
+        'DATABASE_PATH': populated_db,
+        'RESPONSE_CACHE_ENABLED': False,
+        'CATALOG_ENABLED': request.param,
+    })
+
+
+@pytest.mark.parametrize('method,url,body', ENDPOINTS, ids=[f'{m} {u}' for m, u, _ in ENDPOINTS])
+def test_endpoint_plans(app, populated_db, method, url, body):
+    from models import db
+
+    client = app.test_client()
+    with app.app_context():
+        engines = list(db.engines.values())
+    with captured_statements(engines) as statements:
+        response = client.open(url, method=method, json=body)
+    assert response.status_code < 400, response.get_data(as_text=True)
+
+    conn = sqlite3.connect(populated_db)
+    try:
+        failures = []
+        for statement, parameters in statements:
+            for problem in plan_problems(conn, statement, parameters):
+                failures.append(f"{problem}\n    {' '.join(statement.split())[:400]}")
+    finally:
+        conn.close()
+    assert not failures, '\n'.join(failures)